@@ -0,0 +1,77 @@
+"""
+Compares bulk-load strategies against a local MySQL database.
+
+Usage:
+    python -m benchmarks.bulk_load_benchmark --rows 200000 --batch-sizes 1000 5000 20000
+
+Rows are loaded into a scratch table in the staging database, which is
+dropped afterwards.
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from db.connection_pool import get_connection
+from etl.bulk_load import bulk_load, STRATEGIES
+
+BENCH_TABLE = "bench_bulk_load"
+
+def make_rows(n_rows, seed=42):
+    """Builds a synthetic staging_transaksi-like DataFrame."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2024-01-01")
+    return pd.DataFrame({
+        'transaction_id': np.arange(1, n_rows + 1, dtype=np.int64),
+        'minimart_id': rng.integers(1, 500, n_rows),
+        'cashier_id': rng.integers(1, 5000, n_rows),
+        'original_transaction_datetime': start + pd.to_timedelta(rng.integers(0, 365 * 86400, n_rows), unit="s"),
+        'total_amount': rng.integers(1000, 500000, n_rows).astype(float),
+        'profit': rng.integers(100, 50000, n_rows).astype(float),
+        'hour_of_day': rng.integers(0, 24, n_rows),
+    })
+
+def reset_table(connection):
+    cursor = connection.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    cursor.execute(f"""
+        CREATE TABLE {BENCH_TABLE} (
+            transaction_id INT PRIMARY KEY,
+            minimart_id INT,
+            cashier_id INT,
+            original_transaction_datetime DATETIME,
+            total_amount DECIMAL(12, 2),
+            profit DECIMAL(12, 2),
+            hour_of_day INT
+        )
+    """)
+    connection.commit()
+    cursor.close()
+
+def run_benchmark(n_rows, batch_sizes, strategies=STRATEGIES):
+    df = make_rows(n_rows)
+    connection = get_connection('staging')
+    results = []
+    try:
+        for strategy in strategies:
+            for batch_size in batch_sizes:
+                reset_table(connection)
+                start = time.perf_counter()
+                loaded = bulk_load(connection, df, BENCH_TABLE, strategy=strategy, batch_size=batch_size)
+                seconds = time.perf_counter() - start
+                results.append({'strategy': strategy, 'batch_size': batch_size, 'rows': loaded,
+                                'seconds': round(seconds, 3), 'rows_per_sec': round(loaded / seconds) if seconds else 0})
+        cursor = connection.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        cursor.close()
+    finally:
+        connection.close()
+    return pd.DataFrame(results)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1000, 5000, 20000])
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=list(STRATEGIES))
+    args = parser.parse_args()
+
+    print(run_benchmark(args.rows, args.batch_sizes, args.strategies).to_string(index=False))
\ No newline at end of file
@@ -0,0 +1,70 @@
+"""
+Times the vectorized delivery planner on a synthetic Gudang and checks the
+allocation constraints.
+
+Usage:
+    python -m benchmarks.delivery_planner_benchmark --stores 2000 --items 1000 --scarcity 0.6
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from warehouse_interaction.generate_delivery import plan_deliveries
+
+def make_gudang(n_stores, n_items, density, scarcity, seed=42):
+    """
+    Builds restock rows for n_stores x n_items (keeping `density` of the pairs),
+    inventory covering `scarcity` of the total request per item, and a
+    capacity of 80% of the stock.
+    """
+    rng = np.random.default_rng(seed)
+    pairs = np.flatnonzero(rng.random(n_stores * n_items) < density)
+    minimart_id = pairs // n_items + 1
+    barang_id = pairs % n_items + 1
+    total_sold = rng.integers(0, 200, len(pairs))
+    df_restock = pd.DataFrame({
+        'minimart_id': minimart_id,
+        'minimart_nama': pd.Categorical([f"Minimart {i}" for i in minimart_id]),
+        'barang_id': barang_id,
+        'barang_nama': pd.Categorical([f"Barang {i}" for i in barang_id]),
+        'total_sold': total_sold,
+        'current_stock': rng.integers(0, 150, len(pairs)),
+    })
+    requested = np.maximum(total_sold * 2 - df_restock['current_stock'].to_numpy(), 0)
+    per_item = np.bincount(barang_id - 1, weights=requested, minlength=n_items)
+    inventory = pd.DataFrame({'barang_id': np.arange(1, n_items + 1),
+                              'inventory_stok': (per_item * scarcity * rng.uniform(0.5, 1.5, n_items)).astype(np.int64)})
+    capacity = int(inventory['inventory_stok'].sum() * 0.8)
+    return df_restock, inventory, capacity
+
+def check_plan(plan, inventory, capacity):
+    assert (plan['quantity_to_deliver'] <= plan['requested_quantity']).all(), "Allocated more than requested"
+    per_item = plan.groupby('barang_id')['quantity_to_deliver'].sum()
+    stock = inventory.set_index('barang_id')['inventory_stok'].reindex(per_item.index, fill_value=0)
+    assert (per_item <= stock).all(), "Allocated more than the Gudang holds"
+    assert plan['quantity_to_deliver'].sum() <= capacity, "Plan exceeds capacity"
+
+def run_benchmark(n_stores, n_items, density, scarcity, repeats=3):
+    df_restock, inventory, capacity = make_gudang(n_stores, n_items, density, scarcity)
+    results = []
+    for rule in ('fair_share', 'priority'):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            plan = plan_deliveries(df_restock, 1, inventory, capacity, rule)
+            timings.append(time.perf_counter() - start)
+        check_plan(plan, inventory, capacity)
+        results.append({'rule': rule, 'rows': len(df_restock), 'planned_rows': len(plan),
+                        'units': int(plan['quantity_to_deliver'].sum()), 'capacity': capacity,
+                        'best_seconds': round(min(timings), 4)})
+    return pd.DataFrame(results)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stores", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--density", type=float, default=0.5, help="Share of store x item pairs with sales.")
+    parser.add_argument("--scarcity", type=float, default=0.6, help="Stock as a share of the total request.")
+    args = parser.parse_args()
+
+    print(run_benchmark(args.stores, args.items, args.density, args.scarcity).to_string(index=False))
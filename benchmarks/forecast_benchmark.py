@@ -0,0 +1,71 @@
+"""
+Times a full fit against an incremental one-day update of the demand
+forecast model on synthetic daily sales with a weekly pattern, and compares
+its error with the flat average of the restock window that total_sold gives
+(scaled to the same horizon).
+
+Usage:
+    python -m benchmarks.forecast_benchmark --stores 500 --items 400 --days 112
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from config import etl_config as config
+from warehouse_interaction.demand_forecast import ForecastModel, series_keys
+
+WEEKLY_PATTERN = np.array([1.0, 1.0, 1.0, 1.0, 1.3, 1.8, 1.6])
+
+def make_daily_sales(n_stores, n_items, n_days, seed=42):
+    """Poisson daily sales per store x item around a gamma-distributed base rate."""
+    rng = np.random.default_rng(seed)
+    minimart_id = np.repeat(np.arange(1, n_stores + 1), n_items)
+    barang_id = np.tile(np.arange(1, n_items + 1), n_stores)
+    base = rng.gamma(1.0, 2.0, len(minimart_id))
+    days = pd.date_range(pd.Timestamp.today().normalize() - pd.Timedelta(days=n_days), periods=n_days)
+    frames = []
+    for day in days:
+        quantity = rng.poisson(base * WEEKLY_PATTERN[day.dayofweek])
+        sold = quantity > 0
+        frames.append(pd.DataFrame({'tanggal': day, 'minimart_id': minimart_id[sold],
+                                    'barang_id': barang_id[sold], 'quantity': quantity[sold]}))
+    expected = pd.Series(base, index=series_keys(minimart_id, barang_id))
+    return pd.concat(frames, ignore_index=True), days, expected
+
+def run_benchmark(n_stores, n_items, n_days):
+    daily, days, base = make_daily_sales(n_stores, n_items, n_days)
+    horizon = config.forecast_config['horizon_days']
+    alpha, gamma = config.forecast_config['alpha'], config.forecast_config['gamma']
+
+    model = ForecastModel(alpha, gamma)
+    start = time.perf_counter()
+    model.fold(daily[daily['tanggal'] < days[-1]], days[0], days[-1])
+    full_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    model.fold(daily[daily['tanggal'] == days[-1]], days[-1], days[-1] + pd.Timedelta(days=1))
+    incremental_seconds = time.perf_counter() - start
+
+    forecast = model.forecast(days[-1] + pd.Timedelta(days=1), horizon)
+    keys = series_keys(forecast['minimart_id'], forecast['barang_id'])
+    dows = pd.date_range(days[-1] + pd.Timedelta(days=1), periods=horizon).dayofweek
+    expected = base.reindex(keys).to_numpy() * WEEKLY_PATTERN[dows].sum()
+
+    # total_sold over the restock window (all history by default), as a daily average over the same horizon
+    lookback = config.partition_config['restock_lookback_days'] or n_days
+    window = daily[daily['tanggal'] > days[-1] - pd.Timedelta(days=lookback)]
+    total_sold = window.groupby(series_keys(window['minimart_id'], window['barang_id']))['quantity'].sum()
+    window_average = total_sold.reindex(keys, fill_value=0).to_numpy() / lookback * horizon
+
+    return {'daily_rows': len(daily), 'series': len(model.keys), 'full_fit_seconds': round(full_seconds, 4),
+            'incremental_seconds': round(incremental_seconds, 4),
+            'forecast_mae': round(np.mean(np.abs(forecast['forecast_quantity'].to_numpy() - expected)), 3),
+            'window_average_mae': round(np.mean(np.abs(window_average - expected)), 3)}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stores", type=int, default=500)
+    parser.add_argument("--items", type=int, default=400)
+    parser.add_argument("--days", type=int, default=112)
+    args = parser.parse_args()
+
+    print(pd.Series(run_benchmark(args.stores, args.items, args.days)).to_string())
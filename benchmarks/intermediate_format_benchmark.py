@@ -0,0 +1,63 @@
+"""
+Compares the intermediate hand-off formats (write time, read time, file size).
+
+Usage:
+    python -m benchmarks.intermediate_format_benchmark --rows 1000000
+
+Runs on synthetic isi_transaksi-like data; no database is needed.
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from etl.intermediate import FORMAT_EXTENSIONS, apply_schema, write_frame, read_frame
+
+def make_rows(n_rows, seed=42):
+    """Builds a synthetic extracted transaksi batch."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2024-01-01")
+    return pd.DataFrame({
+        'transaksi_id': np.arange(1, n_rows + 1, dtype=np.int64),
+        'minimart_id': rng.integers(1, 500, n_rows),
+        'pegawai_id': rng.integers(1, 5000, n_rows),
+        'tanggal_waktu': start + pd.to_timedelta(rng.integers(0, 365 * 86400, n_rows), unit="s"),
+        'transaksi_total': rng.integers(1000, 500000, n_rows),
+        'transaksi_pembayaran': rng.integers(1000, 600000, n_rows),
+        'transaksi_kembalian': rng.integers(0, 100000, n_rows),
+    })
+
+def run_benchmark(n_rows, formats=tuple(FORMAT_EXTENSIONS)):
+    df = make_rows(n_rows)
+    expected_dtypes = apply_schema(df.copy(), 'transaksi').dtypes
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for fmt in formats:
+            base_path = os.path.join(tmp_dir, f"bench_{fmt}")
+
+            start = time.perf_counter()
+            path = write_frame(df, base_path, schema='transaksi', fmt=fmt)
+            write_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            df_read = read_frame(path, schema='transaksi')
+            read_seconds = time.perf_counter() - start
+
+            results.append({
+                'format': os.path.splitext(path)[1].lstrip('.'),
+                'rows': len(df_read),
+                'write_s': round(write_seconds, 3),
+                'read_s': round(read_seconds, 3),
+                'size_mb': round(os.path.getsize(path) / 2**20, 2),
+                'dtypes_preserved': df_read.dtypes.equals(expected_dtypes),
+            })
+    return pd.DataFrame(results)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--formats", nargs="+", choices=list(FORMAT_EXTENSIONS), default=list(FORMAT_EXTENSIONS))
+    args = parser.parse_args()
+
+    print(run_benchmark(args.rows, args.formats).to_string(index=False))
\ No newline at end of file
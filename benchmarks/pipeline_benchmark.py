@@ -0,0 +1,205 @@
+"""
+Times and memory-profiles every pipeline stage on synthetic data at several
+scale factors, against a local database.
+
+For each scale the source database is repopulated (benchmarks/synthetic_data.py),
+the DW fact and aggregate tables are emptied, and then extract, transform,
+the staging and DW loaders, the daily summary, the restock download and the
+delivery plan are run and measured in turn. Results are written as JSON;
+pass --compare with an earlier results file to flag regressions.
+
+Usage:
+    python -m benchmarks.pipeline_benchmark --scales 1000 100000 1000000 --output bench.json
+    python -m benchmarks.pipeline_benchmark --scales 100000000 --streaming --output big.json
+
+Every database in config must be local; the harness refuses to run otherwise.
+"""
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+from config import etl_config as config
+from db.connection_pool import get_connection, close_all_pools
+from benchmarks.synthetic_data import populate_source, check_local, dataset_sizes
+from etl.extract import extract_delta
+from etl.transform import transform_transactions_data, load_transformed_to_staging
+from etl.load import load_from_staging_to_dw, clear_staging, reset_dimension_cache
+from etl.stream import run_streaming_etl
+from reports.send_report import generate_daily_summary
+from warehouse_interaction.download_report import download_restocking_data
+from warehouse_interaction.generate_delivery import generate_delivery_plan
+
+DW_BENCH_TABLES = ["agg_daily_store_item", "agg_daily_store_cashier", "agg_daily_store_hour", "fact_sales"]
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (ru_maxrss is in KiB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def measure(name, func, *args, rows=None):
+    """
+    Runs one stage under tracemalloc.
+
+    Returns:
+        (result, stats) where stats holds seconds, peak traced memory and the
+        process peak RSS after the stage. rows may be a callable of the result.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    stats = {'stage': name, 'seconds': round(seconds, 4), 'peak_traced_mb': round(peak / 2**20, 2),
+             'peak_rss_mb': round(peak_rss_mb(), 1)}
+    if rows is not None:
+        stats['rows'] = int(rows(result) if callable(rows) else rows)
+    return result, stats
+
+def reset_dw():
+    """Empties the DW fact and aggregate tables so every scale loads from scratch."""
+    connection = get_connection('dw')
+    try:
+        cursor = connection.cursor()
+        for table_name in DW_BENCH_TABLES:
+            cursor.execute(f"DELETE FROM {table_name}")
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+    reset_dimension_cache()
+
+def run_batch_stages(date_range):
+    """Extract, transform and both loaders on the whole dataset in memory."""
+    stages = []
+    source_conn = get_connection('oltp')
+    try:
+        (df_transaksi, df_isi_transaksi, _), stats = measure(
+            "extract", extract_delta, source_conn, date_range, rows=lambda r: len(r[1]))
+        stages.append(stats)
+    finally:
+        source_conn.close()
+
+    transformed_df, stats = measure("transform", transform_transactions_data, df_transaksi, df_isi_transaksi,
+                                    rows=len)
+    stages.append(stats)
+    del df_transaksi
+
+    staging_conn, dw_conn = get_connection('staging'), get_connection('dw')
+    try:
+        loaded, stats = measure("load_staging", load_transformed_to_staging, staging_conn, transformed_df,
+                                df_isi_transaksi, rows=len(transformed_df))
+        if not loaded:
+            raise RuntimeError("Loading the batch into staging failed; see transformation.log")
+        stages.append(stats)
+        loaded, stats = measure("load_dw", load_from_staging_to_dw, dw_conn, staging_conn, rows=len(transformed_df))
+        if not loaded:
+            raise RuntimeError("Loading staging into the DW failed; see loading.log")
+        stages.append(stats)
+        clear_staging(staging_conn)
+    finally:
+        staging_conn.close()
+        dw_conn.close()
+    return stages
+
+def run_streaming_stages(chunk_size):
+    """Extract, transform and load chunk by chunk (for scales that do not fit in memory)."""
+    result, stats = measure("stream_etl", run_streaming_etl, chunk_size, False, False)
+    if not result or result['failed']:
+        raise RuntimeError("Streaming ETL failed; see streaming.log")
+    stats['rows'] = int(result['rows'])
+    return [stats]
+
+def run_report_stages(gudang_id, minimart_id):
+    """Daily summary, restock download and delivery plan for one store / warehouse."""
+    stages = []
+    connection = get_connection('dw')
+    with tempfile.TemporaryDirectory() as download_path:
+        try:
+            _, stats = measure("daily_summary", generate_daily_summary, connection, minimart_id)
+            stages.append(stats)
+            filepath, stats = measure("download_restock", download_restocking_data, connection, gudang_id,
+                                      download_path)
+            stages.append(stats)
+        finally:
+            connection.close()
+        if filepath:
+            _, stats = measure("delivery_plan", generate_delivery_plan, filepath, gudang_id, rows=len)
+            stages.append(stats)
+    return stages
+
+def run_scale(scale, seed, lines_per_transaction, days, streaming, chunk_size):
+    sizes = dataset_sizes(scale, lines_per_transaction)
+    end = pd.Timestamp.today().normalize() + pd.Timedelta(days=1)
+    date_range = (str(end - pd.Timedelta(days=days)), str(end))
+
+    counts, populate_stats = measure("populate_source", populate_source, scale, seed, lines_per_transaction,
+                                     1000000, None, days)
+    populate_stats['rows'] = counts['isi_transaksi']
+    reset_dw()
+
+    stages = [populate_stats]
+    stages += run_streaming_stages(chunk_size) if streaming else run_batch_stages(date_range)
+    stages += run_report_stages(gudang_id=1, minimart_id=1)
+    return {'scale': scale, 'sizes': sizes, 'stages': stages}
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path, threshold):
+    """Prints stages that got slower than the baseline by more than `threshold` (a ratio)."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    base_seconds = {(run['scale'], stage['stage']): stage['seconds']
+                    for run in baseline['runs'] for stage in run['stages']}
+    regressions = []
+    for run in results['runs']:
+        for stage in run['stages']:
+            before = base_seconds.get((run['scale'], stage['stage']))
+            if before and stage['seconds'] > before * threshold:
+                regressions.append(f"scale {run['scale']} {stage['stage']}: {before}s -> {stage['seconds']}s")
+    print("\n".join(regressions) if regressions else "No regressions against the baseline.")
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 100000, 1000000],
+                        help="Scale factors (isi_transaksi line items).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--lines-per-transaction", type=int, default=4)
+    parser.add_argument("--days", type=int, default=28, help="Days of sales, ending today.")
+    parser.add_argument("--streaming", action="store_true", help="Use the chunked streaming ETL.")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Earlier results file to check for regressions.")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Slowdown ratio reported as a regression.")
+    args = parser.parse_args()
+
+    check_local(config.db_config, config.staging_config, config.dw_config)
+    # Report queries would otherwise be answered from the result cache
+    config.query_cache_config['enabled'] = False
+
+    results = {'revision': git_revision(), 'timestamp': pd.Timestamp.now().isoformat(),
+               'python': platform.python_version(), 'pandas': pd.__version__, 'seed': args.seed,
+               'streaming': args.streaming, 'runs': []}
+    try:
+        for scale in args.scales:
+            results['runs'].append(run_scale(scale, args.seed, args.lines_per_transaction, args.days,
+                                             args.streaming, args.chunk_size))
+            print(pd.DataFrame(results['runs'][-1]['stages']).to_string(index=False))
+    finally:
+        close_all_pools()
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.compare and compare(results, args.compare, args.threshold):
+        raise SystemExit(1)
@@ -0,0 +1,176 @@
+"""
+Deterministic synthetic data for the usaha_mulia source schema (db/create_db.sql).
+
+The scale factor is the number of isi_transaksi line items; every other table
+is sized from it. The same (scale, seed, end_date) always produces the same
+rows, and transactions are generated in chunks so scales far beyond memory
+(e.g. 100M line items) can be streamed into the database.
+
+Usage:
+    python -m benchmarks.synthetic_data --scale 1000000 --populate
+"""
+import argparse
+import numpy as np
+import pandas as pd
+from config import etl_config as config
+from db.connection_pool import get_connection
+from etl.bulk_load import bulk_load
+
+# Parent tables first; deleted in reverse order
+SOURCE_TABLES = ["kota", "pemilik", "gudang", "minimart", "pegawai", "barang", "inventory",
+                 "transaksi", "isi_transaksi"]
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+def dataset_sizes(scale, lines_per_transaction=4):
+    """Row counts of each table for a scale factor (line items)."""
+    n_minimart = int(np.clip(scale // 50000, 5, 2000))
+    n_gudang = max(1, n_minimart // 10)
+    return {
+        'kota': max(1, n_gudang // 2),
+        'pemilik': n_minimart // 2 + 1,
+        'gudang': n_gudang,
+        'minimart': n_minimart,
+        'pegawai': n_minimart * 3,
+        'barang': int(np.clip(scale // 100, 50, 20000)),
+        'transaksi': max(1, scale // lines_per_transaction),
+        'isi_transaksi': max(1, scale // lines_per_transaction) * lines_per_transaction,
+    }
+
+def generate_master_data(scale, seed=42, lines_per_transaction=4):
+    """Generates every table except transaksi and isi_transaksi."""
+    sizes = dataset_sizes(scale, lines_per_transaction)
+    rng = np.random.default_rng([seed, 0])
+    n_kota, n_gudang, n_minimart = sizes['kota'], sizes['gudang'], sizes['minimart']
+    n_pemilik, n_pegawai, n_barang = sizes['pemilik'], sizes['pegawai'], sizes['barang']
+
+    kota = pd.DataFrame({'kota_id': np.arange(1, n_kota + 1),
+                         'kota_nama': [f"Kota {i}" for i in range(1, n_kota + 1)]})
+    pemilik = pd.DataFrame({'pemilik_id': np.arange(1, n_pemilik + 1),
+                            'pemilik_nama': [f"Pemilik {i}" for i in range(1, n_pemilik + 1)],
+                            'pemilik_email': [f"pemilik{i}@example.com" for i in range(1, n_pemilik + 1)]})
+    gudang = pd.DataFrame({'gudang_id': np.arange(1, n_gudang + 1),
+                           'kota_id': (np.arange(n_gudang) % n_kota) + 1,
+                           'gudang_kapasitas': rng.integers(50000, 200000, n_gudang)})
+    minimart_gudang = (np.arange(n_minimart) % n_gudang) + 1
+    minimart = pd.DataFrame({'minimart_id': np.arange(1, n_minimart + 1),
+                             'kota_id': gudang['kota_id'].to_numpy()[minimart_gudang - 1],
+                             'pemilik_id': (np.arange(n_minimart) % n_pemilik) + 1,
+                             'gudang_id': minimart_gudang,
+                             'minimart_nama': [f"Minimart {i}" for i in range(1, n_minimart + 1)],
+                             'minimart_alamat': [f"Jalan {i}" for i in range(1, n_minimart + 1)]})
+    pegawai = pd.DataFrame({'pegawai_id': np.arange(1, n_pegawai + 1),
+                            'minimart_id': (np.arange(n_pegawai) % n_minimart) + 1,
+                            'pegawai_nama': [f"Pegawai {i}" for i in range(1, n_pegawai + 1)],
+                            'pegawai_jabatan': "Kasir"})
+    harga_beli = rng.integers(5, 1000, n_barang) * 100
+    barang = pd.DataFrame({'barang_id': np.arange(1, n_barang + 1),
+                           'barang_nama': [f"Barang {i}" for i in range(1, n_barang + 1)],
+                           'barang_harga_beli': harga_beli,
+                           'barang_harga_jual': harga_beli + rng.integers(1, 300, n_barang) * 10,
+                           'barang_stok': rng.integers(0, 1000, n_barang)})
+    inventory = pd.DataFrame({'barang_id': np.tile(barang['barang_id'].to_numpy(), n_gudang),
+                              'gudang_id': np.repeat(gudang['gudang_id'].to_numpy(), n_barang),
+                              'inventory_stok': rng.integers(0, 5000, n_barang * n_gudang)})
+    return {'kota': kota, 'pemilik': pemilik, 'gudang': gudang, 'minimart': minimart,
+            'pegawai': pegawai, 'barang': barang, 'inventory': inventory}
+
+def iter_transaction_chunks(scale, master, seed=42, lines_per_transaction=4, chunk_lines=1000000,
+                            end_date=None, days=28):
+    """
+    Yields (transaksi, isi_transaksi) chunks covering `days` days up to end_date.
+
+    Each chunk has its own random stream, so chunk k is identical whatever the
+    chunk before it contained. A transaction's lines are distinct barang, and
+    its total, payment and change are consistent with them.
+    """
+    end_date = pd.Timestamp(end_date or pd.Timestamp.today()).normalize() + pd.Timedelta(days=1)
+    start_date = end_date - pd.Timedelta(days=days)
+    n_transactions = dataset_sizes(scale, lines_per_transaction)['transaksi']
+    per_chunk = max(1, chunk_lines // lines_per_transaction)
+    pegawai_minimart = master['pegawai']['minimart_id'].to_numpy()
+    harga_jual = master['barang']['barang_harga_jual'].to_numpy()
+    n_barang = len(harga_jual)
+    span_seconds = days * 86400
+
+    for chunk_index, first in enumerate(range(0, n_transactions, per_chunk), start=1):
+        n = min(per_chunk, n_transactions - first)
+        rng = np.random.default_rng([seed, chunk_index])
+        transaksi_id = np.arange(first + 1, first + n + 1)
+        pegawai_id = rng.integers(1, len(pegawai_minimart) + 1, n)
+        # Timestamps increase with transaksi_id, as they do in the source
+        offsets = (first + np.arange(n)) * span_seconds // n_transactions
+
+        lines = n * lines_per_transaction
+        base = np.repeat(rng.integers(0, n_barang, n), lines_per_transaction)
+        step = np.tile(np.arange(lines_per_transaction), n)
+        barang_id = (base + step * max(1, n_barang // lines_per_transaction)) % n_barang + 1
+        jumlah = rng.integers(1, 10, lines)
+        harga = harga_jual[barang_id - 1]
+        total = (jumlah * harga).reshape(n, lines_per_transaction).sum(axis=1)
+        pembayaran = (total // 1000 + rng.integers(1, 50, n)) * 1000
+
+        transaksi = pd.DataFrame({
+            'transaksi_id': transaksi_id,
+            'minimart_id': pegawai_minimart[pegawai_id - 1],
+            'pegawai_id': pegawai_id,
+            'tanggal_waktu': start_date + pd.to_timedelta(offsets, unit="s"),
+            'transaksi_total': total,
+            'transaksi_pembayaran': pembayaran,
+            'transaksi_kembalian': pembayaran - total,
+        })
+        isi_transaksi = pd.DataFrame({
+            'transaksi_id': np.repeat(transaksi_id, lines_per_transaction),
+            'barang_id': barang_id,
+            'isi_transaksi_jumlah': jumlah,
+            'harga_satuan': harga,
+        })
+        yield transaksi, isi_transaksi
+
+def check_local(*configs):
+    """Refuses to write synthetic data anywhere but a local database."""
+    for db_config in configs:
+        if db_config.get('host') not in LOCAL_HOSTS:
+            raise RuntimeError(f"Refusing to write synthetic data to non-local host {db_config.get('host')}")
+
+def populate_source(scale, seed=42, lines_per_transaction=4, chunk_lines=1000000, end_date=None, days=28):
+    """
+    Replaces the contents of the (local) source database with a synthetic dataset.
+
+    Returns:
+        A dictionary of table name -> rows written.
+    """
+    check_local(config.db_config)
+    master = generate_master_data(scale, seed, lines_per_transaction)
+    connection = get_connection('oltp')
+    counts = {}
+    try:
+        cursor = connection.cursor()
+        for table_name in reversed(SOURCE_TABLES):
+            cursor.execute(f"DELETE FROM {table_name}")
+        connection.commit()
+        cursor.close()
+
+        for table_name, df in master.items():
+            counts[table_name] = bulk_load(connection, df, table_name)
+        counts['transaksi'] = counts['isi_transaksi'] = 0
+        for transaksi, isi_transaksi in iter_transaction_chunks(scale, master, seed, lines_per_transaction,
+                                                                chunk_lines, end_date, days):
+            counts['transaksi'] += bulk_load(connection, transaksi, "transaksi")
+            counts['isi_transaksi'] += bulk_load(connection, isi_transaksi, "isi_transaksi")
+        return counts
+    finally:
+        connection.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=1000000, help="Number of isi_transaksi line items.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--lines-per-transaction", type=int, default=4)
+    parser.add_argument("--days", type=int, default=28, help="Days of sales, ending today.")
+    parser.add_argument("--populate", action="store_true", help="Write the dataset to the local source database.")
+    args = parser.parse_args()
+
+    if args.populate:
+        print(populate_source(args.scale, args.seed, args.lines_per_transaction, days=args.days))
+    else:
+        print(pd.Series(dataset_sizes(args.scale, args.lines_per_transaction)).to_string())
@@ -0,0 +1,103 @@
+"""
+Compares transform_transactions_data with the previous merge/rename/fillna
+implementation on synthetic data (time and peak traced memory).
+
+Usage:
+    python -m benchmarks.transform_benchmark --transactions 1000000 --lines-per-transaction 4
+"""
+import argparse
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from etl.intermediate import apply_schema
+from etl.transform import transform_transactions_data
+
+def make_source(n_transactions, lines_per_transaction, seed=42):
+    """Builds synthetic transaksi and isi_transaksi frames with the source dtypes."""
+    rng = np.random.default_rng(seed)
+    n_lines = n_transactions * lines_per_transaction
+    start = pd.Timestamp("2024-01-01")
+    df_transaksi = pd.DataFrame({
+        'transaksi_id': np.arange(1, n_transactions + 1),
+        'minimart_id': rng.integers(1, 500, n_transactions),
+        'pegawai_id': rng.integers(1, 5000, n_transactions),
+        'tanggal_waktu': start + pd.to_timedelta(rng.integers(0, 365 * 86400, n_transactions), unit="s"),
+        'transaksi_total': rng.integers(1000, 500000, n_transactions),
+        'transaksi_pembayaran': rng.integers(1000, 600000, n_transactions),
+        'transaksi_kembalian': rng.integers(0, 100000, n_transactions),
+    })
+    df_isi_transaksi = pd.DataFrame({
+        'transaksi_id': np.repeat(df_transaksi['transaksi_id'].to_numpy(), lines_per_transaction),
+        'barang_id': rng.integers(1, 20000, n_lines),
+        'isi_transaksi_jumlah': rng.integers(1, 10, n_lines),
+        'harga_satuan': rng.integers(500, 100000, n_lines),
+    })
+    return df_transaksi, df_isi_transaksi
+
+def legacy_transform(df_transaksi, df_isi_transaksi):
+    """The previous implementation, kept here as the benchmark baseline."""
+    df_isi_transaksi['item_total'] = df_isi_transaksi['isi_transaksi_jumlah'] * df_isi_transaksi['harga_satuan']
+    df_total_amount = df_isi_transaksi.groupby('transaksi_id')['item_total'].sum().reset_index()
+    df_transformed = pd.merge(df_transaksi, df_total_amount, on='transaksi_id', how='left')
+    df_transformed['transaction_datetime'] = pd.to_datetime(df_transformed['tanggal_waktu'])
+    df_transformed['profit'] = df_transformed['item_total']
+    df_transformed['hour_of_day'] = df_transformed['transaction_datetime'].dt.hour
+    df_transformed = df_transformed.rename(columns={
+        'transaksi_id': 'transaction_id',
+        'pegawai_id': 'cashier_id',
+        'tanggal_waktu': 'original_transaction_datetime',
+        'transaksi_total': 'original_total_amount',
+        'transaksi_pembayaran': 'payment_amount',
+        'transaksi_kembalian': 'change_amount',
+        'item_total': 'total_amount'
+    })
+    df_transformed = df_transformed.fillna(0)
+    return df_transformed.drop_duplicates(subset=['transaction_id'])
+
+def measure(func, df_transaksi, df_isi_transaksi):
+    # Fresh copies so the legacy version's in-place column does not leak between runs
+    df_transaksi, df_isi_transaksi = df_transaksi.copy(), df_isi_transaksi.copy()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(df_transaksi, df_isi_transaksi)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak / 2**20
+
+def run_benchmark(n_transactions, lines_per_transaction):
+    raw_transaksi, raw_isi_transaksi = make_source(n_transactions, lines_per_transaction)
+    typed_transaksi = apply_schema(raw_transaksi, 'transaksi')
+    typed_isi_transaksi = apply_schema(raw_isi_transaksi, 'isi_transaksi')
+
+    runs = [
+        ('legacy (int64 source)', legacy_transform, raw_transaksi, raw_isi_transaksi),
+        ('vectorized (int64 source)', transform_transactions_data, raw_transaksi, raw_isi_transaksi),
+        ('vectorized (typed source)', transform_transactions_data, typed_transaksi, typed_isi_transaksi),
+    ]
+    results = []
+    totals = {}
+    for name, func, df_transaksi, df_isi_transaksi in runs:
+        result, seconds, peak_mb = measure(func, df_transaksi, df_isi_transaksi)
+        totals[name] = result['total_amount'].to_numpy(dtype='int64')
+        results.append({
+            'implementation': name,
+            'seconds': round(seconds, 3),
+            'peak_traced_mb': round(peak_mb, 1),
+            'input_mb': round((df_transaksi.memory_usage(deep=True).sum()
+                               + df_isi_transaksi.memory_usage(deep=True).sum()) / 2**20, 1),
+            'output_mb': round(result.memory_usage(deep=True).sum() / 2**20, 1),
+        })
+
+    baseline = totals['legacy (int64 source)']
+    assert all(np.array_equal(baseline, other) for other in totals.values()), "Implementations disagree"
+    return pd.DataFrame(results)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=1000000)
+    parser.add_argument("--lines-per-transaction", type=int, default=4)
+    args = parser.parse_args()
+
+    print(run_benchmark(args.transactions, args.lines_per_transaction).to_string(index=False))
\ No newline at end of file
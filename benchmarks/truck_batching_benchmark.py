@@ -0,0 +1,67 @@
+"""
+Times truck batching on a synthetic delivery plan and checks the truck
+constraints.
+
+Usage:
+    python -m benchmarks.truck_batching_benchmark --stores 500 --items 200 --kota 8
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from config import etl_config as config
+from warehouse_interaction.truck_batching import batch_deliveries, summarize_trucks, truck_lower_bound
+
+def make_plan(n_stores, n_items, n_kota, density, seed=42):
+    """Builds a delivery plan for n_stores x n_items (keeping `density` of the pairs) spread over n_kota."""
+    rng = np.random.default_rng(seed)
+    pairs = np.flatnonzero(rng.random(n_stores * n_items) < density)
+    minimart_id = pairs // n_items + 1
+    barang_id = pairs % n_items + 1
+    quantity = rng.integers(1, 120, len(pairs))
+    kota_of_store = rng.integers(1, n_kota + 1, n_stores + 1)
+    return pd.DataFrame({
+        'minimart_id': minimart_id,
+        'barang_id': barang_id,
+        'barang_nama': pd.Categorical([f"Barang {i}" for i in barang_id]),
+        'requested_quantity': quantity,
+        'quantity_to_deliver': quantity,
+        'kota_id': kota_of_store[minimart_id],
+        'gudang_id': 1,
+    })
+
+def check_manifest(plan, manifest):
+    summary = summarize_trucks(manifest)
+    eps = 1e-6
+    assert (summary['weight_kg'] <= config.truck_config['max_weight_kg'] + eps).all(), "Truck over weight"
+    assert (summary['volume_m3'] <= config.truck_config['max_volume_m3'] + eps).all(), "Truck over volume"
+    assert (summary['stops'] <= config.truck_config['max_stops']).all(), "Truck over the stop limit"
+    assert (manifest.groupby('truck_id')['kota_id'].nunique() == 1).all(), "Truck serves more than one kota"
+    delivered = manifest.groupby(['minimart_id', 'barang_id'])['quantity'].sum()
+    planned = plan.set_index(['minimart_id', 'barang_id'])['quantity_to_deliver'].sort_index()
+    assert delivered.sort_index().equals(planned), "Manifest quantities do not match the plan"
+    return summary
+
+def run_benchmark(n_stores, n_items, n_kota, density, repeats=3):
+    plan = make_plan(n_stores, n_items, n_kota, density)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        manifest = batch_deliveries(plan, 1)
+        timings.append(time.perf_counter() - start)
+    summary = check_manifest(plan, manifest)
+    return {'rows': len(plan), 'stops': plan['minimart_id'].nunique(), 'trucks': len(summary),
+            'lower_bound': truck_lower_bound(manifest),
+            'mean_weight_utilisation': round(summary['weight_utilisation'].mean(), 3),
+            'mean_volume_utilisation': round(summary['volume_utilisation'].mean(), 3),
+            'best_seconds': round(min(timings), 4)}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stores", type=int, default=500)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--kota", type=int, default=8)
+    parser.add_argument("--density", type=float, default=0.2, help="Share of store x item pairs in the plan.")
+    args = parser.parse_args()
+
+    print(pd.Series(run_benchmark(args.stores, args.items, args.kota, args.density)).to_string())
@@ -10,13 +10,178 @@ dw_config = {  # Data Warehouse config
     'user': 'root',
     'password': 'passwd',
     'host': '127.0.0.1',
-    'database': 'db'
+    'database': 'db',
+    'allow_local_infile': True  # Needed for the LOAD DATA bulk-load strategy
 }
 
 staging_config = {  # Staging database config 
     'user': 'root',
     'password': 'passwd',
     'host': '127.0.0.1',
-    'database': 'db'
+    'database': 'db',
+    'allow_local_infile': True  # Needed for the LOAD DATA bulk-load strategy
+}
+
+# Incremental extraction state (high-water marks per source table)
+watermark_file = "etl_watermarks.json"
+
+# Streaming ETL: number of source rows read per server-side cursor fetch
+stream_chunk_size = 10000
+
+# Bulk loading into staging and the DW
+bulk_load_config = {
+    'strategy': 'multirow',  # 'multirow', 'load_data' or 'executemany'
+    'batch_size': 5000,      # Rows per INSERT / LOAD DATA batch, committed individually
+    'tmp_dir': None          # Directory for LOAD DATA files; point at /dev/shm to keep them in memory
+}
+
+# DW load mode: 'upsert' makes re-runs idempotent (new/changed dimension rows
+# only, facts deduplicated on transaction_id); 'insert' appends blindly
+dw_load_mode = 'upsert'
+
+# How staging rows reach the DW: 'pushdown' runs set-based INSERT ... SELECT
+# statements inside MySQL (the source, staging and the DW must share a
+# server), 'client' round-trips the rows through pandas, 'auto' picks
+# pushdown when possible
+dw_load_strategy = 'auto'
+
+# Hour-grain calendar pre-populated into dim_waktu
+calendar_config = {
+    'start_date': '2024-01-01',
+    'years_ahead': 2
+}
+
+# Outgoing mail for investor reports. For local testing point this at a
+# debugging server, e.g. `python -m aiosmtpd -n -l localhost:1025` with
+# host 'localhost', port 1025, use_ssl False and an empty username.
+smtp_config = {
+    'host': 'smtp.gmail.com',
+    'port': 465,
+    'use_ssl': True,
+    'starttls': False,
+    'username': 'your_company_email@example.com',
+    'password': 'your_email_password',
+    'sender': 'your_company_email@example.com',
+    'timeout': 30
+}
+
+# Investor report dispatch
+report_dispatch_config = {
+    'workers': 8,           # Concurrent report builders (and DW connections / SMTP sessions)
+    'max_retries': 3,       # Send attempts per message
+    'backoff_seconds': 2    # Base delay, doubled after each failed attempt
+}
+
+# Restock export for all Gudangs
+restock_export_config = {
+    'workers': 4  # Concurrent per-Gudang file writers
 }
 
+# Format of the hand-off files between stages (extract -> transform,
+# restock download -> delivery planning): 'parquet', 'arrow' (Arrow IPC /
+# Feather v2) or 'csv'. Parquet and Arrow need pyarrow.
+intermediate_format_config = {
+    'format': 'parquet',
+    'compression': 'zstd'
+}
+
+# In-process pipeline runner (pipeline.py)
+pipeline_config = {
+    'max_workers': 4,                        # Independent stages run concurrently
+    'state_file': 'pipeline_state.json',     # Completed stages of the last run, for resume
+    'checkpoint_dir': 'pipeline_checkpoints',
+    'restock_path': 'reports',
+    'delivery_path': 'deliveries'
+}
+
+# Shared connection pools (db/connection_pool.py), one per database target
+pool_config = {
+    'size': 8,                 # Maximum connections per target
+    'connect_timeout': 10,     # Seconds to wait for the MySQL handshake
+    'checkout_timeout': 30,    # Seconds to wait for a free connection
+    'recycle_seconds': 3600,   # Reconnect connections older than this
+    'pre_ping': True,          # Check a connection is alive before handing it out
+    'retries': 3,              # Connection attempts before giving up
+    'backoff_seconds': 1       # Base delay between attempts, doubled each time
+}
+
+# Change-data-capture extraction from the OLTP binlog (etl/cdc.py). Needs
+# binlog_format=ROW and binlog_row_image=FULL on the source server.
+cdc_config = {
+    'server_id': 4101,               # Unique replica id used when reading the binlog
+    'offset_file': 'cdc_offsets.json',
+    'batch_max_rows': 5000,          # Flush a micro-batch after this many row events...
+    'poll_seconds': 5,               # ...or at the end of each pass over the binlog
+    'load_to_dw': True               # Also move each micro-batch from staging into the DW
+}
+
+# On-disk cache for DW report queries (db/query_cache.py). Entries expire
+# after ttl_seconds or as soon as etl/load.py bumps the DW load epoch.
+query_cache_config = {
+    'enabled': True,
+    'dir': 'query_cache',
+    'ttl_seconds': 6 * 3600,
+    'max_bytes': 512 * 2**20   # Least recently used entries are evicted beyond this
+}
+
+# Monthly partitions of fact_sales (db/partition_maintenance.py)
+partition_config = {
+    'months_ahead': 3,           # Keep empty partitions ready this many months ahead
+    'retention_months': None,    # Drop partitions older than this; None keeps all history
+    'restock_lookback_days': None  # Optional sales window (days) for the restock query; None reads all history
+}
+# Stage spans and metrics (instrumentation.py)
+metrics_config = {
+    'enabled': True,
+    'jsonl_file': 'metrics.jsonl',     # One JSON line per finished span
+    'prometheus_file': 'metrics.prom', # Rewritten after every pipeline run
+    'db_latency_buckets': [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30]
+}
+# Opt-in SQL profiling of pooled connections (db/query_profiler.py)
+query_profile_config = {
+    'enabled': False,
+    'slow_ms': 500,                       # Statements at least this slow get an EXPLAIN FORMAT=JSON plan
+    'top': 50,                            # Statements kept in the ranked report
+    'report_file': 'slow_queries.json'    # Rewritten after every pipeline run
+}
+# Delivery planning (warehouse_interaction/generate_delivery.py)
+delivery_planner_config = {
+    'target_multiplier': 2,          # Target stock = total_sold over the restock window x this, when there are no forecasts
+    'allocation_rule': 'fair_share', # How scarce gudang stock is split: 'fair_share' or 'priority'
+    'respect_capacity': True         # Cap each plan at gudang_kapasitas units
+}
+# Truck load batching (warehouse_interaction/truck_batching.py). barang has no
+# weight or volume columns, so per-unit defaults are used unless per-item
+# dimensions are passed in.
+truck_config = {
+    'max_weight_kg': 2000,
+    'max_volume_m3': 12.0,
+    'max_stops': 15,
+    'unit_weight_kg': 1.0,
+    'unit_volume_m3': 0.004
+}
+# Demand forecasting for restock targets (warehouse_interaction/demand_forecast.py).
+# Additive Holt-Winters smoothing with a weekly season; the model state is kept
+# in state_dir and only new complete days are folded in on each run.
+forecast_config = {
+    'alpha': 0.05,          # Level smoothing
+    'gamma': 0.05,          # Day-of-week season smoothing
+    'history_days': 112,    # Days read when the model is fitted from scratch
+    'horizon_days': 14,     # Target stock covers this many days of forecast demand
+    'prune_below': 0.01,    # Series whose level and season decay below this are dropped
+    'state_dir': 'forecast_state'
+}
+# Job scheduler (scheduler.py). Cron expressions are in local time; runs missed
+# while the scheduler was down are caught up once if newer than max_catch_up_hours.
+scheduler_config = {
+    'state_file': 'scheduler_state.json',
+    'thread_workers': 4,
+    'process_workers': 2,
+    'max_catch_up_hours': 24,
+    'jobs': {
+        'etl': '0 2 * * *',
+        'restock_planning': '0 */6 * * *',
+        'investor_reports': '0 22 * * *',
+        'extraction': '0 * * * *'   # etl/extract.py run standalone
+    }
+}
\ No newline at end of file
@@ -0,0 +1,209 @@
+import logging
+import queue
+import threading
+import time
+import mysql.connector
+from mysql.connector.errors import PoolError
+from config import etl_config as config
+from instrumentation import InstrumentedCursor
+from db.query_profiler import ProfilingCursor, profiling_enabled
+
+# Pool name -> attribute of config holding its connection settings
+TARGETS = {
+    'oltp': 'db_config',
+    'staging': 'staging_config',
+    'dw': 'dw_config',
+}
+
+class PooledConnection:
+    """
+    Proxy for a pooled MySQL connection.
+
+    Behaves like the underlying connection, except that close() hands it back
+    to the pool instead of closing the socket.
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        """Cursor whose statements are timed into the DB latency histogram (and profiled, if enabled)."""
+        cursor = self._raw.cursor(*args, **kwargs)
+        if profiling_enabled():
+            cursor = ProfilingCursor(cursor, self._pool.name)
+        return InstrumentedCursor(cursor, self._pool.name)
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool._release(self._raw, self._created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class ConnectionPool:
+    """
+    A bounded pool of MySQL connections to one database.
+
+    Connections are created lazily up to `size`, checked with a ping before
+    being handed out, recycled after `recycle_seconds`, and (re)connected
+    with retry and exponential backoff.
+    """
+
+    def __init__(self, name, db_config, size, connect_timeout, checkout_timeout,
+                 recycle_seconds, pre_ping, retries, backoff_seconds):
+        self.name = name
+        self.db_config = dict(db_config)
+        self.size = size
+        self.connect_timeout = connect_timeout
+        self.checkout_timeout = checkout_timeout
+        self.recycle_seconds = recycle_seconds
+        self.pre_ping = pre_ping
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+
+        self._idle = queue.LifoQueue()  # Most recently used first, so idle extras age out
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._stats = {'in_use': 0, 'created': 0, 'checkouts': 0, 'recycled': 0, 'ping_failures': 0,
+                       'connect_failures': 0, 'checkout_timeouts': 0, 'wait_seconds': 0.0}
+
+    def _count(self, stat, amount=1):
+        with self._lock:
+            self._stats[stat] += amount
+
+    def _connect(self):
+        for attempt in range(1, self.retries + 1):
+            try:
+                raw = mysql.connector.connect(connection_timeout=self.connect_timeout, **self.db_config)
+                self._count('created')
+                return raw
+            except mysql.connector.Error as err:
+                self._count('connect_failures')
+                logging.warning(f"Pool {self.name}: connect attempt {attempt}/{self.retries} failed: {err}")
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff_seconds * 2 ** (attempt - 1))
+
+    @staticmethod
+    def _discard(raw):
+        try:
+            raw.close()
+        except mysql.connector.Error:
+            pass
+
+    def _is_alive(self, raw):
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            self._count('ping_failures')
+            return False
+
+    def get_connection(self, timeout=None):
+        """
+        Checks out a connection, waiting up to `timeout` seconds for a free slot.
+
+        Raises:
+            PoolError: if no connection became free in time.
+            mysql.connector.Error: if a new connection could not be opened.
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=timeout):
+            self._count('checkout_timeouts')
+            raise PoolError(f"Pool {self.name} exhausted: no connection free after {timeout}s")
+        self._count('wait_seconds', time.perf_counter() - start)
+
+        try:
+            while True:
+                try:
+                    raw, created_at = self._idle.get_nowait()
+                except queue.Empty:
+                    raw, created_at = self._connect(), time.monotonic()
+                    break
+                if self.recycle_seconds and time.monotonic() - created_at > self.recycle_seconds:
+                    self._count('recycled')
+                    self._discard(raw)
+                    continue
+                if self.pre_ping and not self._is_alive(raw):
+                    self._discard(raw)
+                    continue
+                break
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._stats['in_use'] += 1
+            self._stats['checkouts'] += 1
+        return PooledConnection(self, raw, created_at)
+
+    def _release(self, raw, created_at):
+        try:
+            # Drop any open transaction so the next borrower starts clean
+            raw.rollback()
+            self._idle.put((raw, created_at))
+        except mysql.connector.Error:
+            self._discard(raw)
+        finally:
+            self._count('in_use', -1)
+            self._slots.release()
+
+    def metrics(self):
+        """Returns a snapshot of the pool's utilisation counters."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['size'] = self.size
+        stats['idle'] = self._idle.qsize()
+        stats['utilisation'] = stats['in_use'] / self.size if self.size else 0.0
+        return stats
+
+    def close_all(self):
+        """Closes every idle connection."""
+        while True:
+            try:
+                raw, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(raw)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(target):
+    """Returns the shared pool for 'oltp', 'staging' or 'dw', creating it on first use."""
+    with _pools_lock:
+        if target not in _pools:
+            if target not in TARGETS:
+                raise ValueError(f"Unknown database target: {target}")
+            _pools[target] = ConnectionPool(target, getattr(config, TARGETS[target]), **config.pool_config)
+        return _pools[target]
+
+def get_connection(target, timeout=None):
+    """Checks out a connection from the shared pool of a target. close() returns it."""
+    return get_pool(target).get_connection(timeout)
+
+def pool_metrics():
+    """Returns the utilisation metrics of every pool created so far."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {target: pool.metrics() for target, pool in pools.items()}
+
+def log_pool_metrics():
+    for target, stats in pool_metrics().items():
+        logging.info(f"Pool {target}: {stats}")
+
+def close_all_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
\ No newline at end of file
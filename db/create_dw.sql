@@ -42,9 +42,9 @@ CREATE TABLE dim_barang (
     barang_kategori VARCHAR(50)
 );
 
--- 6. Dimension Table: Waktu
+-- 6. Dimension Table: Waktu (hour grain, pre-populated by etl/dim_waktu.py)
 CREATE TABLE dim_waktu (
-    waktu_id INT PRIMARY KEY,
+    waktu_id INT PRIMARY KEY,  -- YYYYMMDDHH
     tanggal DATE,
     jam INT,
     hari VARCHAR(20),
@@ -54,8 +54,18 @@ CREATE TABLE dim_waktu (
 );
 
 -- 7. Fact Table: Sales
+--    RANGE partitioned by month on sales_datetime so date-bounded report and
+--    restock queries only touch the partitions they need. Monthly partitions
+--    are added ahead of time (and optionally retired) by
+--    db/partition_maintenance.py; run it once right after creating the DW.
+--    MySQL requires every unique key to include the partitioning column and
+--    does not support foreign keys on partitioned tables, so referential
+--    integrity is kept by etl/load.py loading dimension members first.
+--    One row per transaction line item; a transaction without line items is
+--    kept as one row with barang_id 0 (no dim_barang member). Payment and
+--    change amounts are carried on the first line of each transaction only.
 CREATE TABLE fact_sales (
-    sales_id INT AUTO_INCREMENT PRIMARY KEY,
+    sales_id INT AUTO_INCREMENT,
     transaction_id INT,  -- Optional link to OLTP if needed
     minimart_id INT,
     cashier_id INT,
@@ -66,13 +76,63 @@ CREATE TABLE fact_sales (
     change_amount DECIMAL(10, 2),
     profit DECIMAL(10, 2),
     quantity_sold INT,
-    sales_datetime DATETIME,
-    INDEX (minimart_id),
+    sales_datetime DATETIME NOT NULL,
+    PRIMARY KEY (sales_id, sales_datetime),
+    UNIQUE KEY uq_fact_sales_line (transaction_id, barang_id, sales_datetime),  -- Natural key for idempotent re-loads
+    -- Covers the daily summary queries (per minimart, bounded by sales_datetime)
+    INDEX ix_fact_sales_minimart_time (minimart_id, sales_datetime, barang_id, cashier_id, waktu_id,
+                                       transaction_id, quantity_sold, total_amount, profit),
+    -- Covers the restock query (gudang -> minimart, grouped by barang)
+    INDEX ix_fact_sales_minimart_barang (minimart_id, barang_id, sales_datetime, quantity_sold),
     INDEX (cashier_id),
     INDEX (barang_id),
-    INDEX (waktu_id),
-    FOREIGN KEY (minimart_id) REFERENCES dim_minimart(minimart_id),
-    FOREIGN KEY (cashier_id) REFERENCES dim_cashier(cashier_id),
-    FOREIGN KEY (barang_id) REFERENCES dim_barang(barang_id),
-    FOREIGN KEY (waktu_id) REFERENCES dim_waktu(waktu_id)
+    INDEX (waktu_id)
+)
+PARTITION BY RANGE COLUMNS (sales_datetime) (
+    PARTITION p_history VALUES LESS THAN ('2024-01-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+
+-- 8. Aggregate Table: daily sales per minimart x barang
+--    Maintained incrementally by etl/aggregates.py after each load
+CREATE TABLE agg_daily_store_item (
+    tanggal DATE,
+    minimart_id INT,
+    barang_id INT,
+    total_quantity_sold INT,
+    total_revenue DECIMAL(14, 2),
+    total_profit DECIMAL(14, 2),
+    PRIMARY KEY (tanggal, minimart_id, barang_id),
+    INDEX (minimart_id, barang_id)
+);
+
+-- 9. Aggregate Table: daily sales per minimart x cashier
+CREATE TABLE agg_daily_store_cashier (
+    tanggal DATE,
+    minimart_id INT,
+    cashier_id INT,
+    total_transactions INT,
+    total_revenue DECIMAL(14, 2),
+    PRIMARY KEY (tanggal, minimart_id, cashier_id)
+);
+
+-- 10. Aggregate Table: daily sales per minimart x hour
+CREATE TABLE agg_daily_store_hour (
+    tanggal DATE,
+    minimart_id INT,
+    jam INT,
+    total_transactions INT,
+    hourly_revenue DECIMAL(14, 2),
+    total_profit DECIMAL(14, 2),
+    PRIMARY KEY (tanggal, minimart_id, jam)
+);
+
+-- 11. Control Table: load epoch, bumped after every successful load so cached report
+--     query results (db/query_cache.py) know the DW has changed
+CREATE TABLE etl_load_epoch (
+    id TINYINT PRIMARY KEY,
+    epoch BIGINT NOT NULL,
+    loaded_at DATETIME
 );
+INSERT INTO etl_load_epoch (id, epoch, loaded_at) VALUES (1, 0, NOW());
@@ -11,6 +11,9 @@ CREATE TABLE IF NOT EXISTS staging_transaksi (
     transaksi_total INT,
     transaksi_pembayaran INT,
     transaksi_kembalian INT,
+    total_amount INT,   -- Dihitung dari isi_transaksi (etl/transform.py)
+    profit INT,
+    jam TINYINT,
     PRIMARY KEY (transaksi_id)
 );
 
@@ -0,0 +1,207 @@
+import argparse
+import json
+import logging
+import mysql.connector
+import pandas as pd
+from config import etl_config as config
+from db.connection_pool import get_connection
+from db.query_cache import bump_load_epoch
+
+LOG_FILE = "partition_maintenance.log"
+logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+PARTITIONED_TABLE = "fact_sales"
+CATCH_ALL_PARTITION = "pmax"
+
+def partition_name(month_start):
+    """Monthly partitions are named pYYYYMM and hold rows before the next month."""
+    return f"p{month_start:%Y%m}"
+
+def list_partitions(connection, table=PARTITIONED_TABLE):
+    """
+    Returns the table's partitions in order as (name, upper bound) tuples.
+
+    The upper bound is a Timestamp, or None for the MAXVALUE partition.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+            FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+        """, (table,))
+        partitions = []
+        for name, description in cursor.fetchall():
+            bound = None if description == "MAXVALUE" else pd.Timestamp(description.strip("'"))
+            partitions.append((name, bound))
+        return partitions
+    finally:
+        cursor.close()
+
+def add_partitions(connection, months_ahead=None, today=None, dry_run=False):
+    """
+    Splits monthly partitions off the catch-all partition until the table has
+    room for `months_ahead` months after the current one.
+
+    pmax is empty in normal operation, so the REORGANIZE only moves metadata.
+
+    Returns:
+        The names of the partitions added.
+    """
+    months_ahead = config.partition_config['months_ahead'] if months_ahead is None else months_ahead
+    today = pd.Timestamp(today or pd.Timestamp.today())
+    target = (today.to_period('M') + months_ahead + 1).to_timestamp()  # Exclusive upper bound
+
+    bounds = [bound for _, bound in list_partitions(connection) if bound is not None]
+    if not bounds:
+        logging.error(f"{PARTITIONED_TABLE} is not range partitioned; run db/create_dw.sql first.")
+        return []
+    month = max(bounds)
+    new_partitions = []
+    while month < target:
+        next_month = (month.to_period('M') + 1).to_timestamp()
+        new_partitions.append((partition_name(month), next_month))
+        month = next_month
+    if not new_partitions:
+        return []
+
+    definitions = ",\n".join(f"PARTITION {name} VALUES LESS THAN ('{bound:%Y-%m-%d}')"
+                             for name, bound in new_partitions)
+    statement = (f"ALTER TABLE {PARTITIONED_TABLE} REORGANIZE PARTITION {CATCH_ALL_PARTITION} INTO (\n"
+                 f"{definitions},\nPARTITION {CATCH_ALL_PARTITION} VALUES LESS THAN (MAXVALUE))")
+    names = [name for name, _ in new_partitions]
+    if dry_run:
+        logging.info(f"Dry run: would add partitions {', '.join(names)}")
+        return names
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(statement)
+        logging.info(f"Added partitions {', '.join(names)} to {PARTITIONED_TABLE}")
+        return names
+    finally:
+        cursor.close()
+
+def retire_partitions(connection, retention_months=None, today=None, dry_run=False):
+    """
+    Drops partitions whose rows are all older than `retention_months`.
+
+    The daily aggregate tables are not affected, so summaries of retired
+    months stay available. Nothing is dropped when retention is None.
+
+    Returns:
+        The names of the partitions dropped.
+    """
+    retention_months = config.partition_config['retention_months'] if retention_months is None else retention_months
+    if retention_months is None:
+        return []
+    today = pd.Timestamp(today or pd.Timestamp.today())
+    cutoff = (today.to_period('M') - retention_months).to_timestamp()
+
+    names = [name for name, bound in list_partitions(connection)
+             if bound is not None and bound <= cutoff]
+    if not names:
+        return []
+    if dry_run:
+        logging.info(f"Dry run: would drop partitions {', '.join(names)}")
+        return names
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"ALTER TABLE {PARTITIONED_TABLE} DROP PARTITION {', '.join(names)}")
+        logging.info(f"Dropped partitions {', '.join(names)} from {PARTITIONED_TABLE}")
+        bump_load_epoch(connection, new_facts=False)  # Cached results may include the dropped rows
+        return names
+    finally:
+        cursor.close()
+
+def maintain_partitions(connection, months_ahead=None, retention_months=None, today=None, dry_run=False):
+    """Adds upcoming partitions and retires expired ones. Returns what was changed."""
+    try:
+        added = add_partitions(connection, months_ahead, today, dry_run)
+        dropped = retire_partitions(connection, retention_months, today, dry_run)
+        return {'added': added, 'dropped': dropped}
+    except mysql.connector.Error as err:
+        logging.error(f"Error maintaining {PARTITIONED_TABLE} partitions: {err}")
+        raise
+
+def explain_plan(connection, query, params=()):
+    """Returns the EXPLAIN rows of a query as a DataFrame."""
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute("EXPLAIN " + query, params)
+        return pd.DataFrame(cursor.fetchall())
+    finally:
+        cursor.close()
+
+def expected_partitions(partitions, start=None, end=None):
+    """Names of the partitions that a start <= sales_datetime < end range (either bound optional) can touch."""
+    names, lower = set(), None
+    for name, bound in partitions:
+        if (start is None or bound is None or bound > start) and (end is None or lower is None or lower < end):
+            names.add(name)
+        lower = bound
+    return names
+
+def verify_pruning(connection, report_date=None):
+    """
+    Checks with EXPLAIN that the fact_sales report and restock queries are
+    pruned to exactly the partitions of their date range. The chosen index
+    is reported alongside so covering-index use can be checked as well.
+
+    Returns:
+        A dictionary of query name -> {'partitions', 'expected', 'key', 'extra', 'ok'}.
+    """
+    # Imported here so the maintenance job does not depend on the report modules
+    from reports.send_report import DAILY_SUMMARY_QUERIES
+    from warehouse_interaction.download_report import build_restock_query, restock_window_start
+
+    day_start = pd.Timestamp(report_date or pd.Timestamp.today()).normalize()
+    day_end = day_start + pd.Timedelta(days=1)
+    day_params = (day_start.to_pydatetime(), day_end.to_pydatetime())
+    # name -> (query, params, (start, end) of the sales_datetime range it reads)
+    queries = {f"summary_{section}": (query.format(minimart_filter=""), day_params, (day_start, day_end))
+               for section, query in DAILY_SUMMARY_QUERIES.items()}
+    # Without a restock window the restock query reads every partition
+    queries['restock'] = (*build_restock_query(connection, today=day_start, use_aggregates=False),
+                          (restock_window_start(day_start), None))
+
+    partition_bounds = list_partitions(connection)
+    results = {}
+    for name, (query, params, (start, end)) in queries.items():
+        plan = explain_plan(connection, query, params)
+        fact_row = plan[plan['table'] == 'f'].iloc[0]
+        partitions = set((fact_row.get('partitions') or "").split(","))
+        key = fact_row.get('key')
+        extra = fact_row.get('Extra') or ""
+        expected = expected_partitions(partition_bounds, start, end)
+        ok = partitions == expected
+        results[name] = {'partitions': sorted(partitions), 'expected': sorted(expected), 'key': key,
+                         'extra': extra, 'ok': ok}
+        log = logging.info if ok else logging.warning
+        log(f"EXPLAIN {name}: partitions={','.join(sorted(partitions))} "
+            f"(expected {','.join(sorted(expected))}) key={key} extra={extra}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add and retire monthly fact_sales partitions.")
+    parser.add_argument("--months-ahead", type=int, help="Months of empty partitions to keep ready.")
+    parser.add_argument("--retention-months", type=int, help="Drop partitions older than this many months.")
+    parser.add_argument("--dry-run", action="store_true", help="Log the changes without applying them.")
+    parser.add_argument("--verify", action="store_true",
+                        help="EXPLAIN the report and restock queries and check partition pruning.")
+    args = parser.parse_args()
+
+    dw_conn = get_connection('dw')
+    try:
+        changes = maintain_partitions(dw_conn, args.months_ahead, args.retention_months, dry_run=args.dry_run)
+        print(json.dumps(changes, indent=2))
+        if args.verify:
+            results = verify_pruning(dw_conn)
+            print(json.dumps(results, indent=2, default=str))
+            if not all(result['ok'] for result in results.values()):
+                raise SystemExit(1)
+    finally:
+        dw_conn.close()
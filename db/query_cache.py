@@ -0,0 +1,174 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import mysql.connector
+import pandas as pd
+from config import etl_config as config
+from etl.intermediate import write_frame, read_frame
+
+def get_load_epoch(connection):
+    """Returns the current DW load epoch (0 if the epoch table does not exist)."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT epoch FROM etl_load_epoch WHERE id = 1")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    except mysql.connector.Error as err:
+        logging.warning(f"Could not read the DW load epoch: {err}")
+        return 0
+    finally:
+        cursor.close()
+
+def bump_load_epoch(connection, new_facts=True):
+    """
+    Advances the DW load epoch, invalidating every cached query result.
+
+    Call it after any change to DW data. loaded_at (the last fact load, see
+    demand_forecast.complete_until) is only moved when new_facts is True, so
+    maintenance such as retiring partitions leaves it alone.
+    """
+    cursor = connection.cursor()
+    try:
+        if new_facts:
+            cursor.execute("INSERT INTO etl_load_epoch (id, epoch, loaded_at) VALUES (1, 1, NOW()) "
+                           "ON DUPLICATE KEY UPDATE epoch = epoch + 1, loaded_at = NOW()")
+        else:
+            cursor.execute("INSERT INTO etl_load_epoch (id, epoch, loaded_at) VALUES (1, 1, NULL) "
+                           "ON DUPLICATE KEY UPDATE epoch = epoch + 1")
+        connection.commit()
+        logging.info("DW load epoch bumped.")
+    except mysql.connector.Error as err:
+        logging.error(f"Error bumping the DW load epoch: {err}")
+        connection.rollback()
+    finally:
+        cursor.close()
+
+class QueryCache:
+    """
+    Local on-disk cache of DataFrame query results.
+
+    Entries are keyed by the whitespace-normalised SQL plus its parameters and
+    stored in the columnar intermediate format. An entry is served only while
+    it is younger than the TTL and was filled in the current load epoch; the
+    total size is bounded by evicting the least recently used entries.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, directory=None, ttl_seconds=None, max_bytes=None):
+        self.directory = directory or config.query_cache_config['dir']
+        self.ttl_seconds = ttl_seconds or config.query_cache_config['ttl_seconds']
+        self.max_bytes = max_bytes or config.query_cache_config['max_bytes']
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(query, params=None):
+        normalized = " ".join(query.split())
+        payload = json.dumps([normalized, [str(p) for p in (params or ())]])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _index_path(self):
+        return os.path.join(self.directory, self.INDEX_FILE)
+
+    def _load_index(self):
+        try:
+            with open(self._index_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index):
+        tmp_path = self._index_path() + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._index_path())
+
+    @staticmethod
+    def _remove_file(entry):
+        try:
+            os.remove(entry['path'])
+        except OSError:
+            pass
+
+    def get(self, key, epoch):
+        """Returns the cached DataFrame, or None if missing, expired or from an older epoch."""
+        with self._lock:
+            index = self._load_index()
+            entry = index.get(key)
+            if entry is None:
+                return None
+            if entry['epoch'] != epoch or time.time() - entry['created'] > self.ttl_seconds:
+                self._remove_file(index.pop(key))
+                self._save_index(index)
+                return None
+            try:
+                df = read_frame(entry['path'])
+            except (OSError, ValueError) as err:
+                logging.warning(f"Dropping unreadable cache entry {key}: {err}")
+                self._remove_file(index.pop(key))
+                self._save_index(index)
+                return None
+            entry['last_access'] = time.time()
+            self._save_index(index)
+            return df
+
+    def put(self, key, epoch, df):
+        """Stores a result and evicts least recently used entries beyond max_bytes."""
+        with self._lock:
+            path = write_frame(df, os.path.join(self.directory, key))
+            now = time.time()
+            index = self._load_index()
+            index[key] = {'path': path, 'epoch': epoch, 'created': now, 'last_access': now,
+                          'size': os.path.getsize(path)}
+
+            total = sum(entry['size'] for entry in index.values())
+            for old_key in sorted(index, key=lambda k: index[k]['last_access']):
+                if total <= self.max_bytes or old_key == key:
+                    break
+                total -= index[old_key]['size']
+                self._remove_file(index.pop(old_key))
+            self._save_index(index)
+
+    def clear(self):
+        with self._lock:
+            for entry in self._load_index().values():
+                self._remove_file(entry)
+            self._save_index({})
+
+_query_cache = None
+
+def get_query_cache():
+    """Returns the process-wide query cache."""
+    global _query_cache
+    if _query_cache is None:
+        _query_cache = QueryCache()
+    return _query_cache
+
+def cached_read_sql(query, connection, params=None):
+    """
+    pd.read_sql for DW report queries, served from the result cache when possible.
+
+    The load epoch is checked on every call (one primary-key lookup), so a
+    result is never served after the DW has been reloaded.
+    """
+    if not config.query_cache_config['enabled']:
+        return pd.read_sql(query, connection, params=params)
+
+    cache = get_query_cache()
+    key = cache.make_key(query, params)
+    epoch = get_load_epoch(connection)
+    df = cache.get(key, epoch)
+    if df is not None:
+        logging.info(f"Query cache hit ({key[:12]})")
+        return df
+
+    df = pd.read_sql(query, connection, params=params)
+    try:
+        cache.put(key, epoch, df)
+    except (OSError, ValueError) as err:
+        logging.warning(f"Could not cache query result: {err}")
+    return df
\ No newline at end of file
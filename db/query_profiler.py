@@ -0,0 +1,224 @@
+"""
+Opt-in profiling of every statement run through a pooled connection.
+
+When enabled (config.query_profile_config['enabled'], or enable_profiling()),
+pooled cursors are wrapped so each statement's latency (execute plus fetch),
+rows returned and approximate bytes fetched are accumulated per normalised
+statement. write_slow_query_report() ranks the statements by total time and
+attaches an EXPLAIN FORMAT=JSON plan to those slower than the threshold.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from config import etl_config as config
+
+# Multirow INSERT value lists and IN lists collapse to one group, so every
+# batch size of the same statement is profiled as one entry
+_VALUE_GROUPS = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)(?:\s*,\s*\(\s*%s(?:\s*,\s*%s)*\s*\))+")
+_PLACEHOLDER_LISTS = re.compile(r"%s(?:\s*,\s*%s)+")
+
+_lock = threading.Lock()
+_stats = {}
+_enabled = None
+
+def profiling_enabled():
+    return config.query_profile_config['enabled'] if _enabled is None else _enabled
+
+def enable_profiling(enabled=True):
+    """Turns profiling on or off for cursors opened from now on."""
+    global _enabled
+    _enabled = enabled
+
+def reset_profile():
+    with _lock:
+        _stats.clear()
+
+def normalize_statement(statement):
+    statement = statement.decode() if isinstance(statement, (bytes, bytearray)) else str(statement)
+    statement = " ".join(statement.split())
+    statement = _VALUE_GROUPS.sub("(%s, ...)", statement)
+    return _PLACEHOLDER_LISTS.sub("%s, ...", statement)
+
+def is_explainable(statement):
+    """SELECTs, INSERT/REPLACE ... SELECT, UPDATE and DELETE; plain VALUES inserts have no useful plan."""
+    upper = statement.upper()
+    if upper.startswith(("SELECT", "UPDATE", "DELETE")):
+        return True
+    return upper.startswith(("INSERT", "REPLACE")) and " SELECT " in upper
+
+def _row_bytes(row):
+    values = row.values() if isinstance(row, dict) else row
+    return sum(len(value) if isinstance(value, (str, bytes, bytearray)) else 8 for value in values)
+
+class StatementStats:
+    """Totals for one normalised statement, plus the parameters of its slowest call."""
+
+    def __init__(self, target, statement):
+        self.target = target
+        self.statement = statement
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.slowest_params = None
+
+class _Sample:
+    """One execution; fetches keep adding to it until the next execute."""
+
+    def __init__(self, stats, params, seconds):
+        self.stats = stats
+        self.params = params
+        self.seconds = 0.0
+        self.add(seconds)
+
+    def add(self, seconds, rows=0, n_bytes=0):
+        with _lock:
+            self.seconds += seconds
+            self.stats.seconds += seconds
+            self.stats.rows += rows
+            self.stats.bytes += n_bytes
+            if self.seconds > self.stats.max_seconds:
+                self.stats.max_seconds = self.seconds
+                self.stats.slowest_params = self.params
+
+def _start_sample(target, statement, params, seconds, executemany=False):
+    key = (target, normalize_statement(statement))
+    with _lock:
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = StatementStats(target, key[1])
+        stats.calls += 1
+    # EXPLAIN of an executemany batch uses its first parameter set
+    if executemany:
+        params = params[0] if params else None
+    return _Sample(stats, (statement, params), seconds)
+
+class ProfilingCursor:
+    """Cursor proxy that feeds every statement and fetch into the profile."""
+
+    def __init__(self, cursor, target):
+        self._cursor = cursor
+        self._target = target
+        self._sample = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._sample = _start_sample(self._target, operation, params, time.perf_counter() - start)
+            rowcount = getattr(self._cursor, 'rowcount', -1)
+            if getattr(self._cursor, 'with_rows', False) is False and rowcount and rowcount > 0:
+                self._sample.add(0.0, rows=rowcount)  # Rows affected by DML
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        seq_params = list(seq_params)
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._sample = _start_sample(self._target, operation, seq_params, time.perf_counter() - start,
+                                         executemany=True)
+            self._sample.add(0.0, rows=len(seq_params))
+
+    def _fetched(self, start, rows):
+        if self._sample is not None:
+            self._sample.add(time.perf_counter() - start, len(rows), sum(_row_bytes(row) for row in rows))
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(start, [row] if row is not None else [])
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        start = time.perf_counter()
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._fetched(start, rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(start, rows)
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+def explain_statement(target, statement, params):
+    """Returns the EXPLAIN FORMAT=JSON plan of a statement, run on a fresh pooled connection."""
+    from db.connection_pool import get_connection  # connection_pool imports this module
+
+    connection = get_connection(target)
+    try:
+        cursor = connection._raw.cursor()  # Unprofiled, so the EXPLAIN itself is not recorded
+        try:
+            cursor.execute("EXPLAIN FORMAT=JSON " + statement, params)
+            row = cursor.fetchone()
+            return json.loads(row[0]) if row else None
+        finally:
+            cursor.close()
+    finally:
+        connection.close()
+
+def profile_report(slow_ms=None, top=None):
+    """
+    Returns the profiled statements ranked by total time.
+
+    Statements whose slowest call took at least slow_ms get an 'explain' entry.
+    """
+    slow_ms = config.query_profile_config['slow_ms'] if slow_ms is None else slow_ms
+    top = top or config.query_profile_config['top']
+    with _lock:
+        ranked = sorted(_stats.values(), key=lambda s: s.seconds, reverse=True)[:top]
+        grand_total = sum(s.seconds for s in _stats.values()) or 1.0
+
+    report = []
+    for rank, stats in enumerate(ranked, start=1):
+        entry = {'rank': rank, 'target': stats.target, 'statement': stats.statement[:2000],
+                 'calls': stats.calls, 'total_seconds': round(stats.seconds, 4),
+                 'mean_ms': round(stats.seconds / stats.calls * 1000, 2) if stats.calls else None,
+                 'max_ms': round(stats.max_seconds * 1000, 2), 'rows': stats.rows, 'bytes': stats.bytes,
+                 'share': round(stats.seconds / grand_total, 4)}
+        if stats.max_seconds * 1000 >= slow_ms and stats.slowest_params:
+            statement, params = stats.slowest_params
+            if is_explainable(stats.statement):
+                try:
+                    entry['explain'] = explain_statement(stats.target, statement, params)
+                except Exception as e:
+                    entry['explain_error'] = str(e)
+        report.append(entry)
+    return report
+
+def write_slow_query_report(path=None, reset=True):
+    """Writes the ranked statement report as JSON and logs the top entries."""
+    if not profiling_enabled():
+        return None
+    path = path or config.query_profile_config['report_file']
+    report = profile_report()
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    for entry in report[:10]:
+        logging.info(f"Query #{entry['rank']} [{entry['target']}] {entry['total_seconds']}s total, "
+                     f"{entry['calls']} calls, max {entry['max_ms']}ms: {entry['statement'][:200]}")
+    if reset:
+        reset_profile()
+    logging.info(f"Query profile written to {path}")
+    return path
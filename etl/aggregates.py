@@ -0,0 +1,125 @@
+import argparse
+import logging
+import mysql.connector
+import pandas as pd
+from db.query_cache import bump_load_epoch
+
+AGGREGATE_TABLES = ('agg_daily_store_item', 'agg_daily_store_cashier', 'agg_daily_store_hour')
+
+# Recomputes one day of each aggregate from fact_sales. The range predicate
+# on sales_datetime keeps each refresh to the rows of that day. The item
+# aggregate leaves out the rows of transactions without line items
+# (barang_id 0, see NO_ITEM_BARANG_ID in etl/load.py).
+REFRESH_QUERIES = {
+    'agg_daily_store_item': """
+        INSERT INTO agg_daily_store_item
+            (tanggal, minimart_id, barang_id, total_quantity_sold, total_revenue, total_profit)
+        SELECT
+            DATE(f.sales_datetime), f.minimart_id, f.barang_id,
+            SUM(f.quantity_sold), SUM(f.total_amount), SUM(f.profit)
+        FROM
+            fact_sales f
+        WHERE
+            f.sales_datetime >= %s AND f.sales_datetime < %s AND f.barang_id <> 0
+        GROUP BY
+            DATE(f.sales_datetime), f.minimart_id, f.barang_id
+    """,
+    'agg_daily_store_cashier': """
+        INSERT INTO agg_daily_store_cashier
+            (tanggal, minimart_id, cashier_id, total_transactions, total_revenue)
+        SELECT
+            DATE(f.sales_datetime), f.minimart_id, f.cashier_id,
+            COUNT(DISTINCT f.transaction_id), SUM(f.total_amount)
+        FROM
+            fact_sales f
+        WHERE
+            f.sales_datetime >= %s AND f.sales_datetime < %s
+        GROUP BY
+            DATE(f.sales_datetime), f.minimart_id, f.cashier_id
+    """,
+    'agg_daily_store_hour': """
+        INSERT INTO agg_daily_store_hour
+            (tanggal, minimart_id, jam, total_transactions, hourly_revenue, total_profit)
+        SELECT
+            DATE(f.sales_datetime), f.minimart_id, HOUR(f.sales_datetime),
+            COUNT(DISTINCT f.transaction_id), SUM(f.total_amount), SUM(f.profit)
+        FROM
+            fact_sales f
+        WHERE
+            f.sales_datetime >= %s AND f.sales_datetime < %s
+        GROUP BY
+            DATE(f.sales_datetime), f.minimart_id, HOUR(f.sales_datetime)
+    """,
+}
+
+def aggregates_available(connection):
+    """Returns True if all daily aggregate tables exist in the connected database."""
+    placeholders = ",".join(['%s'] * len(AGGREGATE_TABLES))
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM information_schema.tables "
+                       f"WHERE table_schema = DATABASE() AND table_name IN ({placeholders})", AGGREGATE_TABLES)
+        return cursor.fetchone()[0] == len(AGGREGATE_TABLES)
+    except mysql.connector.Error as err:
+        logging.error(f"Error checking for aggregate tables: {err}")
+        return False
+    finally:
+        cursor.close()
+
+def refresh_daily_aggregates(dw_conn, days):
+    """
+    Rebuilds the daily aggregates for the given days only.
+
+    Each day is deleted and recomputed from fact_sales inside one
+    transaction, so re-running a refresh is safe.
+
+    Args:
+        dw_conn: MySQL connection to the data warehouse.
+        days:    Iterable of dates touched by the last load.
+
+    Returns:
+        True on success (or if the aggregate tables do not exist), False on error.
+    """
+    days = sorted({pd.Timestamp(day).normalize() for day in days})
+    if not days:
+        return True
+    if not aggregates_available(dw_conn):
+        logging.info("Aggregate tables not found. Skipping aggregate refresh.")
+        return True
+
+    cursor = dw_conn.cursor()
+    try:
+        for day in days:
+            day_start = day.to_pydatetime()
+            day_end = (day + pd.Timedelta(days=1)).to_pydatetime()
+            for table_name, query in REFRESH_QUERIES.items():
+                cursor.execute(f"DELETE FROM {table_name} WHERE tanggal = %s", (day.date(),))
+                cursor.execute(query, (day_start, day_end))
+        dw_conn.commit()
+        logging.info(f"Refreshed daily aggregates for {len(days)} day(s): {days[0].date()} .. {days[-1].date()}")
+        return True
+    except mysql.connector.Error as err:
+        logging.error(f"Error refreshing daily aggregates: {err}")
+        dw_conn.rollback()
+        return False
+    finally:
+        cursor.close()
+
+if __name__ == '__main__':
+    from etl.load import create_dw_connection
+
+    parser = argparse.ArgumentParser(description="Rebuild the daily aggregate tables for a date range.")
+    parser.add_argument("start", help="First day (YYYY-MM-DD).")
+    parser.add_argument("end", help="Last day (YYYY-MM-DD), inclusive.")
+    args = parser.parse_args()
+
+    dw_conn = create_dw_connection()
+    if dw_conn:
+        if refresh_daily_aggregates(dw_conn, pd.date_range(args.start, args.end, freq='D')):
+            bump_load_epoch(dw_conn, new_facts=False)  # Cached report results came from the old aggregates
+            print("Daily aggregates rebuilt.")
+        else:
+            print("Failed to rebuild daily aggregates.")
+        dw_conn.close()
+    else:
+        print("Failed to connect to the data warehouse.")
\ No newline at end of file
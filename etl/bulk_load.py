@@ -0,0 +1,126 @@
+import logging
+import os
+import tempfile
+import mysql.connector
+import pandas as pd
+from config import etl_config as config
+
+STRATEGIES = ("multirow", "load_data", "executemany")
+ON_DUPLICATE = ("error", "ignore", "update")
+
+def column_to_python(series):
+    """
+    Converts one column to a list of plain Python values (None for nulls).
+
+    Working column by column avoids the object-dtype copy of the whole frame
+    that df.to_numpy() makes for mixed dtypes, and gives the connector native
+    int/float/datetime values instead of numpy scalars.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = series.dt.to_pydatetime()
+    else:
+        values = series.to_numpy(dtype=object)
+    mask = series.isna().to_numpy()
+    if mask.any():
+        values[mask] = None
+    return values.tolist()
+
+def iter_batches(df, batch_size):
+    """Yields (batch_df, rows) pairs, rows being a list of tuples for that batch only."""
+    for start in range(0, len(df), batch_size):
+        batch = df.iloc[start:start + batch_size]
+        columns = [column_to_python(batch[col]) for col in batch.columns]
+        yield batch, list(zip(*columns))
+
+def _insert_prefix(table_name, cols, on_duplicate):
+    ignore = " IGNORE" if on_duplicate == "ignore" else ""
+    return f"INSERT{ignore} INTO {table_name} ({','.join(cols)}) VALUES "
+
+def _insert_suffix(cols, on_duplicate):
+    if on_duplicate != "update":
+        return ""
+    return " ON DUPLICATE KEY UPDATE " + ", ".join(f"{col}=VALUES({col})" for col in cols)
+
+def _insert_multirow(cursor, table_name, cols, batch, rows, on_duplicate):
+    row_placeholder = "(" + ",".join(['%s'] * len(cols)) + ")"
+    sql = (_insert_prefix(table_name, cols, on_duplicate) + ",".join([row_placeholder] * len(rows))
+           + _insert_suffix(cols, on_duplicate))
+    cursor.execute(sql, [value for row in rows for value in row])
+
+def _insert_executemany(cursor, table_name, cols, batch, rows, on_duplicate):
+    placeholders = ",".join(['%s'] * len(cols))
+    sql = _insert_prefix(table_name, cols, on_duplicate) + f"({placeholders})" + _insert_suffix(cols, on_duplicate)
+    cursor.executemany(sql, rows)
+
+def _insert_load_data(cursor, table_name, cols, batch, on_duplicate, tmp_dir=None):
+    # The file is written by pandas' C CSV writer straight from the column
+    # arrays; no Python row objects are created.
+    fd, path = tempfile.mkstemp(suffix=".csv", prefix=f"bulk_{table_name}_", dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "w", newline="") as f:
+            batch.to_csv(f, header=False, index=False, na_rep="NULL",
+                         date_format="%Y-%m-%d %H:%M:%S", lineterminator="\n")
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE '{path}'{' IGNORE' if on_duplicate == 'ignore' else ''} INTO TABLE {table_name} "
+            "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+            f"LINES TERMINATED BY '\\n' ({','.join(cols)})"
+        )
+    finally:
+        os.remove(path)
+
+def bulk_load(connection, df, table_name, strategy=None, batch_size=None, on_duplicate="error"):
+    """
+    Loads a DataFrame into a table in batches, committing after each batch.
+
+    Args:
+        connection: MySQL connection to the target database.
+        df:         DataFrame whose column names match the target columns.
+        table_name: The target table.
+        strategy:   'multirow' (one multi-row INSERT per batch), 'load_data'
+                    (LOAD DATA LOCAL INFILE per batch) or 'executemany'.
+                    Defaults to config.bulk_load_config['strategy'].
+        batch_size: Rows per batch. Defaults to config.bulk_load_config['batch_size'].
+        on_duplicate: What to do with rows whose primary/unique key already
+                    exists: 'error' (plain INSERT), 'ignore' (keep the stored
+                    row) or 'update' (INSERT ... ON DUPLICATE KEY UPDATE).
+
+    Returns:
+        The number of rows loaded. Batches committed before an error stay
+        loaded; the failing batch is rolled back and loading stops.
+    """
+    strategy = strategy or config.bulk_load_config['strategy']
+    batch_size = batch_size or config.bulk_load_config['batch_size']
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown bulk-load strategy: {strategy}")
+    if on_duplicate not in ON_DUPLICATE:
+        raise ValueError(f"Unknown on_duplicate mode: {on_duplicate}")
+    if strategy == "load_data" and on_duplicate == "update":
+        # LOAD DATA only offers REPLACE, which deletes the old row first and
+        # breaks foreign keys pointing at dimension rows.
+        logging.info(f"LOAD DATA cannot upsert; using multirow for {table_name}.")
+        strategy = "multirow"
+
+    cols = list(df.columns)
+    loaded = 0
+    cursor = connection.cursor()
+    try:
+        if strategy == "load_data":
+            for start in range(0, len(df), batch_size):
+                batch = df.iloc[start:start + batch_size]
+                _insert_load_data(cursor, table_name, cols, batch, on_duplicate, config.bulk_load_config.get('tmp_dir'))
+                connection.commit()
+                loaded += len(batch)
+        else:
+            insert = _insert_multirow if strategy == "multirow" else _insert_executemany
+            for batch, rows in iter_batches(df, batch_size):
+                insert(cursor, table_name, cols, batch, rows, on_duplicate)
+                connection.commit()
+                loaded += len(rows)
+    except mysql.connector.Error as err:
+        logging.error(f"Error bulk loading into {table_name} after {loaded} rows ({strategy}): {err}")
+        connection.rollback()
+    finally:
+        cursor.close()
+
+    logging.info(f"{loaded}/{len(df)} rows loaded into {table_name} using {strategy}.")
+    return loaded
\ No newline at end of file
@@ -0,0 +1,276 @@
+import argparse
+import json
+import logging
+import os
+import time
+import mysql.connector
+import numpy as np
+import pandas as pd
+from config import etl_config as config
+from etl.bulk_load import bulk_load
+from etl.intermediate import apply_schema, SCHEMAS
+from etl.transform import (transform_transactions_data, create_staging_connection, STAGING_TRANSAKSI_COLUMNS,
+                           STAGING_ISI_TRANSAKSI_COLUMNS)
+from etl.extract import create_db_connection
+from etl.load import create_dw_connection, load_from_staging_to_dw, clear_staging, fetch_members
+
+try:
+    from pymysqlreplication import BinLogStreamReader
+    from pymysqlreplication.event import XidEvent
+    from pymysqlreplication.row_event import WriteRowsEvent, UpdateRowsEvent, DeleteRowsEvent
+except ImportError:  # Only needed for live binlog reading; fixtures work without it
+    BinLogStreamReader = None
+
+LOG_FILE = "cdc.log"
+logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+CDC_TABLES = ('transaksi', 'isi_transaksi')
+
+# --- Offsets ---
+
+def load_offset(path=None):
+    """Returns the last committed binlog position as {'log_file', 'log_pos'}, or None."""
+    path = path or config.cdc_config['offset_file']
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_offset(offset, path=None):
+    """Persists a binlog position atomically."""
+    path = path or config.cdc_config['offset_file']
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(offset, f)
+    os.replace(tmp_path, path)
+
+# --- Event sources ---
+#
+# Both sources yield plain dictionaries:
+#   {'type': 'insert'|'update'|'delete', 'table': ..., 'values': {...}}
+#   {'type': 'commit', 'log_file': ..., 'log_pos': ...}
+# so the batching logic can be tested against recorded fixtures.
+
+def iter_binlog_events(offset=None, blocking=False):
+    """
+    Reads row events for transaksi and isi_transaksi from the source binlog.
+
+    With blocking=False the iterator ends once it has caught up with the
+    server, which lets the caller flush and poll again.
+    """
+    if BinLogStreamReader is None:
+        raise RuntimeError("python-mysql-replication is required for binlog CDC")
+
+    db_config = config.db_config
+    stream = BinLogStreamReader(
+        connection_settings={'host': db_config['host'], 'port': db_config.get('port', 3306),
+                             'user': db_config['user'], 'passwd': db_config['password']},
+        server_id=config.cdc_config['server_id'],
+        only_schemas=[db_config['database']],
+        only_tables=list(CDC_TABLES),
+        only_events=[WriteRowsEvent, UpdateRowsEvent, DeleteRowsEvent, XidEvent],
+        resume_stream=offset is not None,
+        log_file=offset['log_file'] if offset else None,
+        log_pos=offset['log_pos'] if offset else None,
+        blocking=blocking,
+    )
+    try:
+        for event in stream:
+            if isinstance(event, XidEvent):
+                yield {'type': 'commit', 'log_file': stream.log_file, 'log_pos': stream.log_pos}
+            elif isinstance(event, WriteRowsEvent):
+                for row in event.rows:
+                    yield {'type': 'insert', 'table': event.table, 'values': row['values']}
+            elif isinstance(event, UpdateRowsEvent):
+                for row in event.rows:
+                    yield {'type': 'update', 'table': event.table, 'values': row['after_values']}
+            elif isinstance(event, DeleteRowsEvent):
+                for row in event.rows:
+                    yield {'type': 'delete', 'table': event.table, 'values': row['values']}
+    finally:
+        stream.close()
+
+def iter_fixture_events(path, offset=None):
+    """Replays events recorded as JSON lines, skipping everything up to a committed offset."""
+    skipping = offset is not None
+    with open(path) as f:
+        for line in f:
+            event = json.loads(line)
+            if skipping:
+                if event['type'] == 'commit' and event['log_file'] == offset['log_file'] \
+                        and event['log_pos'] == offset['log_pos']:
+                    skipping = False
+                continue
+            yield event
+
+def record_fixture(events, path):
+    """Writes events to a JSON lines fixture for later replay."""
+    with open(path, "w") as f:
+        for event in events:
+            f.write(json.dumps(event, default=str) + "\n")
+
+# --- Micro-batching ---
+
+class CDCBatcher:
+    """
+    Collects row events into micro-batches and applies them to staging.
+
+    Batches end only on commit events, so a source transaction (a transaksi
+    row and its isi_transaksi lines) is never split. Staging writes are
+    upserts and the offset is saved only after the batch is committed, so a
+    crash between the two replays the batch without creating duplicates:
+    every committed event is applied exactly once.
+
+    Totals are recomputed from all current lines of every transaction the
+    batch touches, read from the source, so a header-only or line-only
+    change never stages a partial total.
+    """
+
+    def __init__(self, staging_conn, source_conn, dw_conn=None, batch_max_rows=None, offset_path=None):
+        self.staging_conn = staging_conn
+        self.source_conn = source_conn
+        self.dw_conn = dw_conn
+        self.batch_max_rows = batch_max_rows or config.cdc_config['batch_max_rows']
+        self.offset_path = offset_path
+        self._reset()
+        self.stats = {'batches': 0, 'rows': 0, 'deletes_ignored': 0}
+
+    @staticmethod
+    def _key(table, values):
+        if table == 'transaksi':
+            return values['transaksi_id']
+        return values['transaksi_id'], values['barang_id']
+
+    def consume(self, events):
+        """Applies events, flushing at commit boundaries once the batch is large enough."""
+        # Rows left from a pass that ended mid-transaction are re-read from the offset
+        self._reset()
+        for event in events:
+            if event['type'] == 'commit':
+                self.pending_offset = {'log_file': event['log_file'], 'log_pos': event['log_pos']}
+                if self.row_count >= self.batch_max_rows:
+                    self.flush()
+            elif event['table'] in CDC_TABLES:
+                if event['type'] == 'delete':
+                    # Staging and the DW keep sales history; POS deletions are only reported
+                    self.stats['deletes_ignored'] += 1
+                    logging.warning(f"Ignoring delete on {event['table']}: {event['values']}")
+                    continue
+                # Keyed by primary key so the latest image of a row wins within a batch
+                self.rows[event['table']][self._key(event['table'], event['values'])] = event['values']
+                self.row_count += 1
+        self.flush()
+
+    def flush(self):
+        """Writes the buffered rows to staging (and the DW), then commits the offset."""
+        if self.pending_offset is None:
+            return True
+        if self.row_count:
+            df_transaksi = apply_schema(pd.DataFrame(list(self.rows['transaksi'].values()),
+                                                     columns=list(SCHEMAS['transaksi'])), 'transaksi')
+            df_isi_transaksi = apply_schema(pd.DataFrame(list(self.rows['isi_transaksi'].values()),
+                                                         columns=list(SCHEMAS['isi_transaksi'])), 'isi_transaksi')
+            if not self._apply(df_transaksi, df_isi_transaksi):
+                logging.error("CDC batch failed; offset stays at the previous commit.")
+                return False
+            self.stats['batches'] += 1
+            self.stats['rows'] += self.row_count
+
+        save_offset(self.pending_offset, self.offset_path)
+        logging.info(f"CDC batch of {self.row_count} rows committed at {self.pending_offset}")
+        self._reset()
+        return True
+
+    def _reset(self):
+        self.rows = {table: {} for table in CDC_TABLES}
+        self.row_count = 0
+        self.pending_offset = None
+
+    def _current_rows(self, df_transaksi, df_isi_transaksi):
+        """
+        Completes a batch from the source: headers of transactions that only
+        had line changes, and every current line of each affected transaction.
+        """
+        ids = np.union1d(df_transaksi['transaksi_id'].to_numpy(), df_isi_transaksi['transaksi_id'].to_numpy())
+        missing_ids = np.setdiff1d(ids, df_transaksi['transaksi_id'].to_numpy())
+        headers = fetch_members(self.source_conn, f"SELECT {','.join(SCHEMAS['transaksi'])} FROM transaksi",
+                                'transaksi_id', missing_ids)
+        lines = fetch_members(self.source_conn, f"SELECT {','.join(SCHEMAS['isi_transaksi'])} FROM isi_transaksi",
+                              'transaksi_id', ids)
+        if not headers.empty:
+            df_transaksi = apply_schema(pd.concat([df_transaksi, headers], ignore_index=True), 'transaksi')
+        if not lines.empty:
+            # The source is at least as recent as the batch, so its lines win
+            df_isi_transaksi = apply_schema(pd.concat([df_isi_transaksi, lines], ignore_index=True)
+                                            .drop_duplicates(subset=['transaksi_id', 'barang_id'], keep='last'),
+                                            'isi_transaksi')
+        return df_transaksi, df_isi_transaksi
+
+    def _apply(self, df_transaksi, df_isi_transaksi):
+        try:
+            df_transaksi, df_isi_transaksi = self._current_rows(df_transaksi, df_isi_transaksi)
+        except (mysql.connector.Error, pd.errors.DatabaseError) as err:
+            logging.error(f"Error reading the current lines of the CDC batch from the source: {err}")
+            return False
+        if not df_transaksi.empty:
+            transformed_df = transform_transactions_data(df_transaksi, df_isi_transaksi)
+            if transformed_df.empty:
+                return False
+            staged = transformed_df[STAGING_TRANSAKSI_COLUMNS]
+            if bulk_load(self.staging_conn, staged, 'staging_transaksi', on_duplicate='update') != len(staged):
+                return False
+        if not df_isi_transaksi.empty:
+            lines = df_isi_transaksi[STAGING_ISI_TRANSAKSI_COLUMNS]
+            if bulk_load(self.staging_conn, lines, 'staging_isi_transaksi', on_duplicate='update') != len(lines):
+                return False
+        if self.dw_conn is not None:
+            if not load_from_staging_to_dw(self.dw_conn, self.staging_conn):
+                return False
+            clear_staging(self.staging_conn)
+        return True
+
+def run_cdc(fixture=None, once=False):
+    """
+    Tails the binlog (or replays a fixture) into staging in micro-batches.
+
+    Args:
+        fixture: Optional path to recorded events to replay instead of the binlog.
+        once:    Stop after one pass instead of polling forever.
+    """
+    staging_conn = create_staging_connection()
+    source_conn = create_db_connection()
+    dw_conn = create_dw_connection() if config.cdc_config['load_to_dw'] else None
+    if staging_conn is None or source_conn is None or (config.cdc_config['load_to_dw'] and dw_conn is None):
+        logging.error("Failed to connect to staging, the source or DW. CDC aborted.")
+        return None
+
+    batcher = CDCBatcher(staging_conn, source_conn, dw_conn)
+    try:
+        while True:
+            offset = load_offset()
+            events = iter_fixture_events(fixture, offset) if fixture else iter_binlog_events(offset)
+            batcher.consume(events)
+            if once or fixture:
+                break
+            time.sleep(config.cdc_config['poll_seconds'])
+    finally:
+        staging_conn.close()
+        source_conn.close()
+        if dw_conn:
+            dw_conn.close()
+    logging.info(f"CDC finished: {batcher.stats}")
+    return batcher.stats
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stream transaksi changes from the binlog into staging.")
+    parser.add_argument("--fixture", help="Replay events from a JSON lines fixture instead of the binlog.")
+    parser.add_argument("--record", metavar="PATH", help="Record one pass of binlog events to PATH and exit.")
+    parser.add_argument("--once", action="store_true", help="Process one pass and exit.")
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixture(iter_binlog_events(load_offset()), args.record)
+        print(f"Binlog events recorded to {args.record}")
+    else:
+        print(run_cdc(args.fixture, args.once))
\ No newline at end of file
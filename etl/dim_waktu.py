@@ -0,0 +1,91 @@
+import argparse
+import logging
+import pandas as pd
+from config import etl_config as config
+
+LOG_FILE = "loading.log"
+logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+def waktu_id_from_datetime(datetimes):
+    """
+    Maps timestamps to their hour-grain dim_waktu key, YYYYMMDDHH.
+
+    Pure integer arithmetic on the datetime components, so a whole fact batch
+    is keyed without touching the database.
+    """
+    datetimes = pd.to_datetime(pd.Series(datetimes))
+    return (datetimes.dt.year * 1000000 + datetimes.dt.month * 10000
+            + datetimes.dt.day * 100 + datetimes.dt.hour).astype('int64')
+
+def build_calendar_rows(hours):
+    """Builds dim_waktu rows for the given hour-aligned timestamps."""
+    hours = pd.DatetimeIndex(hours)
+    return pd.DataFrame({
+        'waktu_id': waktu_id_from_datetime(hours).to_numpy(),
+        'tanggal': hours.date,
+        'jam': hours.hour,
+        'hari': hours.day_name(),
+        'minggu': hours.strftime('%U').astype(int),  # Same as MySQL WEEK(d, 0)
+        'bulan': hours.month,
+        'tahun': hours.year,
+    })
+
+def generate_calendar(start_date, end_date):
+    """
+    Generates every hour from start_date up to and including end_date.
+
+    Returns:
+        A DataFrame with the dim_waktu columns, 24 rows per day.
+    """
+    hours = pd.date_range(pd.Timestamp(start_date).floor('D'),
+                          pd.Timestamp(end_date).floor('D') + pd.Timedelta(hours=23), freq='h')
+    return build_calendar_rows(hours)
+
+def calendar_rows_for(datetimes):
+    """Builds dim_waktu rows for the distinct hours the given timestamps fall in."""
+    hours = pd.to_datetime(pd.Series(datetimes)).dt.floor('h').drop_duplicates()
+    return build_calendar_rows(hours)
+
+def default_calendar_range():
+    """Returns the configured (start, end) range for the pre-populated calendar."""
+    start = pd.Timestamp(config.calendar_config['start_date'])
+    end = pd.Timestamp.today().normalize() + pd.DateOffset(years=config.calendar_config['years_ahead'])
+    return start, end
+
+def populate_dim_waktu(dw_conn, start_date=None, end_date=None):
+    """
+    Pre-populates dim_waktu at hour grain for a date range.
+
+    Existing hours are left untouched (upsert), so the range can be extended
+    at any time.
+    """
+    from etl.load import load_data_to_dw, reset_dimension_cache
+
+    if start_date is None or end_date is None:
+        default_start, default_end = default_calendar_range()
+        start_date = start_date or default_start
+        end_date = end_date or default_end
+    calendar_df = generate_calendar(start_date, end_date)
+    loaded = load_data_to_dw(dw_conn, calendar_df, 'dim_waktu')
+    reset_dimension_cache()  # The cached dim_waktu keys are now stale
+    logging.info(f"dim_waktu populated from {start_date} to {end_date} ({len(calendar_df)} hours)")
+    return loaded
+
+if __name__ == '__main__':
+    from etl.load import create_dw_connection
+
+    parser = argparse.ArgumentParser(description="Pre-populate dim_waktu with an hour-grain calendar.")
+    parser.add_argument("--start", help="First date (YYYY-MM-DD). Defaults to calendar_config['start_date'].")
+    parser.add_argument("--end", help="Last date (YYYY-MM-DD). Defaults to today + calendar_config['years_ahead'].")
+    args = parser.parse_args()
+
+    dw_conn = create_dw_connection()
+    if dw_conn:
+        if populate_dim_waktu(dw_conn, args.start, args.end):
+            print("dim_waktu populated.")
+        else:
+            print("Failed to populate dim_waktu.")
+        dw_conn.close()
+    else:
+        print("Failed to connect to the data warehouse.")
\ No newline at end of file
@@ -1,10 +1,12 @@
 import mysql.connector
 import os
-import schedule
-import time
+import argparse
 from datetime import datetime
-import glob
-from etl_config import config
+from config import etl_config as config
+from db.connection_pool import get_connection
+from etl import watermark
+from etl.intermediate import write_frame, SCHEMAS
+from scheduler import Job, serve
 import logging
 import pandas as pd
 
@@ -16,66 +18,170 @@ def create_db_connection():
     """Establishes a connection to the MySQL database."""
 
     try:
-        connection = mysql.connector.connect(**config.db_config)
+        connection = get_connection('oltp')
         logging.info("Database connection established successfully.")
         return connection
     except mysql.connector.Error as err:
         logging.error(f"Error connecting to database: {err}")
         return None
 
-def extract_transactions(connection):
-    """Extracts data from the transaksi table."""
+def build_delta_filter(alias, since=None, until=None, date_range=None):
+    """
+    Builds the WHERE clause selecting a slice of transaksi rows.
+
+    Args:
+        alias:      Table alias of transaksi in the query.
+        since:      Watermark dict (exclusive lower bound) or None.
+        until:      Watermark dict (inclusive upper bound) or None.
+        date_range: (start, end) tuple of dates for backfills, end exclusive.
+
+    Returns:
+        A (where_sql, params) tuple. where_sql is empty if no bound applies.
+    """
+    conditions = []
+    params = []
+    if since:
+        conditions.append(f"({alias}.tanggal_waktu > %s OR ({alias}.tanggal_waktu = %s AND {alias}.transaksi_id > %s))")
+        params += [since['tanggal_waktu'], since['tanggal_waktu'], since['transaksi_id']]
+    if until:
+        conditions.append(f"({alias}.tanggal_waktu < %s OR ({alias}.tanggal_waktu = %s AND {alias}.transaksi_id <= %s))")
+        params += [until['tanggal_waktu'], until['tanggal_waktu'], until['transaksi_id']]
+    if date_range:
+        conditions.append(f"{alias}.tanggal_waktu >= %s AND {alias}.tanggal_waktu < %s")
+        params += [str(date_range[0]), str(date_range[1])]
+
+    if not conditions:
+        return "", []
+    return " WHERE " + " AND ".join(conditions), params
+
+def extract_transactions(connection, since=None, date_range=None):
+    """
+    Extracts data from the transaksi table.
+
+    Only rows after the `since` watermark (or inside `date_range`) are read,
+    ordered by (tanggal_waktu, transaksi_id) so the last row is the new watermark.
+    """
 
     try:
-        df_transaksi = pd.read_sql("SELECT * FROM transaksi", connection)
-        logging.info("Data extracted from transaksi table.")
+        where, params = build_delta_filter("t", since=since, date_range=date_range)
+        query = f"SELECT t.* FROM transaksi t{where} ORDER BY t.tanggal_waktu, t.transaksi_id"
+        df_transaksi = pd.read_sql(query, connection, params=tuple(params), dtype=SCHEMAS['transaksi'])
+        logging.info(f"{len(df_transaksi)} rows extracted from transaksi table.")
         return df_transaksi
-    except mysql.connector.Error as err:
+    except (mysql.connector.Error, pd.errors.DatabaseError) as err:
         logging.error(f"Error extracting data from transaksi: {err}")
         return pd.DataFrame()
 
-def extract_isi_transaksi(connection):
-    """Extracts data from the isi_transaksi table."""
+def extract_isi_transaksi(connection, since=None, until=None, date_range=None):
+    """
+    Extracts data from the isi_transaksi table.
+
+    Line items are selected through their parent transaksi row, so the same
+    watermark bounds used for transaksi give a consistent delta. Returns None
+    on error, so a failed read is not mistaken for transactions without lines.
+    """
 
     try:
-        df_isi_transaksi = pd.read_sql("SELECT * FROM isi_transaksi", connection)
-        logging.info("Data extracted from isi_transaksi table.")
+        where, params = build_delta_filter("t", since=since, until=until, date_range=date_range)
+        if where:
+            query = f"SELECT it.* FROM isi_transaksi it JOIN transaksi t ON it.transaksi_id = t.transaksi_id{where}"
+        else:
+            query = "SELECT * FROM isi_transaksi"
+        df_isi_transaksi = pd.read_sql(query, connection, params=tuple(params), dtype=SCHEMAS['isi_transaksi'])
+        logging.info(f"{len(df_isi_transaksi)} rows extracted from isi_transaksi table.")
         return df_isi_transaksi
-    except mysql.connector.Error as err:
+    except (mysql.connector.Error, pd.errors.DatabaseError) as err:
         logging.error(f"Error extracting data from isi_transaksi: {err}")
-        return pd.DataFrame()
+        return None
+
+def extract_delta(connection, backfill=None):
+    """
+    Extracts the next delta batch (or a backfill range) from the source.
+
+    Returns:
+        (df_transaksi, df_isi_transaksi, new_watermark). new_watermark is None
+        for backfills, empty batches and failed reads; otherwise pass it to
+        commit_watermark once the batch has been persisted downstream.
+    """
+    if backfill:
+        logging.info(f"Backfilling transactions from {backfill[0]} to {backfill[1]}")
+        df_transaksi = extract_transactions(connection, date_range=backfill)
+        df_isi_transaksi = extract_isi_transaksi(connection, date_range=backfill)
+        if df_isi_transaksi is None:
+            return pd.DataFrame(), pd.DataFrame(), None
+        return df_transaksi, df_isi_transaksi, None
+
+    since = watermark.get_watermark("transaksi")
+    df_transaksi = extract_transactions(connection, since=since)
+    if df_transaksi.empty:
+        return df_transaksi, pd.DataFrame(), None
+
+    last_row = df_transaksi.iloc[-1]
+    new_watermark = {'tanggal_waktu': str(last_row['tanggal_waktu']),
+                     'transaksi_id': int(last_row['transaksi_id'])}
+    df_isi_transaksi = extract_isi_transaksi(connection, since=since, until=new_watermark)
+    if df_isi_transaksi is None:
+        # Drop the batch and keep the watermark, so the next run reads it again
+        return pd.DataFrame(), pd.DataFrame(), None
+    return df_transaksi, df_isi_transaksi, new_watermark
 
-def run_extraction():
-    """Orchestrates the extraction process."""
+def commit_watermark(new_watermark):
+    """Advances the watermark of every tracked table to the end of a persisted batch."""
+    if new_watermark:
+        for table_name in watermark.TRACKED_TABLES:
+            watermark.set_watermark(table_name, new_watermark['tanggal_waktu'], new_watermark['transaksi_id'])
+
+def run_extraction(backfill=None):
+    """
+    Orchestrates the extraction process.
+
+    Args:
+        backfill: Optional (start, end) date tuple. When given, that range is
+                  re-extracted and the stored watermarks are left untouched.
+    """
 
     now = datetime.now()
+    timestamp = now.strftime("%Y%m%d_%H%M%S")
     logging.info(f"Running extraction at {now}")
 
     connection = create_db_connection()
     if connection:
-        df_transaksi = extract_transactions(connection)
-        df_isi_transaksi = extract_isi_transaksi(connection)
+        df_transaksi, df_isi_transaksi, new_watermark = extract_delta(connection, backfill)
 
         if not df_transaksi.empty:
             # For now, let's save them to temporary files
-            timestamp = now.strftime("%Y%m%d_%H%M%S")
-            temp_file_transaksi = f"extracted_transaksi_{timestamp}.csv"
-            df_transaksi.to_csv(temp_file_transaksi, index=False)
+            temp_file_transaksi = write_frame(df_transaksi, f"extracted_transaksi_{timestamp}", schema='transaksi')
             logging.info(f"Saved transaksi data to {temp_file_transaksi}")
+        else:
+            logging.info("No new transactions since last extraction.")
 
         if not df_isi_transaksi.empty:
-            temp_file_isi_transaksi = f"extracted_isi_transaksi_{timestamp}.csv"
-            df_isi_transaksi.to_csv(temp_file_isi_transaksi, index=False)
+            temp_file_isi_transaksi = write_frame(df_isi_transaksi, f"extracted_isi_transaksi_{timestamp}", schema='isi_transaksi')
             logging.info(f"Saved isi_transaksi data to {temp_file_isi_transaksi}")
 
+        # Only move the watermark once the batch is safely on disk
+        commit_watermark(new_watermark)
+
         connection.close()
         logging.info("Database connection closed.")
     else:
         logging.error("Database connection failed. Extraction aborted.")
 
 if __name__ == '__main__':
-    schedule.every().hour.do(run_extraction)
+    parser = argparse.ArgumentParser(description="Extract new transactions from the POS database.")
+    parser.add_argument("--once", action="store_true", help="Run a single extraction and exit.")
+    parser.add_argument("--backfill", nargs=2, metavar=("START", "END"),
+                        help="Re-extract transactions with START <= tanggal_waktu < END (YYYY-MM-DD).")
+    parser.add_argument("--reset", nargs="?", const="all", metavar="TABLE",
+                        help="Reset the watermark of TABLE (or of all tables) and exit.")
+    args = parser.parse_args()
 
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
\ No newline at end of file
+    if args.reset:
+        watermark.reset_watermark(None if args.reset == "all" else args.reset)
+        print(f"Watermark reset: {args.reset}")
+    elif args.backfill:
+        run_extraction(backfill=tuple(args.backfill))
+    elif args.once:
+        run_extraction()
+    else:
+        serve([Job('extraction', run_extraction, config.scheduler_config['jobs']['extraction'])])
\ No newline at end of file
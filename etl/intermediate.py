@@ -0,0 +1,130 @@
+import glob
+import logging
+import os
+import pandas as pd
+from config import etl_config as config
+from instrumentation import record_file_written
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # Columnar formats are optional; CSV always works
+    feather = None
+
+FORMAT_EXTENSIONS = {
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+    'csv': '.csv',
+}
+
+# Typed schemas of the source tables and hand-off files. Keys that are part
+# of a primary key are plain int32 (the MySQL INT range); nullable columns use
+# the nullable Int32 type so NULL does not force a float column.
+SCHEMAS = {
+    'transaksi': {
+        'transaksi_id': 'int32',
+        'minimart_id': 'Int32',
+        'pegawai_id': 'Int32',
+        'tanggal_waktu': 'datetime64[ns]',
+        'transaksi_total': 'Int32',
+        'transaksi_pembayaran': 'Int32',
+        'transaksi_kembalian': 'Int32',
+    },
+    'isi_transaksi': {
+        'transaksi_id': 'int32',
+        'barang_id': 'int32',
+        'isi_transaksi_jumlah': 'Int32',
+        'harga_satuan': 'Int32',
+    },
+    'restock': {
+        'minimart_id': 'Int32',
+        'minimart_nama': 'category',
+        'kota_id': 'Int32',
+        'barang_id': 'Int32',
+        'barang_nama': 'category',
+        'total_sold': 'Int64',
+        'sales_days': 'Int32',
+    },
+    'forecast_state': {
+        'minimart_id': 'int32',
+        'barang_id': 'int32',
+        'level': 'float64',
+        **{f'season_{dow}': 'float64' for dow in range(7)},
+    },
+}
+
+def resolve_format(fmt=None):
+    """Returns the format to use, falling back to CSV when pyarrow is missing."""
+    fmt = fmt or config.intermediate_format_config['format']
+    if fmt not in FORMAT_EXTENSIONS:
+        raise ValueError(f"Unknown intermediate format: {fmt}")
+    if fmt != 'csv' and feather is None:
+        logging.warning(f"pyarrow is not installed; writing CSV instead of {fmt}.")
+        return 'csv'
+    return fmt
+
+def apply_schema(df, schema):
+    """Casts the columns of df that appear in the named schema."""
+    if schema is None:
+        return df
+    dtypes = {col: dtype for col, dtype in SCHEMAS[schema].items() if col in df.columns}
+    return df.astype(dtypes, copy=False)
+
+def write_frame(df, base_path, schema=None, fmt=None):
+    """
+    Writes a DataFrame as an intermediate file.
+
+    Args:
+        df:        The DataFrame to write.
+        base_path: Path without extension; the format's extension is appended.
+        schema:    Optional name of an entry in SCHEMAS to enforce before writing.
+        fmt:       'parquet', 'arrow' or 'csv' (defaults to the configured format).
+
+    Returns:
+        The path written.
+    """
+    fmt = resolve_format(fmt)
+    compression = config.intermediate_format_config.get('compression')
+    path = base_path + FORMAT_EXTENSIONS[fmt]
+    df = apply_schema(df, schema)
+
+    if fmt == 'parquet':
+        df.to_parquet(path, engine='pyarrow', compression=compression, index=False)
+    elif fmt == 'arrow':
+        feather.write_feather(df, path, compression=compression or 'uncompressed')
+    else:
+        df.to_csv(path, index=False)
+    record_file_written(path)
+    return path
+
+def read_frame(path, schema=None, columns=None, memory_map=True):
+    """
+    Reads an intermediate file written by write_frame (format from the extension).
+
+    Parquet and Arrow files are memory-mapped; CSV files are parsed with the
+    schema's dtypes so they come back with the same types as the columnar ones.
+    """
+    ext = os.path.splitext(path)[1]
+    if ext == FORMAT_EXTENSIONS['parquet']:
+        return pd.read_parquet(path, engine='pyarrow', columns=columns, memory_map=memory_map)
+    if ext == FORMAT_EXTENSIONS['arrow']:
+        return feather.read_table(path, columns=columns, memory_map=memory_map).to_pandas()
+
+    dtypes = dict(SCHEMAS[schema]) if schema else {}
+    parse_dates = [col for col, dtype in dtypes.items() if dtype.startswith('datetime64')]
+    for col in parse_dates:
+        del dtypes[col]
+    return pd.read_csv(path, usecols=columns, dtype=dtypes or None, parse_dates=parse_dates or False)
+
+def find_frame(base_path):
+    """Returns the existing intermediate file for base_path in any format, or None."""
+    for ext in FORMAT_EXTENSIONS.values():
+        if os.path.exists(base_path + ext):
+            return base_path + ext
+    return None
+
+def glob_frames(pattern):
+    """Returns the intermediate files matching a glob pattern without extension, sorted."""
+    paths = []
+    for ext in FORMAT_EXTENSIONS.values():
+        paths.extend(glob.glob(pattern + ext))
+    return sorted(paths)
\ No newline at end of file
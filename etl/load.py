@@ -1,7 +1,13 @@
 import mysql.connector
 import logging
-from config import config  # Import database configuration
+from config import etl_config as config  # Import database configuration
+from db.connection_pool import get_connection
+from db.query_cache import bump_load_epoch
 import pandas as pd
+import numpy as np
+from etl.bulk_load import bulk_load
+from etl.aggregates import refresh_daily_aggregates
+from etl.dim_waktu import waktu_id_from_datetime, calendar_rows_for
 
 LOG_FILE = "loading.log"
 logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
@@ -10,8 +16,7 @@ logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
 def create_dw_connection():
     """Establishes a connection to the data warehouse."""
     try:
-        dw_config = config.dw_config  # Use separate config for DW
-        connection = mysql.connector.connect(**dw_config)
+        connection = get_connection('dw')  # Pooled; close() returns it to the pool
         logging.info("Connected to data warehouse successfully.")
         return connection
     except mysql.connector.Error as err:
@@ -21,64 +26,447 @@ def create_dw_connection():
 def create_staging_connection():
     """Establishes a connection to the staging database."""
     try:
-        staging_config = config.staging_config
-        connection = mysql.connector.connect(**staging_config)
+        connection = get_connection('staging')
         logging.info("Connected to staging database.")
         return connection
     except mysql.connector.Error as err:
         logging.error(f"Error connecting to staging database: {err}")
         return None
 
-def load_data_to_dw(connection, df, table_name):
-    """Loads data from a Pandas DataFrame into a table in the data warehouse."""
+# Natural keys used to merge re-loaded rows instead of duplicating them
+DIMENSION_KEYS = {
+    'dim_kota': 'kota_id',
+    'dim_gudang': 'gudang_id',
+    'dim_minimart': 'minimart_id',
+    'dim_cashier': 'cashier_id',
+    'dim_barang': 'barang_id',
+    'dim_waktu': 'waktu_id',
+}
+FACT_KEYS = {
+    'fact_sales': ['transaction_id', 'barang_id'],
+}
+# Dimensions whose members the fact load adds, kept in the in-process key cache
+CACHED_DIMENSIONS = ('dim_minimart', 'dim_cashier', 'dim_barang', 'dim_waktu')
+# fact_sales has one row per line item; a transaction without line items is
+# kept as a single row under this barang_id, which dim_barang never holds
+NO_ITEM_BARANG_ID = 0
+
+def values_differ(new, old):
+    """
+    Compares two columns element-wise. Numbers are compared as numbers (so
+    DECIMAL and int values from MySQL match pandas floats), datetimes as
+    timestamps and everything else as text; two nulls of any kind are equal.
+    """
+    new_null, old_null = new.isna().to_numpy(), old.isna().to_numpy()
+    new_num, old_num = pd.to_numeric(new, errors='coerce'), pd.to_numeric(old, errors='coerce')
+    if pd.api.types.is_datetime64_any_dtype(new) or pd.api.types.is_datetime64_any_dtype(old):
+        differ = (pd.to_datetime(new, errors='coerce') != pd.to_datetime(old, errors='coerce')).to_numpy()
+    elif (new_num.notna().to_numpy() != new_null).all() and (old_num.notna().to_numpy() != old_null).all():
+        differ = new_num.to_numpy(dtype=np.float64) != old_num.to_numpy(dtype=np.float64)
+    else:
+        differ = new.astype(str).to_numpy() != old.astype(str).to_numpy()
+    return np.where(new_null | old_null, new_null != old_null, differ)
+
+def select_changed_rows(connection, df, table_name, key, lookup_batch_size=1000):
+    """
+    Keeps only the rows of df that are new or differ from what the DW holds.
+
+    Existing rows are looked up by key in batches, so the cost is bounded by
+    the batch, not by the size of the dimension table.
+    """
+    keys = df[key].drop_duplicates().tolist()
+    cols = list(df.columns)
+    existing_parts = []
+    for start in range(0, len(keys), lookup_batch_size):
+        key_batch = keys[start:start + lookup_batch_size]
+        placeholders = ",".join(['%s'] * len(key_batch))
+        query = f"SELECT {','.join(cols)} FROM {table_name} WHERE {key} IN ({placeholders})"
+        existing_parts.append(pd.read_sql(query, connection, params=tuple(key_batch)))
+    if not existing_parts:
+        return df
+
+    existing = pd.concat(existing_parts, ignore_index=True)
+    merged = df.merge(existing, on=key, how='left', suffixes=('', '_dw'), indicator=True)
+    changed = (merged['_merge'] == 'left_only').to_numpy()
+    for col in cols:
+        if col == key:
+            continue
+        changed |= values_differ(merged[col], merged[f"{col}_dw"])
+    return df[changed]
+
+def load_data_to_dw(connection, df, table_name, mode=None):
+    """
+    Loads data from a Pandas DataFrame into a table in the data warehouse.
+
+    Args:
+        connection: MySQL connection to the data warehouse.
+        df:         The rows to load.
+        table_name: The target table.
+        mode:       'upsert' or 'insert' (defaults to config.dw_load_mode). In
+                    upsert mode dimension rows are diffed against the DW and
+                    only new or changed keys are written; fact rows are
+                    deduplicated on their natural key (FACT_KEYS). Both are written with
+                    INSERT ... ON DUPLICATE KEY UPDATE, so re-runs are safe.
+    """
     if connection is None:
         logging.error("No database connection. Load operation aborted.")
-        return
+        return False
 
-    cursor = connection.cursor()
-    try:
-        cols = ",".join(df.columns)
-        placeholders = ",".join(['%s'] * len(df.columns))
-        sql = f"INSERT INTO {table_name} ({cols}) VALUES ({placeholders})"
-        values = [tuple(x) for x in df.to_numpy()]
-        cursor.executemany(sql, values)
-        connection.commit()
+    mode = mode or config.dw_load_mode
+    on_duplicate = "error"
+    if mode == 'upsert':
+        key = DIMENSION_KEYS.get(table_name)
+        key_columns = [key] if key else FACT_KEYS.get(table_name)
+        if key_columns:
+            df = df.drop_duplicates(subset=key_columns, keep='last')
+            if key:
+                try:
+                    df = select_changed_rows(connection, df, table_name, key)
+                except (mysql.connector.Error, pd.errors.DatabaseError) as err:
+                    logging.error(f"Error diffing {table_name} against the DW, upserting all rows: {err}")
+            on_duplicate = "update"
+        if df.empty:
+            logging.info(f"No new or changed rows for {table_name}.")
+            return True
+
+    loaded = bulk_load(connection, df, table_name, on_duplicate=on_duplicate)
+    if loaded == len(df):
         logging.info(f"{len(df)} records loaded into {table_name}.")
+        return True
+    logging.error(f"Only {loaded} of {len(df)} records loaded into {table_name}.")
+    return False
+
+STAGING_TABLES = ("staging_transaksi", "staging_isi_transaksi")
+
+def clear_staging(staging_conn):
+    """
+    Empties the staging tables once their batch is in the data warehouse,
+    so the next load only sees the next delta batch.
+    """
+    cursor = staging_conn.cursor()
+    try:
+        for table_name in STAGING_TABLES:
+            cursor.execute(f"DELETE FROM {table_name}")
+        staging_conn.commit()
+        logging.info("Cleared staging tables.")
     except mysql.connector.Error as err:
-        logging.error(f"Error loading data into {table_name}: {err}")
-        connection.rollback()
+        logging.error(f"Error clearing staging tables: {err}")
+        staging_conn.rollback()
+    finally:
+        cursor.close()
+
+class DimensionKeyCache:
+    """
+    In-process cache of the keys already present in the DW dimension tables.
+
+    Keys are held per dimension as sorted int64 numpy arrays, warmed once from
+    the DW and extended as new members are inserted. Fact batches are checked
+    against it with vectorized membership tests, so only unseen keys cost a
+    database round trip.
+    """
+
+    def __init__(self):
+        self.keys = {}
+
+    def warm(self, dw_conn, tables=CACHED_DIMENSIONS):
+        """Loads every key of the given dimension tables from the DW."""
+        cursor = dw_conn.cursor()
+        try:
+            for table_name in tables:
+                key = DIMENSION_KEYS[table_name]
+                cursor.execute(f"SELECT {key} FROM {table_name}")
+                self.keys[table_name] = np.unique(np.fromiter((row[0] for row in cursor), dtype=np.int64))
+                logging.info(f"Dimension cache warmed: {len(self.keys[table_name])} keys in {table_name}")
+        finally:
+            cursor.close()
+
+    def missing(self, table_name, keys):
+        """Returns the distinct keys (sorted) not yet present in a dimension."""
+        keys = pd.unique(pd.Series(keys).dropna().astype(np.int64))
+        known = self.keys.get(table_name, np.empty(0, dtype=np.int64))
+        return np.sort(keys[~np.isin(keys, known, assume_unique=True)])
+
+    def add(self, table_name, keys):
+        """Records newly inserted dimension keys."""
+        known = self.keys.get(table_name, np.empty(0, dtype=np.int64))
+        self.keys[table_name] = np.union1d(known, np.asarray(keys, dtype=np.int64))
+
+_dimension_cache = None
+
+def get_dimension_cache(dw_conn):
+    """Returns the process-wide dimension cache, warming it on first use."""
+    global _dimension_cache
+    if _dimension_cache is None:
+        cache = DimensionKeyCache()
+        cache.warm(dw_conn)
+        _dimension_cache = cache
+    return _dimension_cache
+
+def reset_dimension_cache():
+    """Drops the cached keys, e.g. after dimension tables were rebuilt outside this process."""
+    global _dimension_cache
+    _dimension_cache = None
+
+def fetch_members(connection, query, key, ids, lookup_batch_size=1000):
+    """Runs a member query restricted to the given key values."""
+    parts = []
+    for start in range(0, len(ids), lookup_batch_size):
+        id_batch = [int(i) for i in ids[start:start + lookup_batch_size]]
+        placeholders = ",".join(['%s'] * len(id_batch))
+        parts.append(pd.read_sql(f"{query} WHERE {key} IN ({placeholders})", connection, params=tuple(id_batch)))
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+def load_new_members(dw_conn, cache, table_name, df):
+    """Loads new dimension members and records their keys in the cache."""
+    if df.empty:
+        return True
+    if load_data_to_dw(dw_conn, df, table_name):
+        cache.add(table_name, df[DIMENSION_KEYS[table_name]])
+        logging.info(f"Loaded {len(df)} new members into {table_name}")
+        return True
+    return False
+
+def build_line_item_facts(transactions, lines):
+    """
+    Expands staged transactions into fact_sales rows, one per line item.
+
+    Line amounts are quantity x unit price (profit as in staging, where it is
+    the sales amount). Payment and change belong to the whole transaction, so
+    they stay on its first line (lowest barang_id) and are 0 on the others.
+    A transaction without line items keeps one row with its staged amounts
+    under NO_ITEM_BARANG_ID, so transaction counts still include it.
+
+    Args:
+        transactions: Staged transactions under the fact_sales column names.
+        lines:        transaction_id, barang_id, quantity_sold, harga_satuan.
+    """
+    lines = lines.sort_values(['transaction_id', 'barang_id'], kind='stable')
+    facts = transactions.merge(lines, on='transaction_id', how='left')
+    has_item = facts['barang_id'].notna().to_numpy()
+    line_total = (facts['quantity_sold'].to_numpy(dtype=np.int64, na_value=0)
+                  * facts['harga_satuan'].to_numpy(dtype=np.int64, na_value=0))
+    facts['total_amount'] = np.where(has_item, line_total, facts['total_amount'])
+    facts['profit'] = np.where(has_item, line_total, facts['profit'])
+    later_lines = facts['transaction_id'].duplicated().to_numpy()
+    facts.loc[later_lines, ['payment_amount', 'change_amount']] = 0
+    facts['barang_id'] = facts['barang_id'].to_numpy(dtype=np.int64, na_value=NO_ITEM_BARANG_ID)
+    facts['quantity_sold'] = facts['quantity_sold'].to_numpy(dtype=np.int64, na_value=0)
+    return facts.drop(columns='harga_satuan')
+
+# Set-based staging -> DW statements for the push-down strategy. {src},
+# {stg} and {dw} are the source, staging and DW schema names; new dimension
+# members are read from the source minimart/pegawai/barang tables for the keys
+# in staging that the DW does not have yet (an anti-join), and waktu_id uses
+# the same YYYYMMDDHH key as etl/dim_waktu.py. Facts are built as in
+# build_line_item_facts. Transactions without a tanggal_waktu cannot be
+# placed in a fact_sales partition and are skipped.
+PUSHDOWN_STATEMENTS = [
+    ('dim_minimart', """
+        INSERT INTO {dw}.dim_minimart (minimart_id, minimart_nama, kota_id, gudang_id, minimart_alamat)
+        SELECT m.minimart_id, m.minimart_nama, m.kota_id, m.gudang_id, m.minimart_alamat
+        FROM {src}.minimart m
+        JOIN (SELECT DISTINCT minimart_id FROM {stg}.staging_transaksi) s ON s.minimart_id = m.minimart_id
+        LEFT JOIN {dw}.dim_minimart d ON d.minimart_id = m.minimart_id
+        WHERE d.minimart_id IS NULL
+    """),
+    ('dim_cashier', """
+        INSERT INTO {dw}.dim_cashier (cashier_id, cashier_nama, minimart_id)
+        SELECT p.pegawai_id, p.pegawai_nama, p.minimart_id
+        FROM {src}.pegawai p
+        JOIN (SELECT DISTINCT pegawai_id FROM {stg}.staging_transaksi) s ON s.pegawai_id = p.pegawai_id
+        LEFT JOIN {dw}.dim_cashier d ON d.cashier_id = p.pegawai_id
+        WHERE d.cashier_id IS NULL
+    """),
+    ('dim_barang', """
+        INSERT INTO {dw}.dim_barang (barang_id, barang_nama)
+        SELECT b.barang_id, b.barang_nama
+        FROM {src}.barang b
+        JOIN (SELECT DISTINCT barang_id FROM {stg}.staging_isi_transaksi) s ON s.barang_id = b.barang_id
+        LEFT JOIN {dw}.dim_barang d ON d.barang_id = b.barang_id
+        WHERE d.barang_id IS NULL
+    """),
+    ('dim_waktu', """
+        INSERT IGNORE INTO {dw}.dim_waktu (waktu_id, tanggal, jam, hari, minggu, bulan, tahun)
+        SELECT DISTINCT CAST(DATE_FORMAT(s.tanggal_waktu, '%Y%m%d%H') AS UNSIGNED),
+            DATE(s.tanggal_waktu), HOUR(s.tanggal_waktu), DAYNAME(s.tanggal_waktu),
+            WEEK(s.tanggal_waktu, 0), MONTH(s.tanggal_waktu), YEAR(s.tanggal_waktu)
+        FROM {stg}.staging_transaksi s
+        LEFT JOIN {dw}.dim_waktu w
+            ON w.waktu_id = CAST(DATE_FORMAT(s.tanggal_waktu, '%Y%m%d%H') AS UNSIGNED)
+        WHERE s.tanggal_waktu IS NOT NULL AND w.waktu_id IS NULL
+    """),
+    ('fact_sales', """
+        INSERT INTO {dw}.fact_sales (transaction_id, minimart_id, cashier_id, barang_id, quantity_sold,
+            payment_amount, change_amount, total_amount, profit, sales_datetime, waktu_id)
+        SELECT s.transaksi_id, s.minimart_id, s.pegawai_id, COALESCE(i.barang_id, {no_item}),
+            COALESCE(i.isi_transaksi_jumlah, 0),
+            CASE WHEN i.barang_id IS NULL OR i.barang_id = l.first_barang_id THEN s.transaksi_pembayaran ELSE 0 END,
+            CASE WHEN i.barang_id IS NULL OR i.barang_id = l.first_barang_id THEN s.transaksi_kembalian ELSE 0 END,
+            CASE WHEN i.barang_id IS NULL THEN s.total_amount
+                 ELSE COALESCE(i.isi_transaksi_jumlah, 0) * COALESCE(i.harga_satuan, 0) END,
+            CASE WHEN i.barang_id IS NULL THEN s.profit
+                 ELSE COALESCE(i.isi_transaksi_jumlah, 0) * COALESCE(i.harga_satuan, 0) END,
+            s.tanggal_waktu, CAST(DATE_FORMAT(s.tanggal_waktu, '%Y%m%d%H') AS UNSIGNED)
+        FROM {stg}.staging_transaksi s
+        LEFT JOIN {stg}.staging_isi_transaksi i ON i.transaksi_id = s.transaksi_id
+        LEFT JOIN (SELECT transaksi_id, MIN(barang_id) AS first_barang_id
+                   FROM {stg}.staging_isi_transaksi GROUP BY transaksi_id) l ON l.transaksi_id = s.transaksi_id
+        WHERE s.tanggal_waktu IS NOT NULL
+        {on_duplicate}
+    """),
+]
+PUSHDOWN_FACT_UPSERT = """ON DUPLICATE KEY UPDATE minimart_id = VALUES(minimart_id), cashier_id = VALUES(cashier_id),
+            quantity_sold = VALUES(quantity_sold), payment_amount = VALUES(payment_amount), change_amount = VALUES(change_amount),
+            total_amount = VALUES(total_amount), profit = VALUES(profit), waktu_id = VALUES(waktu_id)"""
+
+def log_undated(transaction_ids):
+    """Reports staged transactions left out of fact_sales because they have no tanggal_waktu."""
+    if transaction_ids:
+        logging.warning(f"Skipping {len(transaction_ids)} staged transactions without tanggal_waktu "
+                        f"(sales_datetime is NOT NULL in fact_sales): {transaction_ids[:10]}")
+
+def same_server(first, second):
+    """True if two connection configs point at the same MySQL server."""
+    return (first.get('host'), first.get('port', 3306)) == (second.get('host'), second.get('port', 3306))
+
+def use_pushdown(strategy=None):
+    """Resolves config.dw_load_strategy ('pushdown', 'client' or 'auto') for this deployment."""
+    strategy = strategy or config.dw_load_strategy
+    if strategy == 'auto':
+        # Dimension members come from the source tables, so all three must share the server
+        return same_server(config.staging_config, config.dw_config) \
+            and same_server(config.db_config, config.dw_config)
+    return strategy == 'pushdown'
+
+def push_down_staging_to_dw(dw_conn, mode=None):
+    """
+    Loads staging into the DW with set-based INSERT ... SELECT statements.
+
+    Everything runs on the DW connection inside one transaction, so no row
+    leaves the server. Facts are upserted on their natural key in 'upsert'
+    mode, as on the client path.
+
+    Returns:
+        The days (as Timestamps) the loaded facts fall on.
+
+    Raises:
+        mysql.connector.Error: the transaction is rolled back and nothing is loaded.
+    """
+    mode = mode or config.dw_load_mode
+    names = {'src': config.db_config['database'], 'stg': config.staging_config['database'], 'dw': config.dw_config['database'],
+             'on_duplicate': PUSHDOWN_FACT_UPSERT if mode == 'upsert' else "", 'no_item': NO_ITEM_BARANG_ID}
+    cursor = dw_conn.cursor()
+    try:
+        cursor.execute(f"SELECT transaksi_id FROM {names['stg']}.staging_transaksi WHERE tanggal_waktu IS NULL")
+        log_undated([row[0] for row in cursor.fetchall()])
+        cursor.execute(f"SELECT DISTINCT DATE(tanggal_waktu) FROM {names['stg']}.staging_transaksi "
+                       "WHERE tanggal_waktu IS NOT NULL")
+        touched_days = [pd.Timestamp(row[0]) for row in cursor.fetchall()]
+        if not touched_days:
+            return []
+        for table_name, statement in PUSHDOWN_STATEMENTS:
+            cursor.execute(statement.format(**names))
+            logging.info(f"Push-down load of {table_name}: {cursor.rowcount} rows affected")
+        dw_conn.commit()
+    except mysql.connector.Error:
+        dw_conn.rollback()
+        raise
     finally:
         cursor.close()
+    reset_dimension_cache()  # Members were added behind the cache's back
+    return touched_days
+
+def load_from_staging_to_dw(dw_conn, staging_conn, strategy=None):
+    """
+    Loads transformed data from staging tables into the data warehouse.
+
+    When the source, staging and the DW share a server (see
+    config.dw_load_strategy) the load is pushed down into MySQL as
+    INSERT ... SELECT statements; a failed push-down is rolled back and
+    reported as a failed load. On separate servers the client path below is
+    used.
+
+    Staging holds only the delta batch(es) produced since the last load. The
+    staged transactions and line items are read once, expanded to one fact
+    row per line item and keyed to the hour-grain calendar in pandas; their
+    dimension keys are resolved against the in-process DimensionKeyCache and
+    only members not yet in the DW are fetched from the source minimart,
+    pegawai and barang tables and inserted.
+
+    Returns:
+        True if every step completed, False otherwise.
+    """
 
-def load_from_staging_to_dw(dw_conn, staging_conn):
-    """Loads transformed data from staging tables into the data warehouse."""
+    if use_pushdown(strategy):
+        try:
+            touched_days = push_down_staging_to_dw(dw_conn)
+            if not touched_days:
+                logging.info("Staging is empty. Nothing to load.")
+                return True
+            loaded = refresh_daily_aggregates(dw_conn, touched_days)
+            bump_load_epoch(dw_conn)
+            return loaded
+        except mysql.connector.Error as err:
+            logging.error(f"Push-down load from staging to DW failed: {err}")
+            return False
 
+    loaded = True
     try:
-        # 1. Load into dim_minimart
-        dim_minimart_df = pd.read_sql("SELECT DISTINCT minimart_id, minimart_nama, kota_id, gudang_id, minimart_alamat FROM staging_transaksi", staging_conn)
-        load_data_to_dw(dw_conn, dim_minimart_df, 'dim_minimart')
-        logging.info("Loaded data into dim_minimart")
-
-        # 2. Load into dim_cashier
-        dim_cashier_df = pd.read_sql("SELECT DISTINCT cashier_id, pegawai_nama, minimart_id FROM staging_transaksi", staging_conn)
-        dim_cashier_df = dim_cashier_df.rename(columns={'pegawai_nama': 'cashier_nama'})
-        load_data_to_dw(dw_conn, dim_cashier_df, 'dim_cashier')
-        logging.info("Loaded data into dim_cashier")
-
-        # 3. Load into dim_waktu
-        dim_waktu_df = pd.read_sql("SELECT DISTINCT DATE(original_transaction_datetime) as tanggal, HOUR(original_transaction_datetime) as jam, DAYNAME(original_transaction_datetime) as hari, WEEK(original_transaction_datetime) as minggu, MONTH(original_transaction_datetime) as bulan, YEAR(original_transaction_datetime) as tahun, UNIX_TIMESTAMP(original_transaction_datetime) as waktu_id FROM staging_transaksi", staging_conn)
-        load_data_to_dw(dw_conn, dim_waktu_df, 'dim_waktu')
-        logging.info("Loaded data into dim_waktu")
+        cache = get_dimension_cache(dw_conn)
+
+        transactions_df = pd.read_sql("SELECT transaksi_id AS transaction_id, minimart_id, pegawai_id AS cashier_id, transaksi_pembayaran AS payment_amount, transaksi_kembalian AS change_amount, total_amount, profit, tanggal_waktu AS sales_datetime FROM staging_transaksi", staging_conn)
+        undated = transactions_df['sales_datetime'].isna()
+        if undated.any():
+            log_undated(transactions_df.loc[undated, 'transaction_id'].tolist())
+            transactions_df = transactions_df[~undated.to_numpy()].reset_index(drop=True)
+        if transactions_df.empty:
+            logging.info("Staging is empty. Nothing to load.")
+            return True
+        lines_df = pd.read_sql("SELECT transaksi_id AS transaction_id, barang_id, isi_transaksi_jumlah AS quantity_sold, harga_satuan FROM staging_isi_transaksi", staging_conn)
+        fact_sales_df = build_line_item_facts(transactions_df, lines_df)
+        fact_sales_df['waktu_id'] = waktu_id_from_datetime(fact_sales_df['sales_datetime'])
+
+        # 1-2. Load new dim_minimart, dim_cashier and dim_barang members from the source tables
+        new_minimart_ids = cache.missing('dim_minimart', fact_sales_df['minimart_id'])
+        new_cashier_ids = cache.missing('dim_cashier', fact_sales_df['cashier_id'])
+        new_barang_ids = cache.missing('dim_barang', fact_sales_df.loc[
+            fact_sales_df['barang_id'] != NO_ITEM_BARANG_ID, 'barang_id'])
+        if len(new_minimart_ids) or len(new_cashier_ids) or len(new_barang_ids):
+            source_conn = get_connection('oltp')
+            try:
+                dim_minimart_df = fetch_members(source_conn, "SELECT minimart_id, minimart_nama, kota_id, gudang_id, minimart_alamat FROM minimart", 'minimart_id', new_minimart_ids)
+                dim_cashier_df = fetch_members(source_conn, "SELECT pegawai_id AS cashier_id, pegawai_nama AS cashier_nama, minimart_id FROM pegawai", 'pegawai_id', new_cashier_ids)
+                dim_barang_df = fetch_members(source_conn, "SELECT barang_id, barang_nama FROM barang", 'barang_id', new_barang_ids)
+            finally:
+                source_conn.close()
+            loaded = load_new_members(dw_conn, cache, 'dim_minimart', dim_minimart_df) and loaded
+            loaded = load_new_members(dw_conn, cache, 'dim_cashier', dim_cashier_df) and loaded
+            loaded = load_new_members(dw_conn, cache, 'dim_barang', dim_barang_df) and loaded
+
+        # 3. Extend dim_waktu for hours outside the pre-populated calendar
+        new_ids = cache.missing('dim_waktu', fact_sales_df['waktu_id'])
+        new_times = fact_sales_df.loc[fact_sales_df['waktu_id'].isin(new_ids), 'sales_datetime']
+        loaded = load_new_members(dw_conn, cache, 'dim_waktu', calendar_rows_for(new_times)) and loaded
 
         # 4. Load into fact_sales
-        fact_sales_df = pd.read_sql("SELECT transaction_id, minimart_id, cashier_id, UNIX_TIMESTAMP(original_transaction_datetime) as waktu_id, original_total_amount, payment_amount, change_amount, total_amount, profit, original_transaction_datetime as sales_datetime FROM staging_transaksi", staging_conn)
-        load_data_to_dw(dw_conn, fact_sales_df, 'fact_sales')
+        facts_loaded = load_data_to_dw(dw_conn, fact_sales_df, 'fact_sales')
+        loaded = facts_loaded and loaded
         logging.info("Loaded data into fact_sales")
 
+        # 5. Refresh the daily aggregates for the days this batch touched
+        if facts_loaded:
+            touched_days = pd.to_datetime(fact_sales_df['sales_datetime']).dt.normalize().unique()
+            loaded = refresh_daily_aggregates(dw_conn, touched_days) and loaded
+
+            # 6. Invalidate cached report query results
+            bump_load_epoch(dw_conn)
+        return loaded
+
     except mysql.connector.Error as err:
         logging.error(f"Error loading data from staging to DW: {err}")
     except Exception as e:
         logging.error(f"An unexpected error occurred: {e}")
+    return False
 
 def main():
     """Main function to orchestrate the loading process from staging to DW."""
@@ -86,7 +474,8 @@ def main():
     staging_conn = create_staging_connection()
 
     if dw_conn and staging_conn:
-        load_from_staging_to_dw(dw_conn, staging_conn)
+        if load_from_staging_to_dw(dw_conn, staging_conn):
+            clear_staging(staging_conn)
 
         dw_conn.close()
         staging_conn.close()
@@ -0,0 +1,185 @@
+import argparse
+import logging
+import time
+import tracemalloc
+import pandas as pd
+import mysql.connector
+from config import etl_config as config
+from etl import watermark
+from etl.intermediate import apply_schema
+from etl.extract import create_db_connection, build_delta_filter
+from etl.transform import transform_transactions_data, create_staging_connection, load_transformed_to_staging
+from etl.load import create_dw_connection, load_from_staging_to_dw, clear_staging
+
+LOG_FILE = "streaming.log"
+logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+TRANSAKSI_COLUMNS = ['transaksi_id', 'minimart_id', 'pegawai_id', 'tanggal_waktu',
+                     'transaksi_total', 'transaksi_pembayaran', 'transaksi_kembalian']
+ISI_TRANSAKSI_COLUMNS = ['transaksi_id', 'barang_id', 'isi_transaksi_jumlah', 'harga_satuan']
+
+def iter_source_chunks(connection, chunk_size, since=None):
+    """
+    Streams transaksi rows joined with their line items in chunks.
+
+    The query runs on an unbuffered (server-side) cursor, so only one chunk is
+    held in memory at a time. Rows come ordered by (tanggal_waktu, transaksi_id);
+    the rows of the last transaction in a chunk are held back and prepended to
+    the next chunk, so a transaction is never split across two chunks and the
+    per-transaction groupby in the transform stays correct.
+
+    Args:
+        connection: MySQL connection to the source database.
+        chunk_size: Number of rows fetched per round trip.
+        since:      Optional watermark dict; only newer transactions are read.
+
+    Yields:
+        DataFrames of complete transactions.
+    """
+    where, params = build_delta_filter("t", since=since)
+    query = f"""
+        SELECT
+            t.transaksi_id, t.minimart_id, t.pegawai_id, t.tanggal_waktu,
+            t.transaksi_total, t.transaksi_pembayaran, t.transaksi_kembalian,
+            it.barang_id, it.isi_transaksi_jumlah, it.harga_satuan
+        FROM
+            transaksi t
+        LEFT JOIN
+            isi_transaksi it ON it.transaksi_id = t.transaksi_id
+        {where}
+        ORDER BY
+            t.tanggal_waktu, t.transaksi_id
+    """
+
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute(query, tuple(params))
+        columns = [desc[0] for desc in cursor.description]
+        carry = None
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            chunk = pd.DataFrame.from_records(rows, columns=columns)
+            if carry is not None:
+                chunk = pd.concat([carry, chunk], ignore_index=True)
+
+            ids = chunk['transaksi_id'].to_numpy()
+            is_tail = ids == ids[-1]
+            carry = chunk[is_tail]
+            if not is_tail.all():
+                yield chunk[~is_tail]
+
+        if carry is not None and not carry.empty:
+            yield carry
+    finally:
+        cursor.close()
+
+def split_chunk(chunk):
+    """Splits a joined chunk back into typed transaksi and isi_transaksi frames."""
+    df_transaksi = apply_schema(chunk[TRANSAKSI_COLUMNS].drop_duplicates(subset=['transaksi_id']), 'transaksi')
+    df_isi_transaksi = apply_schema(chunk[ISI_TRANSAKSI_COLUMNS].dropna(subset=['barang_id']), 'isi_transaksi')
+    return df_transaksi, df_isi_transaksi
+
+def run_streaming_etl(chunk_size=None, dry_run=False, incremental=True):
+    """
+    Runs extract, transform and load chunk by chunk with bounded memory.
+
+    Each chunk is transformed, written to staging and moved into the data
+    warehouse before the next chunk is read. The watermark is advanced after
+    every chunk, so an interrupted run resumes at the first unloaded chunk.
+
+    Args:
+        chunk_size:  Rows per fetch (defaults to config.stream_chunk_size).
+        dry_run:     Only read and transform; nothing is written and memory
+                     is traced with tracemalloc for profiling.
+        incremental: Start from the stored watermark instead of the beginning.
+
+    Returns:
+        A dictionary of run statistics, or None if a connection failed.
+    """
+    chunk_size = chunk_size or config.stream_chunk_size
+    source_conn = create_db_connection()
+    staging_conn = dw_conn = None
+    if not dry_run:
+        staging_conn = create_staging_connection()
+        dw_conn = create_dw_connection()
+    if source_conn is None or (not dry_run and (staging_conn is None or dw_conn is None)):
+        logging.error("Failed to open connections. Streaming ETL aborted.")
+        return None
+
+    since = watermark.get_watermark("transaksi") if incremental else None
+    stats = {'chunk_size': chunk_size, 'chunks': 0, 'rows': 0, 'transactions': 0, 'failed': False}
+
+    if dry_run:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        for chunk in iter_source_chunks(source_conn, chunk_size, since=since):
+            chunk_start = time.perf_counter()
+            df_transaksi, df_isi_transaksi = split_chunk(chunk)
+            transformed_df = transform_transactions_data(df_transaksi, df_isi_transaksi)
+
+            if not dry_run:
+                if transformed_df.empty \
+                        or not load_transformed_to_staging(staging_conn, transformed_df, df_isi_transaksi) \
+                        or not load_from_staging_to_dw(dw_conn, staging_conn):
+                    logging.error(f"Chunk {stats['chunks'] + 1} failed. Stopping; watermark left at last loaded chunk.")
+                    stats['failed'] = True
+                    break
+                clear_staging(staging_conn)
+                last_row = df_transaksi.iloc[-1]
+                for table_name in watermark.TRACKED_TABLES:
+                    watermark.set_watermark(table_name, last_row['tanggal_waktu'], last_row['transaksi_id'])
+
+            chunk_seconds = time.perf_counter() - chunk_start
+            stats['chunks'] += 1
+            stats['rows'] += len(chunk)
+            stats['transactions'] += len(df_transaksi)
+            logging.info(f"Chunk {stats['chunks']}: {len(chunk)} rows in {chunk_seconds:.3f}s "
+                         f"({len(chunk) / chunk_seconds if chunk_seconds else 0:.0f} rows/s)")
+    except mysql.connector.Error as err:
+        logging.error(f"Error streaming source data: {err}")
+        stats['failed'] = True
+    finally:
+        stats['seconds'] = time.perf_counter() - start
+        if dry_run:
+            stats['peak_traced_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+        for conn in (source_conn, staging_conn, dw_conn):
+            if conn:
+                conn.close()
+
+    stats['rows_per_sec'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+    logging.info(f"Streaming ETL finished: {stats}")
+    return stats
+
+def profile_chunk_sizes(chunk_sizes):
+    """
+    Runs a dry-run stream over the full source for each chunk size and reports the results.
+
+    Memory is compared by the tracemalloc peak, which is reset for every run.
+    The process-wide ru_maxrss never goes down, so it would only show the
+    largest chunk size profiled so far.
+    """
+    results = []
+    for chunk_size in chunk_sizes:
+        stats = run_streaming_etl(chunk_size, dry_run=True, incremental=False)
+        if stats:
+            results.append(stats)
+    return pd.DataFrame(results, columns=['chunk_size', 'chunks', 'rows', 'seconds',
+                                          'rows_per_sec', 'peak_traced_mb'])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Streaming, bounded-memory ETL from POS to DW.")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Rows per chunk.")
+    parser.add_argument("--profile", nargs="+", type=int, metavar="CHUNK_SIZE",
+                        help="Dry-run the stream for each chunk size and print peak traced memory and rows/sec.")
+    args = parser.parse_args()
+
+    if args.profile:
+        print(profile_chunk_sizes(args.profile).to_string(index=False))
+    else:
+        stats = run_streaming_etl(args.chunk_size)
+        print(stats if stats else "Streaming ETL failed to start.")
\ No newline at end of file
@@ -1,7 +1,10 @@
 import mysql.connector
 import pandas as pd
 import logging
-from config import config  # To get database connection details
+import os
+from etl.bulk_load import bulk_load
+from etl.intermediate import read_frame, find_frame, glob_frames, SCHEMAS
+from db.connection_pool import get_connection
 
 LOG_FILE = "transformation.log"
 logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
@@ -10,8 +13,7 @@ logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
 def create_source_connection():
     """Establishes a connection to the source database (usaha_mulia)."""
     try:
-        source_config = config.db_config  # Use db_config for the source
-        connection = mysql.connector.connect(**source_config)
+        connection = get_connection('oltp')  # Pooled; close() returns it to the pool
         logging.info("Connected to source database (usaha_mulia).")
         return connection
     except mysql.connector.Error as err:
@@ -28,11 +30,38 @@ def fetch_source_data(connection, table_name):
         logging.error(f"Error fetching data from {table_name}: {err}")
         return pd.DataFrame()
 
+def read_extracted_batches(path="."):
+    """
+    Yields the delta batches written by run_extraction, oldest first.
+
+    Yields:
+        (batch_files, df_transaksi, df_isi_transaksi) tuples. batch_files
+        should be passed to mark_batch_done once the batch is in staging.
+    """
+    for transaksi_file in glob_frames(os.path.join(path, "extracted_transaksi_*")):
+        timestamp = os.path.splitext(os.path.basename(transaksi_file))[0][len("extracted_transaksi_"):]
+        isi_file = find_frame(os.path.join(path, f"extracted_isi_transaksi_{timestamp}"))
+        try:
+            df_transaksi = read_frame(transaksi_file, schema='transaksi')
+            df_isi_transaksi = (read_frame(isi_file, schema='isi_transaksi') if isi_file
+                                else pd.DataFrame(columns=list(SCHEMAS['isi_transaksi'])))  # Header-only batch
+        except Exception as e:
+            logging.error(f"Error reading extracted batch {timestamp}: {e}")
+            continue
+        batch_files = [f for f in (transaksi_file, isi_file) if f]
+        logging.info(f"Read extracted batch {timestamp} ({len(df_transaksi)} transactions)")
+        yield batch_files, df_transaksi, df_isi_transaksi
+
+def mark_batch_done(batch_files):
+    """Renames processed batch files so they are not picked up again."""
+    for f in batch_files:
+        os.replace(f, f"{f}.done")
+    logging.info(f"Marked batch as processed: {batch_files}")
+
 def create_staging_connection():
     """Establishes a connection to the staging database."""
     try:
-        staging_config = config.staging_config
-        connection = mysql.connector.connect(**staging_config)
+        connection = get_connection('staging')
         logging.info("Connected to staging database.")
         return connection
     except mysql.connector.Error as err:
@@ -40,80 +69,98 @@ def create_staging_connection():
         return None
 
 def load_to_staging(connection, df, table_name):
-    """Loads a Pandas DataFrame into a staging table."""
+    """
+    Loads a Pandas DataFrame into a staging table.
+
+    Rows whose key is already staged are overwritten, so re-running a batch
+    after a partial failure (bulk_load commits per batch) finishes the load
+    instead of failing on the rows that made it in the first time.
+    """
 
     if connection is None or df.empty:
         logging.warning(f"No connection or empty DataFrame. Not loading to {table_name}")
-        return
+        return False
 
-    cursor = connection.cursor()
-    try:
-        cols = ",".join(df.columns)
-        placeholders = ",".join(['%s'] * len(df.columns))
-        sql = f"INSERT INTO {table_name} ({cols}) VALUES ({placeholders})"
-        values = [tuple(x) for x in df.to_numpy()]
-        cursor.executemany(sql, values)
-        connection.commit()
+    loaded = bulk_load(connection, df, table_name, on_duplicate='update')
+    if loaded == len(df):
         logging.info(f"{len(df)} rows inserted into {table_name}")
-    except mysql.connector.Error as err:
-        logging.error(f"Error inserting into {table_name}: {err}")
-        connection.rollback()
-    finally:
-        cursor.close()
+        return True
+    logging.error(f"Only {loaded} of {len(df)} rows inserted into {table_name}")
+    return False
+
+# Column layout of the staging tables (db/create_staging_db.sql): the source
+# columns plus the amounts and hour computed by transform_transactions_data
+STAGING_TRANSAKSI_COLUMNS = ['transaksi_id', 'minimart_id', 'pegawai_id', 'tanggal_waktu', 'transaksi_total',
+                             'transaksi_pembayaran', 'transaksi_kembalian', 'total_amount', 'profit', 'jam']
+STAGING_ISI_TRANSAKSI_COLUMNS = ['transaksi_id', 'barang_id', 'isi_transaksi_jumlah', 'harga_satuan']
+
+def load_transformed_to_staging(connection, transformed_df, df_isi_transaksi):
+    """
+    Loads a transformed batch into staging_transaksi and its source line items
+    into staging_isi_transaksi (transactions without lines are valid).
+    """
+    loaded = load_to_staging(connection, transformed_df[STAGING_TRANSAKSI_COLUMNS], 'staging_transaksi')
+    if loaded and not df_isi_transaksi.empty:
+        lines = df_isi_transaksi[STAGING_ISI_TRANSAKSI_COLUMNS].drop_duplicates(
+            subset=['transaksi_id', 'barang_id'], keep='last')
+        loaded = load_to_staging(connection, lines, 'staging_isi_transaksi')
+    return loaded
 
 def transform_transactions_data(df_transaksi, df_isi_transaksi):
-    """Transforms the transactions data and loads it into staging tables."""
+    """
+    Transforms the transactions data for the staging tables.
+
+    The inputs are not modified. Line totals are computed on int64 arrays and
+    summed per transaction with a single groupby, then attached to transaksi
+    through an index lookup on the sorted transaction ids instead of a merge.
+    The output frame is assembled column by column from existing arrays, so
+    no rename/fillna/drop_duplicates copies of the whole frame are made. Nulls
+    are handled per column: amounts become 0, datetimes keep NaT.
+    """
 
     try:
-        # 1. Calculate total_amount from isi_transaksi
-        df_isi_transaksi['item_total'] = df_isi_transaksi['isi_transaksi_jumlah'] * df_isi_transaksi['harga_satuan']
-        df_total_amount = df_isi_transaksi.groupby('transaksi_id')['item_total'].sum().reset_index()
+        if 'tanggal_waktu' not in df_transaksi.columns:
+            logging.warning("Column 'tanggal_waktu' not found. Transformation skipped.")
+            return pd.DataFrame()
+
+        # 1. Remove duplicate transactions (a single row selection, only if needed)
+        duplicated = df_transaksi['transaksi_id'].duplicated()
+        if duplicated.any():
+            df_transaksi = df_transaksi[~duplicated.to_numpy()]
+            logging.info("Removed duplicate transactions.")
+
+        # 2. Calculate total_amount per transaction from isi_transaksi
+        line_totals = (df_isi_transaksi['isi_transaksi_jumlah'].to_numpy(dtype='int64', na_value=0)
+                       * df_isi_transaksi['harga_satuan'].to_numpy(dtype='int64', na_value=0))
+        totals_by_id = pd.Series(line_totals, copy=False).groupby(
+            df_isi_transaksi['transaksi_id'].to_numpy(), sort=True).sum()
         logging.info("Calculated total_amount from isi_transaksi.")
 
-        # 2. Join with transaksi table
-        df_transformed = pd.merge(df_transaksi, df_total_amount, on='transaksi_id', how='left')
+        # 3. Attach totals to transaksi by key lookup (transactions without lines get 0)
+        transaction_ids = df_transaksi['transaksi_id'].to_numpy()
+        total_amount = totals_by_id.reindex(transaction_ids, fill_value=0).to_numpy()
         logging.info("Joined transaksi and isi_transaksi data.")
 
-        # 3. Convert 'tanggal_waktu' to datetime objects
-        if 'tanggal_waktu' in df_transformed.columns:
-            df_transformed['transaction_datetime'] = pd.to_datetime(df_transformed['tanggal_waktu'])
-            logging.info("Converted 'tanggal_waktu' to datetime.")
-        else:
-            logging.warning("Column 'tanggal_waktu' not found. Transformation skipped.")
-            return pd.DataFrame()
-
-        # 4. Calculate profit (assuming total_amount is profit)
-        df_transformed['profit'] = df_transformed['item_total']
-        logging.info("Calculated 'profit'.")
-
-        # 5. Extract 'hour_of_day'
-        if 'transaction_datetime' in df_transformed.columns:
-            df_transformed['hour_of_day'] = df_transformed['transaction_datetime'].dt.hour
-            logging.info("Extracted 'hour_of_day'.")
-        else:
-            logging.warning("Column 'transaction_datetime' not found. Hour extraction skipped.")
-            df_transformed['hour_of_day'] = None
-
-        # 6. Rename columns for clarity
-        df_transformed = df_transformed.rename(columns={
-            'transaksi_id': 'transaction_id',
-            'minimart_id': 'minimart_id',
-            'pegawai_id': 'cashier_id',
-            'tanggal_waktu': 'original_transaction_datetime',  # Renamed original datetime
-            'transaksi_total': 'original_total_amount',  # Renamed original total
-            'transaksi_pembayaran': 'payment_amount',
-            'transaksi_kembalian': 'change_amount',
-            'item_total': 'total_amount'  # The calculated total
-        })
-        logging.info("Renamed columns.")
-
-        # 7. Handle missing values
-        df_transformed = df_transformed.fillna(0)
-        logging.warning("Handled missing values by filling with 0.")
-
-        # 8. Remove Duplicates
-        df_transformed = df_transformed.drop_duplicates(subset=['transaction_id'])
-        logging.info("Removed duplicate transactions.")
+        # 4. Datetime columns (converted only if the source is not already datetime64)
+        transaction_datetime = df_transaksi['tanggal_waktu']
+        if not pd.api.types.is_datetime64_any_dtype(transaction_datetime):
+            transaction_datetime = pd.to_datetime(transaction_datetime)
+        logging.info("Converted 'tanggal_waktu' to datetime.")
+
+        # 5. Assemble the output with the staging column names
+        df_transformed = pd.DataFrame({
+            'transaksi_id': transaction_ids,
+            'minimart_id': df_transaksi['minimart_id'].array,  # .array keeps nullable Int32 without an object copy
+            'pegawai_id': df_transaksi['pegawai_id'].array,
+            'tanggal_waktu': transaction_datetime.array,
+            'transaksi_total': df_transaksi['transaksi_total'].to_numpy(dtype='int64', na_value=0),
+            'transaksi_pembayaran': df_transaksi['transaksi_pembayaran'].to_numpy(dtype='int64', na_value=0),
+            'transaksi_kembalian': df_transaksi['transaksi_kembalian'].to_numpy(dtype='int64', na_value=0),
+            'total_amount': total_amount,
+            'profit': total_amount,  # Calculate profit (assuming total_amount is profit)
+            'jam': transaction_datetime.dt.hour.astype('Int8').array,
+        }, copy=False)
+        logging.info("Calculated 'profit' and extracted 'jam'.")
 
         return df_transformed
 
@@ -122,35 +169,30 @@ def transform_transactions_data(df_transaksi, df_isi_transaksi):
         return pd.DataFrame()
 
 if __name__ == '__main__':
-    #  Establish connections to both databases
-    source_conn = create_source_connection()
     staging_conn = create_staging_connection()
 
-    if source_conn and staging_conn:
-        #  Fetch data from the source database
-        df_transaksi = fetch_source_data(source_conn, "transaksi")
-        df_isi_transaksi = fetch_source_data(source_conn, "isi_transaksi")
+    if staging_conn:
+        #  Transform every delta batch written by extract.py since the last run
+        batches_loaded = 0
+        for batch_files, df_transaksi, df_isi_transaksi in read_extracted_batches():
+            if df_transaksi.empty:
+                mark_batch_done(batch_files)
+                continue
 
-        if not df_transaksi.empty and not df_isi_transaksi.empty:
             #  Transform the data
             transformed_df = transform_transactions_data(df_transaksi, df_isi_transaksi)
 
             if not transformed_df.empty:
                 #  Load the transformed data into staging tables
-                load_to_staging(staging_conn, transformed_df[['transaction_id', 'minimart_id', 'cashier_id', 'original_transaction_datetime',
-                                                             'original_total_amount', 'payment_amount', 'change_amount', 'total_amount',
-                                                             'profit', 'hour_of_day']], 'staging_transaksi')  # Load relevant columns
-
-                load_to_staging(staging_conn, transformed_df[['transaction_id', 'barang_id']], 'staging_isi_transaksi')  # Load relevant columns
-
-                print("Transformed data loaded into staging tables.")
+                if load_transformed_to_staging(staging_conn, transformed_df, df_isi_transaksi):
+                    mark_batch_done(batch_files)
+                    batches_loaded += 1
             else:
                 print("Transformation resulted in an empty DataFrame. Nothing loaded.")
-        else:
-            print("Could not fetch data from source tables.")
 
-        #  Close connections
-        source_conn.close()
+        print(f"{batches_loaded} extracted batch(es) loaded into staging tables.")
+
+        #  Close connection
         staging_conn.close()
     else:
-        print("Failed to connect to one or both databases.")
\ No newline at end of file
+        print("Failed to connect to the staging database.")
\ No newline at end of file
@@ -0,0 +1,62 @@
+import json
+import logging
+import os
+from config import etl_config as config
+
+# Source tables tracked by a high-water mark. isi_transaksi has no timestamp of
+# its own, so it is extracted through its parent transaksi row and shares the
+# same (tanggal_waktu, transaksi_id) ordering key.
+TRACKED_TABLES = ("transaksi", "isi_transaksi")
+
+def load_watermarks(path=None):
+    """Reads all stored high-water marks from disk."""
+    path = path or config.watermark_file
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as err:
+        logging.error(f"Error reading watermark file {path}: {err}")
+        return {}
+
+def get_watermark(table_name, path=None):
+    """
+    Returns the high-water mark for a table.
+
+    Returns:
+        A dictionary with 'tanggal_waktu' (ISO string) and 'transaksi_id',
+        or None if the table has never been extracted.
+    """
+    return load_watermarks(path).get(table_name)
+
+def set_watermark(table_name, tanggal_waktu, transaksi_id, path=None):
+    """Stores the high-water mark for a table (written atomically)."""
+    path = path or config.watermark_file
+    watermarks = load_watermarks(path)
+    watermarks[table_name] = {
+        'tanggal_waktu': str(tanggal_waktu),
+        'transaksi_id': int(transaksi_id),
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(watermarks, f, indent=2)
+    os.replace(tmp_path, path)
+    logging.info(f"Watermark for {table_name} set to {tanggal_waktu} / {transaksi_id}")
+
+def reset_watermark(table_name=None, path=None):
+    """Removes the high-water mark for one table, or for all tables if none is given."""
+    path = path or config.watermark_file
+    if table_name is None:
+        if os.path.exists(path):
+            os.remove(path)
+        logging.info("All watermarks reset.")
+        return
+
+    watermarks = load_watermarks(path)
+    if watermarks.pop(table_name, None) is not None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(watermarks, f, indent=2)
+        os.replace(tmp_path, path)
+    logging.info(f"Watermark for {table_name} reset.")
@@ -0,0 +1,297 @@
+"""
+Shared instrumentation for the pipeline stages.
+
+Work is wrapped in spans (`with span("stage", stage="load") as s:`). A span
+records its duration, rows in/out, bytes written, the process peak RSS, how
+many DB queries it ran and how long they took, and whether it failed. Every
+finished span is appended to a JSON-lines file, and the aggregated metrics
+can be written as a Prometheus text file (for node_exporter's textfile
+collector).
+
+Errors logged with logging.error while a span is active are counted on the
+span, so callers such as the pipeline can fail a stage whose functions
+logged an error and returned an empty result instead of raising.
+"""
+import contextvars
+import json
+import logging
+import os
+import resource
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import pandas as pd
+from config import etl_config as config
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+METRIC_HELP = {
+    'etl_stage_duration_seconds': ('gauge', "Duration of the last run of a stage."),
+    'etl_stage_failed': ('gauge', "1 if the last run of a stage failed, else 0."),
+    'etl_stage_runs_total': ('counter', "Stage runs."),
+    'etl_stage_failures_total': ('counter', "Failed stage runs."),
+    'etl_stage_rows_in_total': ('counter', "Rows read by a stage."),
+    'etl_stage_rows_out_total': ('counter', "Rows produced by a stage."),
+    'etl_stage_bytes_written_total': ('counter', "Bytes of files written by a stage."),
+    'etl_process_peak_rss_bytes': ('gauge', "Peak resident set size of the process."),
+    'etl_db_query_duration_seconds': ('histogram', "Latency of DB statements by database target."),
+}
+
+class Span:
+    """One timed unit of work and its counters."""
+
+    def __init__(self, name, parent=None, **labels):
+        self.name = name
+        self.labels = labels
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.rows_in = 0
+        self.rows_out = 0
+        self.bytes_written = 0
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.errors = []
+        self.status = "ok"
+        self.seconds = None
+        self._lock = threading.Lock()
+
+    def record_rows(self, rows_in=0, rows_out=0):
+        with self._lock:
+            self.rows_in += int(rows_in)
+            self.rows_out += int(rows_out)
+
+    def add_bytes(self, n_bytes):
+        with self._lock:
+            self.bytes_written += int(n_bytes)
+
+    def add_query(self, seconds):
+        with self._lock:
+            self.db_queries += 1
+            self.db_seconds += seconds
+
+    def record_error(self, message):
+        with self._lock:
+            self.errors.append(str(message))
+
+    def fail(self, message):
+        self.status = "failed"
+        self.record_error(message)
+
+    def to_dict(self):
+        return {'type': 'span', 'ts': pd.Timestamp.now().isoformat(), 'name': self.name, 'labels': self.labels,
+                'span_id': self.span_id, 'parent_id': self.parent_id, 'status': self.status,
+                'seconds': round(self.seconds, 4) if self.seconds is not None else None,
+                'rows_in': self.rows_in, 'rows_out': self.rows_out, 'bytes_written': self.bytes_written,
+                'db_queries': self.db_queries, 'db_seconds': round(self.db_seconds, 4),
+                'peak_rss_bytes': peak_rss_bytes(), 'errors': self.errors[:10]}
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and histograms keyed by (name, labels)."""
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._values = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        with self._lock:
+            key = self._key(name, labels)
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._values[self._key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        with self._lock:
+            key = self._key(name, labels)
+            counts, total, n_observed = self._histograms.get(key, ([0] * len(self.buckets), 0.0, 0))
+            counts = [count + (value <= bound) for count, bound in zip(counts, self.buckets)]
+            self._histograms[key] = (counts, total + value, n_observed + 1)
+
+    @staticmethod
+    def _format_labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    def render(self):
+        """Returns all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            values = dict(self._values)
+            histograms = dict(self._histograms)
+        lines = []
+        for name, (metric_type, help_text) in METRIC_HELP.items():
+            series = [(labels, value) for (n, labels), value in values.items() if n == name]
+            hist = [(labels, data) for (n, labels), data in histograms.items() if n == name]
+            if not series and not hist:
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+            for labels, value in sorted(series):
+                lines.append(f"{name}{self._format_labels(labels)} {value}")
+            for labels, (counts, total, n_observed) in sorted(hist):
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f"{name}_bucket{self._format_labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{self._format_labels(labels, [('le', '+Inf')])} {n_observed}")
+                lines.append(f"{name}_sum{self._format_labels(labels)} {round(total, 6)}")
+                lines.append(f"{name}_count{self._format_labels(labels)} {n_observed}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry(config.metrics_config['db_latency_buckets'])
+_write_lock = threading.Lock()
+_prometheus_lock = threading.Lock()
+
+def peak_rss_bytes():
+    """Peak resident set size of this process (ru_maxrss is in KiB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def current_span():
+    return _current_span.get()
+
+def emit(record):
+    """Appends one record to the JSON-lines metrics file."""
+    if not config.metrics_config['enabled']:
+        return
+    line = json.dumps(record, default=str)
+    with _write_lock:
+        with open(config.metrics_config['jsonl_file'], "a") as f:
+            f.write(line + "\n")
+
+class _SpanErrorHandler(logging.Handler):
+    """Counts logging.error records against the span active in the logging thread."""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+
+    def emit(self, record):
+        active = _current_span.get()
+        if active is not None:
+            active.record_error(record.getMessage())
+
+def _ensure_error_handler():
+    # Re-added when needed because logging.basicConfig(force=True) drops root handlers
+    root = logging.getLogger()
+    if not any(isinstance(handler, _SpanErrorHandler) for handler in root.handlers):
+        root.addHandler(_SpanErrorHandler())
+
+@contextmanager
+def span(name, **labels):
+    """
+    Times a block of work as a span nested in the current one.
+
+    An exception escaping the block marks the span failed and is re-raised.
+    Stage spans (those with a `stage` label) also update the Prometheus metrics.
+    """
+    _ensure_error_handler()
+    active = Span(name, parent=_current_span.get(), **labels)
+    token = _current_span.set(active)
+    start = time.perf_counter()
+    try:
+        yield active
+    except BaseException as e:
+        active.fail(e)
+        raise
+    finally:
+        active.seconds = time.perf_counter() - start
+        _current_span.reset(token)
+        if 'stage' in labels:
+            _record_stage_metrics(active)
+        emit(active.to_dict())
+
+def _record_stage_metrics(finished):
+    stage = finished.labels['stage']
+    failed = finished.status != "ok"
+    REGISTRY.set('etl_stage_duration_seconds', round(finished.seconds, 4), stage=stage)
+    REGISTRY.set('etl_stage_failed', int(failed), stage=stage)
+    REGISTRY.inc('etl_stage_runs_total', stage=stage)
+    REGISTRY.inc('etl_stage_failures_total', int(failed), stage=stage)
+    REGISTRY.inc('etl_stage_rows_in_total', finished.rows_in, stage=stage)
+    REGISTRY.inc('etl_stage_rows_out_total', finished.rows_out, stage=stage)
+    REGISTRY.inc('etl_stage_bytes_written_total', finished.bytes_written, stage=stage)
+    REGISTRY.set('etl_process_peak_rss_bytes', peak_rss_bytes())
+
+def record_rows(rows_in=0, rows_out=0):
+    """Adds to the row counters of the current span, if any."""
+    active = _current_span.get()
+    if active is not None:
+        active.record_rows(rows_in, rows_out)
+
+def add_bytes(n_bytes):
+    """Adds to the bytes-written counter of the current span, if any."""
+    active = _current_span.get()
+    if active is not None:
+        active.add_bytes(n_bytes)
+
+def record_file_written(path):
+    """Counts a written file's size against the current span."""
+    try:
+        add_bytes(os.path.getsize(path))
+    except OSError:
+        pass
+
+def count_rows(obj):
+    """Rows in a DataFrame, or in all DataFrames of a (nested) dictionary."""
+    if isinstance(obj, pd.DataFrame):
+        return len(obj)
+    if isinstance(obj, dict):
+        return sum(count_rows(value) for value in obj.values())
+    return 0
+
+def observe_query(target, seconds):
+    """Records one DB statement's latency in the histogram and on the current span."""
+    REGISTRY.observe('etl_db_query_duration_seconds', seconds, target=target)
+    active = _current_span.get()
+    if active is not None:
+        active.add_query(seconds)
+
+class InstrumentedCursor:
+    """Cursor proxy that times execute() and executemany() for the latency histogram."""
+
+    def __init__(self, cursor, target):
+        self._cursor = cursor
+        self._target = target
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            observe_query(self._target, time.perf_counter() - start)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            observe_query(self._target, time.perf_counter() - start)
+
+def write_prometheus(path=None):
+    """Writes the metrics in Prometheus text format (atomically, for textfile collectors)."""
+    if not config.metrics_config['enabled']:
+        return None
+    path = path or config.metrics_config['prometheus_file']
+    tmp_path = f"{path}.tmp"
+    with _prometheus_lock:  # Pipeline runs of concurrent jobs finish independently
+        with open(tmp_path, "w") as f:
+            f.write(REGISTRY.render())
+        os.replace(tmp_path, path)
+    return path
@@ -1,84 +1,75 @@
+import argparse
 import logging
-import schedule
-import time
-import datetime
-import subprocess  # To run other Python scripts
-from config import config  # Import configurations
+from config import etl_config as config  # Import configurations
+from pipeline import build_pipeline, PipelineContext
+from scheduler import Job, serve, simulate, read_state
 
 LOG_FILE = "main.log"
+#  force=True: the stage modules imported by pipeline configure their own log files
 logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+                    format='%(asctime)s - %(levelname)s - %(message)s', force=True)
 
-def run_extract_transform_load():
-    """Runs the extract, transform, and load processes."""
-    try:
-        logging.info("Starting ETL process.")
-
-        #  Run extract.py
-        subprocess.run(["python", "extract.py"], check=True)
-        logging.info("Extract completed.")
-
-        #  Run transform.py
-        subprocess.run(["python", "transform.py"], check=True)
-        logging.info("Transform completed.")
+#  One pipeline and one set of connection pools shared by every scheduled job
+PIPELINE = build_pipeline()
+CONTEXT = PipelineContext()
 
-        #  Run load.py
-        subprocess.run(["python", "load.py"], check=True)
-        logging.info("Load completed.")
+def run_pipeline(targets):
+    """
+    Runs pipeline targets in-process, resuming the previous run if it failed.
 
-        logging.info("ETL process completed successfully.")
-
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error running ETL process: {e}")
-    except Exception as e:
-        logging.error(f"An unexpected error occurred during ETL: {e}")
-
-def run_download_reports():
-    """Runs the download_reports.py script."""
+    Returns:
+        True if every stage succeeded. Per-stage timings, row counts and
+        statuses are in the metrics files written by instrumentation.py.
+    """
     try:
-        logging.info("Running download_reports.py")
-        subprocess.run(["python", "download_reports.py"], check=True)
-        logging.info("download_reports.py completed.")
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error running download_reports.py: {e}")
+        logging.info(f"Starting pipeline: {', '.join(targets)}")
+        report = PIPELINE.run(targets, resume=True, context=CONTEXT)
+        for name, info in report.items():
+            logging.info(f"  {name}: {info['status']} ({info['seconds']}s)")
+        if any(info['status'] == 'failed' for info in report.values()):
+            logging.error(f"Pipeline {', '.join(targets)} failed; the next run resumes from the failed stage.")
+            return False
+        logging.info(f"Pipeline {', '.join(targets)} completed successfully.")
+        return True
     except Exception as e:
-        logging.error(f"An unexpected error occurred: {e}")
+        logging.error(f"An unexpected error occurred running {targets}: {e}")
+        return False
 
-def run_generate_delivery():
-    """Runs the generate_delivery.py script."""
-    try:
-        logging.info("Running generate_delivery.py")
-        subprocess.run(["python", "generate_delivery.py"], check=True)
-        logging.info("generate_delivery.py completed.")
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error running generate_delivery.py: {e}")
-    except Exception as e:
-        logging.error(f"An unexpected error occurred: {e}")
+def run_extract_transform_load():
+    """Runs the extract, transform, and load stages."""
+    return run_pipeline(['load'])
 
-def run_send_investor_reports():
-    """Runs the send_investor_reports.py script."""
-    try:
-        logging.info("Running send_investor_reports.py")
-        subprocess.run(["python", "send_investor_reports.py"], check=True)
-        logging.info("send_investor_reports.py completed.")
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error running send_investor_reports.py: {e}")
-    except Exception as e:
-        logging.error(f"An unexpected error occurred: {e}")
+def run_restock_planning():
+    """Downloads restock data, generates the delivery plans and batches them into truck loads."""
+    return run_pipeline(['truck_batching'])
 
-if __name__ == "__main__":
-    #  Schedule the ETL process to run (e.g., daily)
-    schedule.every().day.at("02:00").do(run_extract_transform_load)  #  Example: Run at 2 AM
+def run_send_investor_reports():
+    """Builds and sends the investor reports."""
+    return run_pipeline(['investor_reports'])
 
-    #  Schedule the download reports process (e.g., every 6 hours)
-    schedule.every(6).hours.do(run_download_reports)
+#  The scheduled jobs; their cron expressions are in config.scheduler_config['jobs']
+JOB_FUNCTIONS = {
+    'etl': run_extract_transform_load,
+    'restock_planning': run_restock_planning,
+    'investor_reports': run_send_investor_reports,
+}
 
-    #  Schedule the generate delivery plan (e.g., after download reports)
-    schedule.every(6).hours.do(run_generate_delivery) # Run after download
+def build_jobs():
+    """Returns the scheduled jobs. They share PIPELINE's connection pools, so they run on threads."""
+    return [Job(name, func, config.scheduler_config['jobs'][name]) for name, func in JOB_FUNCTIONS.items()]
 
-    #  Schedule the investor reports to run at 10 PM
-    schedule.every().day.at("22:00").do(run_send_investor_reports)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the scheduled ETL, restock and report jobs.")
+    parser.add_argument("--run", choices=sorted(JOB_FUNCTIONS), help="Run one job now and exit.")
+    parser.add_argument("--simulate", type=float, metavar="HOURS",
+                        help="Dry-run the schedule for HOURS on a fake clock, from the saved state, and exit.")
+    args = parser.parse_args()
 
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  #  Check for scheduled tasks every minute
\ No newline at end of file
+    if args.run:
+        raise SystemExit(0 if JOB_FUNCTIONS[args.run]() else 1)
+    elif args.simulate:
+        history = simulate(build_jobs(), args.simulate, state=read_state(config.scheduler_config['state_file']))
+        for scheduled, name, status in history:
+            print(f"{scheduled:%Y-%m-%d %H:%M}  {name}  {status}")
+    else:
+        serve(build_jobs())
\ No newline at end of file
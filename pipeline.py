@@ -0,0 +1,347 @@
+import argparse
+import contextvars
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+import mysql.connector
+import pandas as pd
+from config import etl_config as config
+from db.connection_pool import get_connection, get_pool, log_pool_metrics
+from db.query_profiler import enable_profiling, write_slow_query_report
+from instrumentation import span, count_rows, record_rows, write_prometheus
+from db.partition_maintenance import maintain_partitions
+from etl.intermediate import write_frame, read_frame
+from etl.extract import extract_delta, commit_watermark
+from etl.transform import transform_transactions_data, load_transformed_to_staging
+from etl.load import load_from_staging_to_dw, clear_staging
+from warehouse_interaction.download_report import fetch_all_restocking_data, write_restocking_files
+from warehouse_interaction.generate_delivery import (generate_delivery_plan, save_delivery_plan, fetch_inventory,
+                                                     fetch_gudang_capacity)
+from warehouse_interaction.demand_forecast import refresh_forecasts
+from warehouse_interaction.truck_batching import batch_deliveries, save_truck_manifests
+from reports.send_report import get_investor_emails, ReportDispatcher
+
+class PipelineError(Exception):
+    """Raised by a stage to mark it as failed."""
+
+class Stage:
+    """A named unit of work with the names of the stages it depends on."""
+
+    def __init__(self, name, func, deps=()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+class PipelineContext:
+    """Shared resources for a run: pooled connections to each database target."""
+
+    def pool(self, target):
+        return get_pool(target)
+
+    @contextmanager
+    def connection(self, target):
+        """Borrows a pooled connection for the duration of a with-block."""
+        connection = get_connection(target)
+        try:
+            yield connection
+        finally:
+            connection.close()  # Returns the connection to the pool
+
+class Pipeline:
+    """
+    Runs stages as a DAG inside one process.
+
+    Stage results are passed to dependent stages in memory. Stages whose
+    dependencies are satisfied run concurrently on a thread pool. After each
+    stage its result is checkpointed and the run state is saved, so a failed
+    run can be resumed from the failed stage.
+
+    Each stage runs in an instrumentation span. A stage that raises, or that
+    logs an error while running (functions that swallow exceptions into
+    logging.error), is marked failed.
+    """
+
+    def __init__(self, stages, max_workers=None, state_file=None, checkpoint_dir=None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max_workers or config.pipeline_config['max_workers']
+        self.state_file = state_file or config.pipeline_config['state_file']
+        self.checkpoint_dir = checkpoint_dir or config.pipeline_config['checkpoint_dir']
+        self._state_lock = threading.Lock()  # Runs of different targets may share the state file
+
+    def required_stages(self, targets):
+        """Returns the targets plus everything they depend on."""
+        required = set()
+        todo = list(targets)
+        while todo:
+            name = todo.pop()
+            if name not in self.stages:
+                raise ValueError(f"Unknown pipeline stage: {name}")
+            if name not in required:
+                required.add(name)
+                todo.extend(self.stages[name].deps)
+        return required
+
+    # --- Run state and checkpoints ---
+
+    def _load_state(self):
+        if not os.path.exists(self.state_file):
+            return {}
+        with open(self.state_file) as f:
+            return json.load(f)
+
+    def _save_state(self, state):
+        tmp_path = f"{self.state_file}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2, default=str)
+        os.replace(tmp_path, self.state_file)
+
+    def _update_state(self, run_key, run_state):
+        """Stores (or with None, clears) one run's state; the entries of other runs are kept."""
+        with self._state_lock:
+            state = self._load_state()
+            if run_state is None:
+                state.pop(run_key, None)
+            else:
+                state[run_key] = run_state
+            self._save_state(state)
+
+    def _save_checkpoint(self, run_key, name, result):
+        if isinstance(result, pd.DataFrame):
+            base_path = os.path.join(self.checkpoint_dir, run_key, name)
+            os.makedirs(os.path.dirname(base_path), exist_ok=True)
+            return {'type': 'frame', 'path': write_frame(result, base_path)}
+        if isinstance(result, dict):
+            return {'type': 'dict', 'items': {str(key): self._save_checkpoint(run_key, f"{name}_{key}", value)
+                                              for key, value in result.items()}}
+        return {'type': 'value', 'value': result}
+
+    def _load_checkpoint(self, checkpoint):
+        if checkpoint['type'] == 'frame':
+            return read_frame(checkpoint['path'])
+        if checkpoint['type'] == 'dict':
+            return {key: self._load_checkpoint(value) for key, value in checkpoint['items'].items()}
+        return checkpoint['value']
+
+    # --- Execution ---
+
+    def _run_stage(self, stage, context, results):
+        inputs = {dep: results[dep] for dep in stage.deps}
+        start = time.perf_counter()
+        with span("stage", stage=stage.name) as stage_span:
+            stage_span.record_rows(rows_in=count_rows(inputs))
+            result = stage.func(context, inputs)
+            if not stage_span.rows_out:
+                stage_span.record_rows(rows_out=count_rows(result))
+            if stage_span.errors:
+                raise PipelineError(f"{len(stage_span.errors)} error(s) logged, first: {stage_span.errors[0]}")
+        return result, time.perf_counter() - start
+
+    def run(self, targets, resume=False, context=None):
+        """
+        Runs the target stages and their dependencies.
+
+        Args:
+            targets: Names of the stages to run.
+            resume:  If the previous run of the same targets failed, skip the
+                     stages it completed (reloading their checkpoints).
+            context: Optional PipelineContext to share pools across runs.
+
+        Returns:
+            A dictionary of stage name -> {'status': 'ok'|'failed'|'skipped'|'resumed', 'seconds': float}.
+        """
+        required = self.required_stages(targets)
+        run_key = "+".join(sorted(targets))
+        context = context or PipelineContext()
+        with self._state_lock:
+            run_state = self._load_state().get(run_key) if resume else None
+
+        results = {}
+        report = {}
+        if run_state and run_state.get('failed'):
+            for name, info in run_state['completed'].items():
+                results[name] = self._load_checkpoint(info['checkpoint'])
+                report[name] = {'status': 'resumed', 'seconds': 0.0}
+            logging.info(f"Resuming pipeline {run_key} after failed stage {run_state['failed']}")
+        else:
+            run_state = {'completed': {}, 'failed': None}
+            shutil.rmtree(os.path.join(self.checkpoint_dir, run_key), ignore_errors=True)
+
+        pending = required - set(results)
+        failed = None
+        with span("pipeline", run=run_key) as run_span, ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            while pending or running:
+                if failed is None:
+                    ready = [name for name in pending if all(dep in results for dep in self.stages[name].deps)]
+                    for name in ready:
+                        pending.discard(name)
+                        logging.info(f"Stage {name} started")
+                        # A copy of this context per stage, so stage spans nest under the run span
+                        running[executor.submit(contextvars.copy_context().run, self._run_stage,
+                                                self.stages[name], context, results)] = name
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        result, seconds = future.result()
+                    except Exception as e:
+                        logging.error(f"Stage {name} failed: {e}")
+                        report[name] = {'status': 'failed', 'seconds': None}
+                        failed = failed or name
+                        continue
+                    results[name] = result
+                    report[name] = {'status': 'ok', 'seconds': round(seconds, 3)}
+                    logging.info(f"Stage {name} finished in {seconds:.2f}s")
+                    run_state['completed'][name] = {'seconds': seconds,
+                                                    'checkpoint': self._save_checkpoint(run_key, name, result)}
+
+            if failed:
+                run_span.fail(f"stage {failed} failed")
+
+        for name in pending:
+            report[name] = {'status': 'skipped', 'seconds': None}
+
+        run_state['failed'] = failed
+        self._update_state(run_key, run_state if failed else None)
+        if not failed:
+            shutil.rmtree(os.path.join(self.checkpoint_dir, run_key), ignore_errors=True)
+
+        logging.info(f"Pipeline {run_key} {'failed at ' + failed if failed else 'completed'}: {report}")
+        log_pool_metrics()
+        write_prometheus()
+        write_slow_query_report()
+        return report
+
+# --- Stages ---
+
+def stage_extract(context, inputs):
+    with context.connection('oltp') as connection:
+        df_transaksi, df_isi_transaksi, new_watermark = extract_delta(connection)
+    return {'transaksi': df_transaksi, 'isi_transaksi': df_isi_transaksi, 'watermark': new_watermark}
+
+def stage_transform(context, inputs):
+    batch = inputs['extract']
+    if batch['transaksi'].empty:
+        return pd.DataFrame()
+    transformed_df = transform_transactions_data(batch['transaksi'], batch['isi_transaksi'])
+    if transformed_df.empty:
+        raise PipelineError("Transformation produced no rows")
+    return transformed_df
+
+def stage_partitions(context, inputs):
+    with context.connection('dw') as connection:
+        return maintain_partitions(connection)
+
+def stage_load(context, inputs):
+    transformed_df = inputs['transform']
+    if transformed_df.empty:
+        return 0
+    with context.connection('staging') as staging_conn, context.connection('dw') as dw_conn:
+        if not load_transformed_to_staging(staging_conn, transformed_df, inputs['extract']['isi_transaksi']) \
+                or not load_from_staging_to_dw(dw_conn, staging_conn):
+            # DW loads are upserts, so clearing staging lets a resumed run re-stage the batch safely
+            clear_staging(staging_conn)
+            raise PipelineError("Loading to staging or the data warehouse failed")
+        clear_staging(staging_conn)
+    commit_watermark(inputs['extract']['watermark'])
+    record_rows(rows_out=len(transformed_df))
+    return len(transformed_df)
+
+def stage_download_restock(context, inputs):
+    with context.connection('dw') as connection:
+        df_restock = fetch_all_restocking_data(connection)
+    if df_restock is None:
+        raise PipelineError("Could not fetch restocking data")
+    os.makedirs(config.pipeline_config['restock_path'], exist_ok=True)
+    write_restocking_files(df_restock, config.pipeline_config['restock_path'])
+    return df_restock
+
+def stage_forecast(context, inputs):
+    # Optional input of delivery: without forecasts the planner falls back to total_sold
+    try:
+        with context.connection('dw') as connection:
+            return refresh_forecasts(connection)
+    except mysql.connector.Error as err:
+        logging.warning(f"Forecasts unavailable, planning deliveries from total_sold: {err}")
+        return pd.DataFrame()
+
+def stage_delivery(context, inputs):
+    df_restock = inputs['download_restock']
+    os.makedirs(config.pipeline_config['delivery_path'], exist_ok=True)
+    plans = {}
+    if df_restock.empty:
+        return plans
+    with context.connection('oltp') as connection:
+        inventory = fetch_inventory(connection)
+        capacities = fetch_gudang_capacity(connection)
+    stock_by_gudang = dict(tuple(inventory.groupby('gudang_id')))
+    for gudang_id, df_gudang in df_restock.groupby('gudang_id'):
+        delivery_plan = generate_delivery_plan(df_gudang.drop(columns=['gudang_id']), gudang_id,
+                                               stock_by_gudang.get(gudang_id, inventory.iloc[0:0]),
+                                               capacities.get(int(gudang_id)), forecasts=inputs['forecast'])
+        if not delivery_plan.empty:
+            save_delivery_plan(delivery_plan, gudang_id, config.pipeline_config['delivery_path'])
+            plans[str(gudang_id)] = delivery_plan
+    return plans
+
+def stage_truck_batching(context, inputs):
+    saved = {}
+    for gudang_id, delivery_plan in inputs['delivery'].items():
+        manifest = batch_deliveries(delivery_plan, gudang_id)
+        if not manifest.empty:
+            saved[gudang_id] = save_truck_manifests(manifest, gudang_id, config.pipeline_config['delivery_path'])
+    return saved
+
+def stage_investor_reports(context, inputs):
+    with context.connection('dw') as connection:
+        investor_emails = get_investor_emails(connection)
+    if not investor_emails:
+        raise PipelineError("Could not retrieve investor emails")
+    results = ReportDispatcher(db_pool=context.pool('dw')).dispatch(investor_emails)
+    sent = sum(bool(ok) for ok in results.values())
+    record_rows(rows_in=len(investor_emails), rows_out=sent)
+    if results and not sent:
+        raise PipelineError("No investor report could be sent")
+    return {str(minimart_id): sent for minimart_id, sent in results.items()}
+
+def build_pipeline():
+    """Returns the pipeline of all ETL, restock and reporting stages."""
+    return Pipeline([
+        Stage('extract', stage_extract),
+        Stage('transform', stage_transform, deps=['extract']),
+        Stage('partitions', stage_partitions),
+        Stage('load', stage_load, deps=['extract', 'transform', 'partitions']),
+        Stage('download_restock', stage_download_restock),
+        Stage('forecast', stage_forecast),
+        Stage('delivery', stage_delivery, deps=['download_restock', 'forecast']),
+        Stage('truck_batching', stage_truck_batching, deps=['delivery']),
+        Stage('investor_reports', stage_investor_reports),
+    ])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run pipeline stages in-process.")
+    parser.add_argument("targets", nargs="+", help="Stages to run (dependencies are included).")
+    parser.add_argument("--resume", action="store_true", help="Resume the last failed run of these targets.")
+    parser.add_argument("--profile-queries", action="store_true",
+                        help="Profile every SQL statement and write a ranked slow-query report.")
+    args = parser.parse_args()
+
+    if args.profile_queries:
+        enable_profiling()
+
+    #  force=True: the stage modules configure their own log files on import
+    logging.basicConfig(filename="main.log", level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+    report = build_pipeline().run(args.targets, resume=args.resume)
+    for name, info in report.items():
+        print(f"{name}: {info['status']} ({info['seconds']}s)")
+    if any(info['status'] == 'failed' for info in report.values()):
+        raise SystemExit(1)
\ No newline at end of file
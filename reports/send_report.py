@@ -1,7 +1,13 @@
 import mysql.connector
 import logging
-from config import config  # Import database configuration
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import etl_config as config  # Import database configuration
+from db.connection_pool import get_connection, get_pool
+from db.query_cache import cached_read_sql
 import pandas as pd
+from etl.aggregates import aggregates_available
 import smtplib  # For sending emails
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -13,8 +19,7 @@ logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
 def create_dw_connection():
     """Establishes a connection to the data warehouse."""
     try:
-        dw_config = config.dw_config
-        connection = mysql.connector.connect(**dw_config)
+        connection = get_connection('dw')  # Pooled; close() returns it to the pool
         logging.info("Connected to data warehouse.")
         return connection
     except mysql.connector.Error as err:
@@ -35,7 +40,7 @@ def get_investor_emails(connection):
     """
     try:
         query = "SELECT minimart_id, pemilik_email FROM dim_minimart JOIN pemilik ON dim_minimart.pemilik_id = pemilik.pemilik_id"
-        df = pd.read_sql(query, connection)
+        df = pd.read_sql(query, connection)  # Not cached: owner emails do not change with DW loads
         email_dict = dict(zip(df['minimart_id'], df['pemilik_email']))
         logging.info("Retrieved investor emails.")
         return email_dict
@@ -46,6 +51,178 @@ def get_investor_emails(connection):
         logging.error(f"An unexpected error occurred: {e}")
         return {}
 
+# Same sections served from the daily aggregate tables (db/create_dw.sql)
+# when they exist; their cost no longer depends on the size of fact_sales.
+DAILY_SUMMARY_AGGREGATE_QUERIES = {
+    'items': """
+        SELECT
+            a.minimart_id,
+            b.barang_nama,
+            SUM(a.total_quantity_sold) as total_quantity_sold,
+            SUM(a.total_revenue) as total_revenue
+        FROM
+            agg_daily_store_item a
+        JOIN
+            dim_barang b ON a.barang_id = b.barang_id
+        WHERE
+            a.tanggal >= %s AND a.tanggal < %s {minimart_filter}
+        GROUP BY
+            a.minimart_id, b.barang_nama
+    """,
+    'cashiers': """
+        SELECT
+            a.minimart_id,
+            d.cashier_nama,
+            SUM(a.total_transactions) as total_transactions,
+            SUM(a.total_revenue) as total_revenue
+        FROM
+            agg_daily_store_cashier a
+        JOIN
+            dim_cashier d ON a.cashier_id = d.cashier_id
+        WHERE
+            a.tanggal >= %s AND a.tanggal < %s {minimart_filter}
+        GROUP BY
+            a.minimart_id, d.cashier_nama
+    """,
+    'hours': """
+        SELECT
+            a.minimart_id,
+            a.jam,
+            a.hourly_revenue,
+            a.total_profit
+        FROM
+            agg_daily_store_hour a
+        WHERE
+            a.tanggal >= %s AND a.tanggal < %s {minimart_filter}
+    """,
+}
+
+# Each summary section is a separate grouping over the same sargable
+# sales_datetime range, computed for all minimarts in one statement.
+DAILY_SUMMARY_QUERIES = {
+    'items': """
+        SELECT
+            f.minimart_id,
+            b.barang_nama,
+            SUM(f.quantity_sold) as total_quantity_sold,
+            SUM(f.total_amount) as total_revenue
+        FROM
+            fact_sales f
+        JOIN
+            dim_barang b ON f.barang_id = b.barang_id
+        WHERE
+            f.sales_datetime >= %s AND f.sales_datetime < %s {minimart_filter}
+        GROUP BY
+            f.minimart_id, b.barang_nama
+    """,
+    'cashiers': """
+        SELECT
+            f.minimart_id,
+            d.cashier_nama,
+            COUNT(DISTINCT f.transaction_id) as total_transactions,
+            SUM(f.total_amount) as total_revenue
+        FROM
+            fact_sales f
+        JOIN
+            dim_cashier d ON f.cashier_id = d.cashier_id
+        WHERE
+            f.sales_datetime >= %s AND f.sales_datetime < %s {minimart_filter}
+        GROUP BY
+            f.minimart_id, d.cashier_nama
+    """,
+    'hours': """
+        SELECT
+            f.minimart_id,
+            w.jam,
+            SUM(f.total_amount) as hourly_revenue,
+            SUM(f.profit) as total_profit
+        FROM
+            fact_sales f
+        JOIN
+            dim_waktu w ON f.waktu_id = w.waktu_id
+        WHERE
+            f.sales_datetime >= %s AND f.sales_datetime < %s {minimart_filter}
+        GROUP BY
+            f.minimart_id, w.jam
+    """,
+}
+
+def fetch_daily_aggregates(connection, report_date=None, minimart_id=None):
+    """
+    Fetches the daily summary aggregates for all minimarts (or just one).
+
+    The date filter is a half-open range on f.sales_datetime, instead of
+    DATE(f.sales_datetime) = CURDATE(), so MySQL prunes fact_sales to the
+    day's partition and can use the (minimart_id, sales_datetime) index. When the
+    daily aggregate tables exist they are read instead of fact_sales.
+
+    Returns:
+        A dictionary of section name -> DataFrame keyed by minimart_id.
+    """
+    day_start = pd.Timestamp(report_date or pd.Timestamp.today()).normalize()
+    params = [day_start.to_pydatetime(), (day_start + pd.Timedelta(days=1)).to_pydatetime()]
+    if aggregates_available(connection):
+        queries, alias = DAILY_SUMMARY_AGGREGATE_QUERIES, "a"
+    else:
+        queries, alias = DAILY_SUMMARY_QUERIES, "f"
+    minimart_filter = ""
+    if minimart_id is not None:
+        minimart_filter = f"AND {alias}.minimart_id = %s"
+        params.append(minimart_id)
+
+    return {section: cached_read_sql(query.format(minimart_filter=minimart_filter), connection, params=tuple(params))
+            for section, query in queries.items()}
+
+def format_daily_summary(minimart_id, items, cashiers, hours, report_date):
+    """Formats one minimart's slice of the daily aggregates as a report string."""
+    report = f"Daily Summary for Minimart {minimart_id} ({report_date.strftime('%Y-%m-%d')}):\n\n"
+    report += "Top 10 Selling Items:\n"
+    report += items.nlargest(10, 'total_revenue')[['barang_nama', 'total_quantity_sold', 'total_revenue']].to_string(index=False) + "\n\n"
+
+    report += "\nCashier Performance:\n"
+    report += cashiers.set_index('cashier_nama')[['total_transactions', 'total_revenue']].sort_index().to_string() + "\n\n"
+
+    report += "\nHourly Revenue:\n"
+    report += hours.set_index('jam')['hourly_revenue'].sort_index().to_string() + "\n\n"
+
+    report += f"\nTotal Profit: {hours['total_profit'].sum()}\n"
+    return report
+
+def generate_all_daily_summaries(connection, minimart_ids, report_date=None):
+    """
+    Generates the daily summary for every minimart from a single pass over fact_sales.
+
+    Args:
+        connection:   MySQL connection to the data warehouse.
+        minimart_ids: The minimarts to report on.
+        report_date:  The day to summarise (defaults to today).
+
+    Returns:
+        A dictionary of minimart_id -> report string.
+    """
+    report_date = pd.Timestamp(report_date or pd.Timestamp.today()).normalize()
+    try:
+        aggregates = fetch_daily_aggregates(connection, report_date)
+    except (mysql.connector.Error, pd.errors.DatabaseError) as err:
+        logging.error(f"Error generating daily summaries: {err}")
+        return {minimart_id: f"Error generating report: {err}" for minimart_id in minimart_ids}
+
+    # Split each section by minimart once instead of filtering per store
+    by_store = {section: dict(tuple(df.groupby('minimart_id'))) for section, df in aggregates.items()}
+    empty = {section: df.iloc[0:0] for section, df in aggregates.items()}
+
+    reports = {}
+    for minimart_id in minimart_ids:
+        sections = {section: groups.get(minimart_id, empty[section]) for section, groups in by_store.items()}
+        if sections['hours'].empty:
+            reports[minimart_id] = f"No sales data available for Minimart {minimart_id} today."
+        else:
+            reports[minimart_id] = format_daily_summary(minimart_id, sections['items'], sections['cashiers'],
+                                                        sections['hours'], report_date)
+    logging.info(f"Generated daily summaries for {len(minimart_ids)} minimarts "
+                 f"({len(by_store['hours'])} with sales)")
+    return reports
+
 def generate_daily_summary(connection, minimart_id):
     """
     Generates a daily summary report for a specific minimart.
@@ -59,47 +236,12 @@ def generate_daily_summary(connection, minimart_id):
     """
 
     try:
-        query = """
-            SELECT
-                b.barang_nama,
-                SUM(f.quantity_sold) as total_quantity_sold,
-                SUM(f.total_amount) as total_revenue,
-                d.cashier_nama,
-                COUNT(DISTINCT f.transaction_id) as total_transactions,
-                SUM(f.profit) as total_profit,
-                w.jam,
-                SUM(f.total_amount) as hourly_revenue
-            FROM
-                fact_sales f
-            JOIN
-                dim_barang b ON f.barang_id = b.barang_id
-            JOIN
-                dim_cashier d ON f.cashier_id = d.cashier_id
-            JOIN
-                dim_waktu w ON f.waktu_id = w.waktu_id
-            WHERE
-                f.minimart_id = %s AND DATE(f.sales_datetime) = CURDATE()  -- Today's data
-            GROUP BY
-                b.barang_nama, d.cashier_nama, w.jam
-            ORDER BY
-                total_revenue DESC
-        """
-
-        df = pd.read_sql(query, connection, params=(minimart_id,))
-
-        if not df.empty:
-            report = f"Daily Summary for Minimart {minimart_id} ({pd.to_datetime('today').strftime('%Y-%m-%d')}):\n\n"
-            report += "Top 10 Selling Items:\n"
-            report += df.head(10)[['barang_nama', 'total_quantity_sold', 'total_revenue']].to_string(index=False) + "\n\n"
-
-            report += "\nCashier Performance:\n"
-            report += df.groupby('cashier_nama').agg({'total_transactions': 'sum', 'total_revenue': 'sum'}).to_string() + "\n\n"
-
-            report += "\nHourly Revenue:\n"
-            report += df.groupby('jam')['hourly_revenue'].sum().to_string() + "\n\n"
-
-            report += f"\nTotal Profit: {df['total_profit'].sum()}\n"
+        report_date = pd.Timestamp.today().normalize()
+        aggregates = fetch_daily_aggregates(connection, report_date, minimart_id=minimart_id)
 
+        if not aggregates['hours'].empty:
+            report = format_daily_summary(minimart_id, aggregates['items'], aggregates['cashiers'],
+                                          aggregates['hours'], report_date)
             logging.info(f"Generated daily summary for Minimart {minimart_id}")
             return report
         else:
@@ -113,9 +255,42 @@ def generate_daily_summary(connection, minimart_id):
         logging.error(f"An unexpected error occurred: {e}")
         return f"Error generating report: {e}"
 
+def build_message(sender_email, to_email, subject, body):
+    """Builds the MIME message for a report."""
+    msg = MIMEMultipart()
+    msg['From'] = sender_email
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+def open_smtp_session():
+    """
+    Opens and authenticates an SMTP session using config.smtp_config.
+
+    Login is skipped when no username is configured (e.g. a local debugging server).
+    """
+    smtp_config = config.smtp_config
+    if smtp_config.get('use_ssl'):
+        server = smtplib.SMTP_SSL(smtp_config['host'], smtp_config['port'], timeout=smtp_config.get('timeout', 30))
+    else:
+        server = smtplib.SMTP(smtp_config['host'], smtp_config['port'], timeout=smtp_config.get('timeout', 30))
+        if smtp_config.get('starttls'):
+            server.starttls()
+    if smtp_config.get('username'):
+        server.login(smtp_config['username'], smtp_config['password'])
+    return server
+
+def close_smtp_session(server):
+    """Closes an SMTP session, ignoring errors from an already dropped connection."""
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
 def send_email(to_email, subject, body):
     """
-    Sends an email.  (Replace with your actual email sending setup)
+    Sends an email.
 
     Args:
         to_email:  The recipient's email address.
@@ -124,19 +299,14 @@ def send_email(to_email, subject, body):
     """
 
     try:
-        #  Replace with your email server details
-        sender_email = "your_company_email@example.com"
-        sender_password = "your_email_password"
-
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain'))
-
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(sender_email, sender_password)
+        sender_email = config.smtp_config['sender']
+        msg = build_message(sender_email, to_email, subject, body)
+
+        server = open_smtp_session()
+        try:
             server.sendmail(sender_email, to_email, msg.as_string())
+        finally:
+            close_smtp_session(server)
 
         logging.info(f"Sent email to {to_email}")
         print(f"Sent email to {to_email}")  #  Inform the console
@@ -145,19 +315,124 @@ def send_email(to_email, subject, body):
     except Exception as e:
         logging.error(f"An unexpected error occurred sending email to {to_email}: {e}")
 
+class ReportDispatcher:
+    """
+    Builds and sends investor reports concurrently.
+
+    Reports are generated by a bounded thread pool. Each worker borrows a DW
+    connection from a shared pool and keeps one authenticated SMTP session
+    for all the messages it sends, reconnecting only after a failure.
+    """
+
+    def __init__(self, workers=None, db_pool=None):
+        self.workers = workers or config.report_dispatch_config['workers']
+        self.max_retries = config.report_dispatch_config['max_retries']
+        self.backoff_seconds = config.report_dispatch_config['backoff_seconds']
+        self.db_pool = db_pool or get_pool('dw')
+        self._local = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+
+    def _smtp_session(self):
+        server = getattr(self._local, 'smtp', None)
+        if server is None:
+            server = open_smtp_session()
+            self._local.smtp = server
+            with self._sessions_lock:
+                self._sessions.append(server)
+        return server
+
+    def _drop_smtp_session(self):
+        server = getattr(self._local, 'smtp', None)
+        if server is not None:
+            self._local.smtp = None
+            with self._sessions_lock:
+                self._sessions.remove(server)
+            close_smtp_session(server)
+
+    def send_with_retry(self, to_email, subject, body):
+        """Sends one message on this worker's session, retrying with exponential backoff."""
+        sender_email = config.smtp_config['sender']
+        message = build_message(sender_email, to_email, subject, body).as_string()
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self._smtp_session().sendmail(sender_email, to_email, message)
+                logging.info(f"Sent email to {to_email}")
+                return True
+            except smtplib.SMTPRecipientsRefused as err:
+                logging.error(f"Recipient refused for {to_email}: {err}")
+                return False
+            except (smtplib.SMTPException, OSError) as err:
+                logging.warning(f"Attempt {attempt}/{self.max_retries} sending to {to_email} failed: {err}")
+                self._drop_smtp_session()
+                if attempt < self.max_retries:
+                    time.sleep(self.backoff_seconds * 2 ** (attempt - 1))
+        logging.error(f"Giving up sending email to {to_email}")
+        return False
+
+    def build_and_send(self, minimart_id, investor_email, report=None):
+        """Emails one minimart's report, generating it on a pooled connection if not given."""
+        if report is None:
+            connection = self.db_pool.get_connection()
+            try:
+                report = generate_daily_summary(connection, minimart_id)
+            finally:
+                connection.close()  # Returns the connection to the pool
+        subject = f"Daily Summary Report for Minimart {minimart_id}"
+        return self.send_with_retry(investor_email, subject, report)
+
+    def dispatch(self, investor_emails):
+        """
+        Sends the daily report for every minimart.
+
+        All reports are computed up front by generate_all_daily_summaries in a
+        single pass over fact_sales; the workers then only send.
+
+        Args:
+            investor_emails: Dictionary of minimart_id -> investor email.
+
+        Returns:
+            A dictionary of minimart_id -> True if the report was sent.
+        """
+        connection = self.db_pool.get_connection()
+        try:
+            reports = generate_all_daily_summaries(connection, list(investor_emails))
+        finally:
+            connection.close()
+
+        results = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = {executor.submit(self.build_and_send, minimart_id, email, reports.get(minimart_id)): minimart_id
+                           for minimart_id, email in investor_emails.items()}
+                for future in as_completed(futures):
+                    minimart_id = futures[future]
+                    try:
+                        results[minimart_id] = future.result()
+                    except Exception as e:
+                        logging.error(f"Report for Minimart {minimart_id} failed: {e}")
+                        results[minimart_id] = False
+        finally:
+            with self._sessions_lock:
+                sessions, self._sessions = self._sessions, []
+            for server in sessions:
+                close_smtp_session(server)
+        return results
+
 if __name__ == '__main__':
     dw_conn = create_dw_connection()
     if dw_conn:
         investor_emails = get_investor_emails(dw_conn)
+        dw_conn.close()
         if investor_emails:
-            for minimart_id, investor_email in investor_emails.items():
-                report = generate_daily_summary(dw_conn, minimart_id)
-                subject = f"Daily Summary Report for Minimart {minimart_id}"
-                send_email(investor_email, subject, report)
+            start = time.perf_counter()
+            results = ReportDispatcher().dispatch(investor_emails)
+            sent = sum(results.values())
+            logging.info(f"Sent {sent}/{len(results)} investor reports in {time.perf_counter() - start:.1f}s")
+            print(f"Sent {sent}/{len(results)} investor reports.")
         else:
             logging.warning("Could not retrieve investor emails. Reports not sent.")
             print("Could not retrieve investor emails. Reports not sent.")
-        dw_conn.close()
     else:
         logging.error("Failed to connect to the data warehouse.")
         print("Failed to connect to the data warehouse.")
\ No newline at end of file
@@ -0,0 +1,380 @@
+"""
+Asyncio job scheduler for the ETL, restock and reporting jobs.
+
+Jobs fire on cron expressions ("0 */6 * * *"). The blocking work of a job
+runs on a thread or process executor, so a slow ETL never holds up the other
+jobs. A job never overlaps itself: if its previous run is still going when
+it fires again, that run is skipped (max_instances raises the limit).
+
+The last scheduled time each job was handled is persisted, so runs missed
+while the scheduler was down are caught up once on start (coalesced, and
+only if they are newer than max_catch_up_hours). Time comes from a clock
+object; FakeClock lets the schedule be driven without waiting.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import os
+import signal
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime, timedelta
+from config import etl_config as config
+
+CRON_ALIASES = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+}
+
+class CronTrigger:
+    """
+    A five-field cron expression: minute hour day-of-month month day-of-week.
+
+    Fields accept *, numbers, ranges (1-5), lists (1,15) and steps (*/6,
+    8-18/2). Day-of-week is 0-6 from Sunday (7 is also Sunday). As in cron,
+    when both day fields are restricted a day matching either one fires.
+    """
+
+    FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 7))
+
+    def __init__(self, expression):
+        self.expression = expression
+        parts = CRON_ALIASES.get(expression, expression).split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        values = [self._parse_field(part, low, high) for part, (_, low, high) in zip(parts, self.FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = (sorted(v) for v in values)
+        self.weekdays = {day % 7 for day in weekdays}
+        self.day_restricted = parts[2] != '*'
+        self.weekday_restricted = parts[4] != '*'
+
+    @staticmethod
+    def _parse_field(field, low, high):
+        values = set()
+        for part in field.split(','):
+            span, _, step = part.partition('/')
+            step = int(step) if step else 1
+            if span == '*':
+                start, end = low, high
+            elif '-' in span:
+                start, end = (int(v) for v in span.split('-', 1))
+            else:
+                start = int(span)
+                end = high if step > 1 else start
+            if not low <= start <= end <= high or step < 1:
+                raise ValueError(f"Invalid cron field {field!r} (allowed {low}-{high})")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, day):
+        in_month = day.day in self.days
+        in_week = (day.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return in_month or in_week
+        return in_month and in_week
+
+    def next_after(self, moment):
+        """Returns the first fire time strictly after moment."""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        for _ in range(366 * 5):
+            if candidate.month in self.months and self._day_matches(candidate):
+                for hour in self.hours:
+                    if hour < candidate.hour:
+                        continue
+                    for minute in self.minutes:
+                        if hour == candidate.hour and minute < candidate.minute:
+                            continue
+                        return candidate.replace(hour=hour, minute=minute)
+            candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+        raise ValueError(f"Cron expression never fires: {self.expression!r}")
+
+    def latest_until(self, start, moment):
+        """Returns the last fire time in (start, moment], or None."""
+        latest = None
+        fire = self.next_after(start)
+        while fire <= moment:
+            latest = fire
+            fire = self.next_after(fire)
+        return latest
+
+class SystemClock:
+    """Wall-clock time (naive local, like cron)."""
+
+    def now(self):
+        return datetime.now()
+
+    async def sleep_until(self, deadline):
+        # Short naps re-read the clock, so suspend/resume and clock changes are noticed
+        while (remaining := (deadline - self.now()).total_seconds()) > 0:
+            await asyncio.sleep(min(remaining, 60))
+
+class FakeClock:
+    """
+    A clock that only moves when advanced, for driving the scheduler in
+    tests and dry runs: `await clock.advance(timedelta(hours=6))` wakes every
+    sleeper whose deadline is passed, in deadline order.
+    """
+
+    def __init__(self, start):
+        self._now = start
+        self._sleepers = []
+        self._sequence = 0
+
+    def now(self):
+        return self._now
+
+    async def sleep_until(self, deadline):
+        if deadline <= self._now:
+            await asyncio.sleep(0)
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._sequence += 1
+        heapq.heappush(self._sleepers, (deadline, self._sequence, waiter))
+        await waiter
+
+    def next_deadline(self):
+        while self._sleepers and self._sleepers[0][2].done():
+            heapq.heappop(self._sleepers)  # Cancelled sleepers
+        return self._sleepers[0][0] if self._sleepers else None
+
+    async def advance(self, delta):
+        target = self._now + delta
+        while (deadline := self.next_deadline()) is not None and deadline <= target:
+            _, _, waiter = heapq.heappop(self._sleepers)
+            self._now = max(self._now, deadline)
+            waiter.set_result(None)
+            await _settle()
+        self._now = target
+        await _settle()
+
+async def _settle(rounds=5):
+    """Yields to the event loop a few times so woken tasks run up to their next await."""
+    for _ in range(rounds):
+        await asyncio.sleep(0)
+
+def read_state(path):
+    """Reads the persisted scheduler state: job name -> last fire, status and run times."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as err:
+        logging.error(f"Error reading scheduler state {path}: {err}")
+        return {}
+
+class Job:
+    """
+    A scheduled callable.
+
+    Args:
+        name:          Key of the job in the persisted state.
+        func:          Blocking callable; returning False marks the run failed.
+        trigger:       A CronTrigger or a cron expression.
+        executor:      'thread' or 'process' (func and args must be picklable).
+        max_instances: Runs of this job allowed at once; further fires are skipped.
+        catch_up:      Run once on start if fires were missed while down.
+    """
+
+    def __init__(self, name, func, trigger, executor='thread', max_instances=1, catch_up=True, args=()):
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor: {executor}")
+        self.name = name
+        self.func = func
+        self.trigger = trigger if isinstance(trigger, CronTrigger) else CronTrigger(trigger)
+        self.executor = executor
+        self.max_instances = max_instances
+        self.catch_up = catch_up
+        self.args = tuple(args)
+        self.running = 0
+        self.next_fire = None
+
+class Scheduler:
+    """
+    Runs jobs on their triggers until stop() is called.
+
+    Args:
+        jobs:       The Jobs to run.
+        clock:      SystemClock (default) or FakeClock.
+        state_file: JSON file of each job's last handled fire time, or None
+                    to keep no state (dry runs).
+    """
+
+    def __init__(self, jobs, clock=None, state_file=None, thread_workers=None, process_workers=None):
+        self.jobs = {job.name: job for job in jobs}
+        self.clock = clock or SystemClock()
+        self.state_file = state_file
+        self.thread_workers = thread_workers or config.scheduler_config['thread_workers']
+        self.process_workers = process_workers or config.scheduler_config['process_workers']
+        self.history = []  # (scheduled, job name, status) of every handled fire
+        self._executors = {}
+        self._tasks = set()
+        self._stopping = None
+
+    # --- Persisted state ---
+
+    def load_state(self):
+        return read_state(self.state_file) if self.state_file else {}
+
+    def _save_job_state(self, name, entry):
+        """Updates one job's entry; other jobs' entries (possibly from another process) are kept."""
+        if not self.state_file:
+            return
+        state = self.load_state()
+        state[name] = entry
+        tmp_path = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_file)
+
+    # --- Execution ---
+
+    def _executor(self, kind):
+        if kind not in self._executors:
+            if kind == 'process':
+                self._executors[kind] = ProcessPoolExecutor(max_workers=self.process_workers)
+            else:
+                self._executors[kind] = ThreadPoolExecutor(max_workers=self.thread_workers,
+                                                           thread_name_prefix="job")
+        return self._executors[kind]
+
+    def _record(self, job, scheduled, status, started=None):
+        self.history.append((scheduled, job.name, status))
+        # A run can finish after a later fire of the job was skipped; last_fire never moves back
+        previous = self.load_state().get(job.name, {}).get('last_fire')
+        last_fire = max(previous, scheduled.isoformat()) if previous else scheduled.isoformat()
+        entry = {'last_fire': last_fire, 'last_status': status}
+        if started is not None:
+            entry.update(last_started=started.isoformat(), last_finished=self.clock.now().isoformat())
+        self._save_job_state(job.name, entry)
+
+    def _launch(self, job, scheduled):
+        if job.running >= job.max_instances:
+            logging.warning(f"Job {job.name} ({scheduled}) skipped: previous run still in progress")
+            self._record(job, scheduled, 'skipped')
+            return
+        job.running += 1
+        task = asyncio.ensure_future(self._run_job(job, scheduled))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_job(self, job, scheduled):
+        started = self.clock.now()
+        logging.info(f"Job {job.name} ({scheduled}) started")
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor(job.executor), job.func,
+                                                                      *job.args)
+            status = 'failed' if result is False else 'ok'
+        except Exception as e:
+            logging.error(f"Job {job.name} ({scheduled}) raised: {e}")
+            status = 'failed'
+        finally:
+            job.running -= 1
+        logging.info(f"Job {job.name} ({scheduled}) finished: {status}")
+        self._record(job, scheduled, status, started)
+
+    def _catch_up(self, now):
+        """Sets each job's next fire from the state and launches the runs missed while down."""
+        state = self.load_state()
+        oldest = now - timedelta(hours=config.scheduler_config['max_catch_up_hours'])
+        for job in self.jobs.values():
+            last_fire = state.get(job.name, {}).get('last_fire')
+            job.next_fire = job.trigger.next_after(now)
+            if last_fire is None:
+                # First start: nothing was missed, but from now on downtime is caught up
+                self._save_job_state(job.name, {'last_fire': now.isoformat(), 'last_status': 'registered'})
+                continue
+            missed = job.trigger.latest_until(max(datetime.fromisoformat(last_fire), oldest), now)
+            if missed is not None and job.catch_up:
+                logging.info(f"Job {job.name}: catching up missed run of {missed}")
+                self._launch(job, missed)
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def wait_idle(self):
+        """Waits for every running job to finish."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def run(self):
+        """Runs until stop(); running jobs are waited for before returning."""
+        self._stopping = asyncio.Event()
+        self._catch_up(self.clock.now())
+        stop_waiter = asyncio.ensure_future(self._stopping.wait())
+        try:
+            while not self._stopping.is_set():
+                now = self.clock.now()
+                for job in self.jobs.values():
+                    if job.next_fire <= now:
+                        # Fires missed while the loop was busy or suspended coalesce into the latest one
+                        scheduled = job.trigger.latest_until(job.next_fire - timedelta(minutes=1), now)
+                        self._launch(job, scheduled)
+                        job.next_fire = job.trigger.next_after(now)
+                wake = min(job.next_fire for job in self.jobs.values())
+                sleeper = asyncio.ensure_future(self.clock.sleep_until(wake))
+                await asyncio.wait({sleeper, stop_waiter}, return_when=asyncio.FIRST_COMPLETED)
+                sleeper.cancel()
+        finally:
+            stop_waiter.cancel()
+            await self.wait_idle()
+            for executor in self._executors.values():
+                executor.shutdown(wait=True)
+            self._executors.clear()
+
+def serve(jobs, state_file=None):
+    """Runs the jobs on the system clock until SIGINT or SIGTERM."""
+    async def main():
+        scheduler = Scheduler(jobs, state_file=state_file or config.scheduler_config['state_file'])
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, scheduler.stop)
+        logging.info("Scheduler started: " + ", ".join(f"{job.name} [{job.trigger.expression}]" for job in jobs))
+        await scheduler.run()
+        logging.info("Scheduler stopped.")
+
+    asyncio.run(main())
+
+def simulate(jobs, hours, start=None, state=None):
+    """
+    Dry-runs the schedule on a FakeClock with the jobs' functions replaced by
+    no-ops.
+
+    Args:
+        state: Optional scheduler state (as in the state file) to start from,
+               to see what would be caught up.
+
+    Returns:
+        The (scheduled time, job name, status) of every fire, in order.
+    """
+    start = start or datetime.now().replace(second=0, microsecond=0)
+    dry_jobs = [Job(job.name, _no_op, job.trigger, 'thread', job.max_instances, job.catch_up) for job in jobs]
+
+    async def main(state_file):
+        clock = FakeClock(start)
+        scheduler = Scheduler(dry_jobs, clock=clock, state_file=state_file)
+        runner = asyncio.ensure_future(scheduler.run())
+        end = start + timedelta(hours=hours)
+        while True:
+            await scheduler.wait_idle()
+            await _settle()
+            deadline = clock.next_deadline()
+            if deadline is None or deadline > end:
+                break
+            await clock.advance(deadline - clock.now())
+        scheduler.stop()
+        await runner
+        return scheduler.history
+
+    with tempfile.TemporaryDirectory() as directory:
+        state_file = os.path.join(directory, "scheduler_state.json")
+        with open(state_file, "w") as f:
+            json.dump(state or {}, f)
+        return asyncio.run(main(state_file))
+
+def _no_op():
+    return True
@@ -0,0 +1,43 @@
+import pandas as pd
+from etl.load import NO_ITEM_BARANG_ID, build_line_item_facts
+
+TRANSACTIONS = pd.DataFrame({
+    'transaction_id': [1, 2],
+    'minimart_id': [10, 11],
+    'cashier_id': [100, 101],
+    'payment_amount': [50000, 2000],
+    'change_amount': [1000, 2000],
+    'total_amount': [49000, 0],
+    'profit': [49000, 0],
+    'sales_datetime': pd.to_datetime(['2024-03-04 09:15', '2024-03-04 10:00']),
+})
+LINES = pd.DataFrame({
+    'transaction_id': [1, 1],
+    'barang_id': [7, 3],
+    'quantity_sold': [2, 5],
+    'harga_satuan': [12000, 5000],
+})
+
+def test_one_fact_row_per_line_item():
+    facts = build_line_item_facts(TRANSACTIONS, LINES)
+    sold = facts[facts['transaction_id'] == 1].set_index('barang_id')
+    assert sorted(sold.index) == [3, 7]
+    assert sold.loc[3, 'quantity_sold'] == 5 and sold.loc[7, 'quantity_sold'] == 2
+    assert sold.loc[3, 'total_amount'] == 25000 and sold.loc[7, 'total_amount'] == 24000
+    assert sold['total_amount'].sum() == TRANSACTIONS.loc[0, 'total_amount']
+    assert (sold['minimart_id'] == 10).all() and (sold['cashier_id'] == 100).all()
+
+def test_payment_stays_on_the_first_line():
+    facts = build_line_item_facts(TRANSACTIONS, LINES)
+    sold = facts[facts['transaction_id'] == 1].set_index('barang_id')
+    assert sold.loc[3, 'payment_amount'] == 50000 and sold.loc[3, 'change_amount'] == 1000
+    assert sold.loc[7, 'payment_amount'] == 0 and sold.loc[7, 'change_amount'] == 0
+
+def test_transaction_without_lines_keeps_one_row():
+    facts = build_line_item_facts(TRANSACTIONS, LINES)
+    empty = facts[facts['transaction_id'] == 2]
+    assert len(empty) == 1
+    row = empty.iloc[0]
+    assert row['barang_id'] == NO_ITEM_BARANG_ID and row['quantity_sold'] == 0
+    assert row['payment_amount'] == 2000 and row['total_amount'] == 0
+    assert 'harga_satuan' not in facts.columns
@@ -0,0 +1,35 @@
+import mysql.connector
+import pandas as pd
+import pytest
+from config import etl_config as config
+from db.partition_maintenance import expected_partitions, list_partitions, verify_pruning
+
+PARTITIONS = [('p_history', pd.Timestamp('2024-01-01')), ('p202401', pd.Timestamp('2024-02-01')),
+              ('p202402', pd.Timestamp('2024-03-01')), ('pmax', None)]
+
+@pytest.fixture(scope="module")
+def dw_conn():
+    try:
+        connection = mysql.connector.connect(connection_timeout=2, **config.dw_config)
+    except mysql.connector.Error as err:
+        pytest.skip(f"Data warehouse not reachable: {err}")
+    if not list_partitions(connection):
+        connection.close()
+        pytest.skip("fact_sales is missing or not partitioned")
+    yield connection
+    connection.close()
+
+def test_expected_partitions_of_a_day():
+    day = pd.Timestamp('2024-02-10')
+    assert expected_partitions(PARTITIONS, day, day + pd.Timedelta(days=1)) == {'p202402'}
+
+def test_expected_partitions_open_ended():
+    assert expected_partitions(PARTITIONS, pd.Timestamp('2024-01-15')) == {'p202401', 'p202402', 'pmax'}
+
+def test_report_and_restock_queries_are_pruned(dw_conn):
+    results = verify_pruning(dw_conn, report_date=pd.Timestamp.today())
+    assert 'restock' in results
+    assert any(name.startswith('summary_') for name in results)
+    for name, result in results.items():
+        assert result['partitions'] == result['expected'], name
+        assert result['ok'], name
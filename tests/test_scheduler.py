@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+import pytest
+from config import etl_config as config
+from scheduler import CronTrigger, FakeClock, Job, Scheduler, simulate, _settle
+
+START = datetime(2024, 3, 4, 0, 0)  # A Monday
+
+def test_cron_next_after():
+    trigger = CronTrigger('0 */6 * * *')
+    assert trigger.next_after(START) == datetime(2024, 3, 4, 6, 0)
+    assert trigger.next_after(datetime(2024, 3, 4, 23, 59)) == datetime(2024, 3, 5, 0, 0)
+    assert CronTrigger('30 8-18/2 * * *').next_after(datetime(2024, 3, 4, 9, 0)) == datetime(2024, 3, 4, 10, 30)
+    assert CronTrigger('@monthly').next_after(START) == datetime(2024, 4, 1, 0, 0)
+
+def test_cron_restricted_day_fields_match_either():
+    # The 15th of the month or any Sunday (7 is Sunday as well)
+    trigger = CronTrigger('0 0 15 * 7')
+    assert trigger.next_after(START) == datetime(2024, 3, 10, 0, 0)
+    assert trigger.next_after(datetime(2024, 3, 10, 0, 0)) == datetime(2024, 3, 15, 0, 0)
+
+@pytest.mark.parametrize("expression", ['0 * * *', '60 * * * *', '0 0 30 2 *', '*/0 * * * *'])
+def test_cron_rejects_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronTrigger(expression).next_after(START)
+
+def test_simulate_fires_on_schedule():
+    history = simulate([Job('restock_planning', None, '0 */6 * * *')], hours=24, start=START)
+    assert [scheduled for scheduled, _, _ in history] == [START + timedelta(hours=h) for h in (6, 12, 18, 24)]
+    assert all(status == 'ok' for _, _, status in history)
+
+def test_overlapping_run_is_skipped():
+    release = threading.Event()
+
+    async def main():
+        clock = FakeClock(START)
+        scheduler = Scheduler([Job('etl', release.wait, '*/10 * * * *')], clock=clock)
+        runner = asyncio.ensure_future(scheduler.run())
+        await _settle()  # Let the scheduler go to sleep until its first fire
+        await clock.advance(timedelta(minutes=10))  # Starts a run that blocks until released
+        await clock.advance(timedelta(minutes=10))  # Fires while that run is still going
+        release.set()
+        await scheduler.wait_idle()
+        scheduler.stop()
+        await runner
+        return scheduler.history
+
+    history = asyncio.run(main())
+    assert sorted(history) == [(START + timedelta(minutes=10), 'etl', 'ok'),
+                               (START + timedelta(minutes=20), 'etl', 'skipped')]
+
+def test_first_start_registers_without_catching_up():
+    assert simulate([Job('etl', None, '0 * * * *')], hours=0, start=START) == []
+
+def test_missed_runs_are_caught_up_once():
+    last_fire = START - timedelta(hours=20)
+    history = simulate([Job('restock_planning', None, '0 */6 * * *')], hours=0, start=START,
+                       state={'restock_planning': {'last_fire': last_fire.isoformat()}})
+    assert history == [(START, 'restock_planning', 'ok')]
+
+def test_missed_runs_older_than_max_catch_up_hours_are_dropped():
+    max_hours = config.scheduler_config['max_catch_up_hours']
+    last_fire = START - timedelta(days=40)
+    # The only missed monthly fire (March 1st) is older than the catch-up window
+    history = simulate([Job('report', None, '@monthly')], hours=0, start=START + timedelta(hours=max_hours),
+                       state={'report': {'last_fire': last_fire.isoformat()}})
+    assert history == []
+
+def test_catch_up_disabled():
+    history = simulate([Job('etl', None, '0 * * * *', catch_up=False)], hours=0, start=START,
+                       state={'etl': {'last_fire': (START - timedelta(hours=3)).isoformat()}})
+    assert history == []
@@ -0,0 +1,30 @@
+from collections import defaultdict
+from warehouse_interaction.truck_batching import split_stop
+
+def piece_loads(unit_size, allocation):
+    loads = defaultdict(float)
+    for position, piece, quantity in allocation:
+        loads[piece] += quantity * unit_size[position]
+    return loads
+
+def test_split_stop_fills_full_pieces():
+    unit_size = [0.3, 0.25]
+    allocation = split_stop(unit_size, [5, 4])
+    assert sum(q for position, _, q in allocation if position == 0) == 5
+    assert sum(q for position, _, q in allocation if position == 1) == 4
+    assert all(load <= 1.0 + 1e-9 for load in piece_loads(unit_size, allocation).values())
+
+def test_split_stop_unit_bigger_than_a_truck():
+    assert split_stop([1.5], [2]) == [(0, 0, 1), (0, 1, 1)]
+
+def test_split_stop_oversized_unit_gets_its_own_piece():
+    unit_size = [0.4, 1.5, 0.4]
+    allocation = split_stop(unit_size, [1, 2, 3])
+    assert sum(q for _, _, q in allocation) == 6
+    pieces_of_big = {piece for position, piece, _ in allocation if position == 1}
+    assert len(pieces_of_big) == 2
+    for position, piece, _ in allocation:
+        if position != 1:
+            assert piece not in pieces_of_big
+    loads = piece_loads(unit_size, allocation)
+    assert all(load <= 1.0 + 1e-9 for piece, load in loads.items() if piece not in pieces_of_big)
@@ -0,0 +1,290 @@
+import argparse
+import json
+import logging
+import os
+import mysql.connector
+import numpy as np
+import pandas as pd
+from config import etl_config as config
+from db.connection_pool import get_connection
+from etl.aggregates import aggregates_available
+from etl.intermediate import write_frame, read_frame
+
+LOG_FILE = "demand_forecast.log"
+logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+#  Daily units sold per minimart x barang; {source_table}/{quantity_column}/{day_expr}
+#  switch between the daily aggregate and fact_sales like the restock query.
+#  barang_id 0 marks fact rows of transactions without line items.
+DAILY_SALES_QUERY_TEMPLATE = """
+    SELECT
+        {day_expr} AS tanggal,
+        f.minimart_id,
+        f.barang_id,
+        SUM(f.{quantity_column}) AS quantity
+    FROM
+        {source_table} f
+    WHERE
+        f.{date_column} >= %s AND f.{date_column} < %s AND f.barang_id <> 0
+    GROUP BY
+        {day_expr}, f.minimart_id, f.barang_id
+"""
+
+SEASON_COLUMNS = [f"season_{dow}" for dow in range(7)]
+
+def series_keys(minimart_id, barang_id):
+    """One int64 key per minimart x barang series (both ids are MySQL INTs)."""
+    return (np.asarray(minimart_id, dtype=np.int64) << 32) | np.asarray(barang_id, dtype=np.int64)
+
+class ForecastModel:
+    """
+    Additive Holt-Winters smoothing (level plus a day-of-week season, no
+    trend) for every minimart x barang series at once.
+
+    The series are rows of flat arrays sorted by their key, so folding in a
+    day is a handful of array operations over all series.
+    """
+
+    def __init__(self, alpha, gamma, last_day=None, keys=None, level=None, season=None):
+        self.alpha = alpha
+        self.gamma = gamma
+        self.last_day = last_day  # Last day folded in (a pd.Timestamp), None before the first fit
+        self.keys = np.empty(0, dtype=np.int64) if keys is None else keys
+        self.level = np.empty(0) if level is None else level
+        self.season = np.empty((0, 7)) if season is None else season
+
+    def _add_series(self, new_keys, initial_level):
+        keys = np.concatenate([self.keys, new_keys])
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.level = np.concatenate([self.level, initial_level])[order]
+        self.season = np.concatenate([self.season, np.zeros((len(new_keys), 7))])[order]
+
+    def fold(self, daily, start, end):
+        """
+        Folds in the days start <= day < end.
+
+        Args:
+            daily: Rows of tanggal, minimart_id, barang_id, quantity. Series
+                   and days without a row sold nothing.
+        """
+        days = pd.date_range(start, end - pd.Timedelta(days=1), freq='D')
+        if not len(days):
+            return
+        keys = series_keys(daily['minimart_id'], daily['barang_id'])
+        columns = (pd.to_datetime(daily['tanggal']).to_numpy() - days[0].to_datetime64()) // np.timedelta64(1, 'D')
+        quantity = daily['quantity'].to_numpy(dtype=np.float64)
+
+        unique_keys, series_of_row = np.unique(keys, return_inverse=True)
+        is_new = ~np.isin(unique_keys, self.keys, assume_unique=True)
+        if is_new.any():
+            # New series start at their mean daily sales over the days being folded in
+            totals = np.bincount(series_of_row, weights=quantity, minlength=len(unique_keys))
+            self._add_series(unique_keys[is_new], totals[is_new] / len(days))
+
+        # Dense series x day matrix of units sold
+        rows = np.searchsorted(self.keys, unique_keys)[series_of_row]
+        sales = np.bincount(rows * len(days) + columns, weights=quantity,
+                            minlength=len(self.keys) * len(days)).reshape(len(self.keys), len(days))
+        for column, day in enumerate(days):
+            dow = day.dayofweek
+            seasonal = self.season[:, dow]
+            level = self.alpha * (sales[:, column] - seasonal) + (1 - self.alpha) * self.level
+            self.season[:, dow] = self.gamma * (sales[:, column] - level) + (1 - self.gamma) * seasonal
+            self.level = level
+        self.last_day = days[-1]
+        self.prune()
+
+    def prune(self):
+        """Drops series that have decayed to nothing (stores that stopped selling an item)."""
+        threshold = config.forecast_config['prune_below']
+        keep = (np.abs(self.level) + np.abs(self.season).max(axis=1, initial=0)) >= threshold
+        if not keep.all():
+            self.keys, self.level, self.season = self.keys[keep], self.level[keep], self.season[keep]
+
+    def forecast(self, start, horizon_days):
+        """
+        Returns the forecast units sold per series over horizon_days from start.
+
+        Returns:
+            A DataFrame of minimart_id, barang_id, forecast_quantity.
+        """
+        dows = pd.date_range(start, periods=horizon_days, freq='D').dayofweek.to_numpy()
+        daily = np.maximum(self.level[:, None] + self.season[:, dows], 0)
+        return pd.DataFrame({'minimart_id': (self.keys >> 32).astype(np.int32),
+                             'barang_id': (self.keys & 0xFFFFFFFF).astype(np.int32),
+                             'forecast_quantity': daily.sum(axis=1)})
+
+    def to_frame(self):
+        frame = pd.DataFrame(self.season, columns=SEASON_COLUMNS)
+        frame.insert(0, 'minimart_id', (self.keys >> 32).astype(np.int32))
+        frame.insert(1, 'barang_id', (self.keys & 0xFFFFFFFF).astype(np.int32))
+        frame.insert(2, 'level', self.level)
+        return frame
+
+    @classmethod
+    def from_frame(cls, frame, alpha, gamma, last_day):
+        keys = series_keys(frame['minimart_id'], frame['barang_id'])
+        order = np.argsort(keys, kind='stable')
+        return cls(alpha, gamma, last_day, keys[order], frame['level'].to_numpy(dtype=np.float64)[order],
+                   frame[SEASON_COLUMNS].to_numpy(dtype=np.float64)[order])
+
+def state_pointer_path(state_dir=None):
+    return os.path.join(state_dir or config.forecast_config['state_dir'], "forecast_state.json")
+
+def load_model(state_dir=None):
+    """
+    Reads the persisted model.
+
+    Returns:
+        The ForecastModel, or None if there is no state or it was fitted with
+        other smoothing parameters.
+    """
+    pointer_path = state_pointer_path(state_dir)
+    if not os.path.exists(pointer_path):
+        return None
+    try:
+        with open(pointer_path) as f:
+            pointer = json.load(f)
+        alpha, gamma = config.forecast_config['alpha'], config.forecast_config['gamma']
+        if (pointer['alpha'], pointer['gamma']) != (alpha, gamma):
+            logging.info("Smoothing parameters changed; refitting the forecast model.")
+            return None
+        frame = read_frame(pointer['file'], schema='forecast_state')
+        return ForecastModel.from_frame(frame, alpha, gamma, pd.Timestamp(pointer['last_day']))
+    except (OSError, ValueError, KeyError) as err:
+        logging.warning(f"Error reading forecast state {pointer_path}, refitting: {err}")
+        return None
+
+def save_model(model, state_dir=None):
+    """
+    Persists the model: the series are written to a new file first, then the
+    pointer is replaced atomically, so a crash never leaves a half-written state.
+    """
+    state_dir = state_dir or config.forecast_config['state_dir']
+    os.makedirs(state_dir, exist_ok=True)
+    pointer_path = state_pointer_path(state_dir)
+    previous = None
+    if os.path.exists(pointer_path):
+        with open(pointer_path) as f:
+            previous = json.load(f).get('file')
+
+    base_path = os.path.join(state_dir, f"forecast_state_{model.last_day:%Y%m%d}")
+    path = write_frame(model.to_frame(), base_path, schema='forecast_state')
+    tmp_path = f"{pointer_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({'last_day': str(model.last_day.date()), 'alpha': model.alpha, 'gamma': model.gamma,
+                   'file': path, 'series': len(model.keys)}, f, indent=2)
+    os.replace(tmp_path, pointer_path)
+    if previous and previous != path and os.path.exists(previous):
+        os.remove(previous)
+    return path
+
+def complete_until(connection, today=None):
+    """
+    First day whose sales may not all be in the DW yet: the day of the last
+    DW load (from etl_load_epoch), and never later than today.
+    """
+    today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT loaded_at FROM etl_load_epoch WHERE id = 1")
+        row = cursor.fetchone()
+    except mysql.connector.Error as err:
+        logging.warning(f"Could not read the last DW load time: {err}")
+        row = None
+    finally:
+        cursor.close()
+    if not row or row[0] is None:
+        return today
+    return min(pd.Timestamp(row[0]).normalize(), today)
+
+def fetch_daily_sales(connection, start, end):
+    """Reads daily units sold per minimart x barang for start <= day < end."""
+    if aggregates_available(connection):
+        source_table, quantity_column, date_column = "agg_daily_store_item", "total_quantity_sold", "tanggal"
+        day_expr, params = "f.tanggal", (start.date(), end.date())
+    else:
+        source_table, quantity_column, date_column = "fact_sales", "quantity_sold", "sales_datetime"
+        day_expr, params = "DATE(f.sales_datetime)", (start.to_pydatetime(), end.to_pydatetime())
+    query = DAILY_SALES_QUERY_TEMPLATE.format(source_table=source_table, quantity_column=quantity_column,
+                                              date_column=date_column, day_expr=day_expr)
+    return pd.read_sql(query, connection, params=params)
+
+def refresh_forecasts(connection, today=None, state_dir=None):
+    """
+    Brings the persisted model up to date and forecasts demand from today.
+
+    Only the complete days since the last run are read and folded in; the
+    full history (forecast_config['history_days']) is read only on the first
+    run, after a gap longer than that, or when the smoothing parameters change.
+
+    Args:
+        connection: MySQL connection to the data warehouse.
+
+    Returns:
+        A DataFrame of minimart_id, barang_id, forecast_quantity (units over
+        forecast_config['horizon_days']). Empty on error, which is logged
+        as a warning only: forecasts are optional and delivery planning then
+        falls back to total_sold.
+    """
+    today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+    history_start = today - pd.Timedelta(days=config.forecast_config['history_days'])
+    try:
+        end = complete_until(connection, today)
+        model = load_model(state_dir)
+        if model is None or model.last_day < history_start:
+            model = ForecastModel(config.forecast_config['alpha'], config.forecast_config['gamma'])
+            start = history_start
+        else:
+            start = model.last_day + pd.Timedelta(days=1)
+
+        if start < end:
+            daily = fetch_daily_sales(connection, start, end)
+            model.fold(daily, start, end)
+            save_model(model, state_dir)
+            logging.info(f"Forecast model updated with {(end - start).days} day(s), {len(daily)} rows; "
+                         f"{len(model.keys)} series")
+        return model.forecast(today, config.forecast_config['horizon_days'])
+    except (mysql.connector.Error, pd.errors.DatabaseError) as err:
+        logging.warning(f"Error reading daily sales for the forecast: {err}")
+        return pd.DataFrame()
+    except (OSError, ValueError) as e:
+        logging.warning(f"Error updating the forecast model: {e}")
+        return pd.DataFrame()
+
+def load_forecasts(today=None, state_dir=None):
+    """Forecasts from the persisted model without touching the DW (empty if there is no state)."""
+    model = load_model(state_dir)
+    if model is None:
+        return pd.DataFrame()
+    today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+    return model.forecast(today, config.forecast_config['horizon_days'])
+
+def apply_forecasts(df_restock, forecasts):
+    """
+    Adds target_stock (the rounded-up forecast) to restock rows that have a
+    forecast; the delivery planner falls back to total_sold for the others.
+    """
+    if forecasts is None or forecasts.empty:
+        return df_restock
+    targets = forecasts.set_index(['minimart_id', 'barang_id'])['forecast_quantity']
+    index = pd.MultiIndex.from_arrays([df_restock['minimart_id'].astype(np.int64),
+                                       df_restock['barang_id'].astype(np.int64)])
+    target_stock = np.ceil(targets.reindex(index).to_numpy())
+    return df_restock.assign(target_stock=target_stock)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Update the demand forecast model and print the forecasts.")
+    parser.add_argument("--minimart-id", type=int, help="Only print this minimart's forecasts.")
+    args = parser.parse_args()
+
+    dw_conn = get_connection('dw')
+    try:
+        forecasts = refresh_forecasts(dw_conn)
+    finally:
+        dw_conn.close()
+    if args.minimart_id is not None and not forecasts.empty:
+        forecasts = forecasts[forecasts['minimart_id'] == args.minimart_id]
+    print(forecasts.to_string(index=False) if not forecasts.empty else "No forecasts.")
@@ -1,8 +1,16 @@
 import mysql.connector
 import logging
-from config import config  # Import database configuration
+from config import etl_config as config  # Import database configuration
+from db.connection_pool import get_connection
+from db.query_cache import cached_read_sql
 import pandas as pd
+from etl.aggregates import aggregates_available
+from etl.intermediate import write_frame
 import os  # For file operations
+import argparse
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 LOG_FILE = "download_reports.log"
 logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
@@ -11,14 +19,92 @@ logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
 def create_dw_connection():
     """Establishes a connection to the data warehouse."""
     try:
-        dw_config = config.dw_config
-        connection = mysql.connector.connect(**dw_config)
+        connection = get_connection('dw')  # Pooled; close() returns it to the pool
         logging.info("Connected to data warehouse.")
         return connection
     except mysql.connector.Error as err:
         logging.error(f"Error connecting to data warehouse: {err}")
         return None
 
+#  {source_table}/{quantity_column}/{date_column} switch between fact_sales and
+#  the daily store x item aggregate, which holds the same totals in far fewer
+#  rows. The optional sales window is a plain range on the date column so
+#  only the recent fact_sales partitions are scanned. sales_days counts the
+#  days from a store's first sale of the item (in the window) to today, so
+#  total_sold can be turned into a daily rate.
+RESTOCK_QUERY_TEMPLATE = """
+    SELECT
+        d.gudang_id,
+        d.minimart_id,
+        d.minimart_nama,
+        d.kota_id,
+        b.barang_id,
+        b.barang_nama,
+        SUM(f.{quantity_column}) as total_sold,
+        GREATEST(DATEDIFF(%s, MIN(f.{date_column})), 1) as sales_days
+    FROM
+        {source_table} f
+    JOIN
+        dim_minimart d ON f.minimart_id = d.minimart_id
+    JOIN
+        dim_barang b ON f.barang_id = b.barang_id
+    {where_clause}
+    GROUP BY
+        d.gudang_id, d.minimart_id, d.minimart_nama, d.kota_id, b.barang_id, b.barang_nama
+    ORDER BY
+        d.gudang_id, d.minimart_id, total_sold DESC
+"""
+
+def restock_window_start(today=None):
+    """
+    Start of the sales window the restock query reads (midnight, so it is
+    stable within a day), or None when restock_lookback_days is None and all
+    history is read.
+    """
+    lookback_days = config.partition_config['restock_lookback_days']
+    if lookback_days is None:
+        return None
+    today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+    return today - pd.Timedelta(days=lookback_days)
+
+def build_restock_query(connection, gudang_id=None, today=None, use_aggregates=None):
+    """
+    Builds the restock query for one Gudang, or for all of them when gudang_id is None.
+
+    use_aggregates forces the source table; by default the daily aggregate is
+    used when it exists.
+
+    Returns:
+        A (query, params) tuple.
+    """
+    today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+    since = restock_window_start(today)
+    if use_aggregates is None:
+        use_aggregates = aggregates_available(connection)
+    if use_aggregates:
+        source_table, quantity_column, date_column = "agg_daily_store_item", "total_quantity_sold", "tanggal"
+    else:
+        source_table, quantity_column, date_column = "fact_sales", "quantity_sold", "sales_datetime"
+    params = [today.date()]
+    conditions = []
+    if since is not None:
+        conditions.append(f"f.{date_column} >= %s")
+        params.append(since.date() if use_aggregates else since.to_pydatetime())
+    if gudang_id is not None:
+        conditions.append("d.gudang_id = %s")  # Filter by the Gudang
+        params.append(gudang_id)
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = RESTOCK_QUERY_TEMPLATE.format(source_table=source_table, quantity_column=quantity_column,
+                                          date_column=date_column, where_clause=where_clause)
+    return query, tuple(params)
+
+def save_restocking_file(df, gudang_id, download_path):
+    """Writes one Gudang's restock data and returns (filepath, seconds taken)."""
+    start = time.perf_counter()
+    base_path = os.path.join(download_path, f"restock_data_gudang_{gudang_id}")
+    filepath = write_frame(df.drop(columns=['gudang_id']), base_path, schema='restock')
+    return filepath, time.perf_counter() - start
+
 def download_restocking_data(connection, gudang_id, download_path="."):
     """
     Downloads data needed for restocking from the data warehouse.
@@ -32,32 +118,12 @@ def download_restocking_data(connection, gudang_id, download_path="."):
     try:
         #  This is a simplified example.  A real-world query would be much more complex,
         #  considering current inventory, sales trends, etc.
-        query = """
-            SELECT
-                d.minimart_id,
-                d.minimart_nama,
-                b.barang_nama,
-                SUM(f.quantity_sold) as total_sold
-            FROM
-                fact_sales f
-            JOIN
-                dim_minimart d ON f.minimart_id = d.minimart_id
-            JOIN
-                dim_barang b ON f.barang_id = b.barang_id
-            WHERE
-                d.gudang_id = %s  -- Filter by the Gudang
-            GROUP BY
-                d.minimart_id, d.minimart_nama, b.barang_nama
-            ORDER BY
-                d.minimart_id, total_sold DESC
-        """
-
-        df = pd.read_sql(query, connection, params=(gudang_id,))
+        query, params = build_restock_query(connection, gudang_id)
+
+        df = cached_read_sql(query, connection, params=params)
 
         if not df.empty:
-            filename = f"restock_data_gudang_{gudang_id}.csv"
-            filepath = os.path.join(download_path, filename)
-            df.to_csv(filepath, index=False)
+            filepath, _ = save_restocking_file(df, gudang_id, download_path)
             logging.info(f"Downloaded restocking data for Gudang {gudang_id} to {filepath}")
             return filepath
         else:
@@ -71,20 +137,102 @@ def download_restocking_data(connection, gudang_id, download_path="."):
         logging.error(f"An unexpected error occurred: {e}")
         return None
 
+def fetch_all_restocking_data(connection):
+    """
+    Fetches restocking data for every Gudang with one grouped query.
+
+    Returns:
+        A DataFrame with a gudang_id column, or None on error (an empty
+        DataFrame means there is nothing to restock).
+    """
+    try:
+        start = time.perf_counter()
+        query, params = build_restock_query(connection)
+        df = cached_read_sql(query, connection, params=params)
+        logging.info(f"Fetched restocking data for all Gudangs in {time.perf_counter() - start:.2f}s ({len(df)} rows)")
+        return df
+    except (mysql.connector.Error, pd.errors.DatabaseError) as err:
+        logging.error(f"Error downloading restocking data: {err}")
+        return None
+
+def write_restocking_files(df, download_path=".", workers=None):
+    """
+    Writes each Gudang's slice of the restocking data concurrently.
+
+    Returns:
+        A dictionary of gudang_id -> file path.
+    """
+    workers = workers or config.restock_export_config['workers']
+    files = {}
+    if df.empty:
+        return files
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Each writer runs in a copy of the caller's context so its bytes count against the caller's span
+        futures = {executor.submit(contextvars.copy_context().run, save_restocking_file, df_gudang, gudang_id,
+                                   download_path): gudang_id
+                   for gudang_id, df_gudang in df.groupby('gudang_id')}
+        for future in as_completed(futures):
+            gudang_id = futures[future]
+            try:
+                filepath, write_seconds = future.result()
+                files[gudang_id] = filepath
+                logging.info(f"Downloaded restocking data for Gudang {gudang_id} to {filepath} "
+                             f"(written in {write_seconds:.3f}s)")
+            except OSError as e:
+                logging.error(f"Error writing restocking data for Gudang {gudang_id}: {e}")
+    return files
+
+def download_all_restocking_data(connection, download_path=".", workers=None):
+    """
+    Downloads restocking data for every Gudang with one grouped query.
+
+    The result is split by gudang_id in memory and the per-Gudang files are
+    written concurrently.
+
+    Args:
+        connection:    MySQL connection to the data warehouse.
+        download_path: The directory to save the downloaded data.
+        workers:       Concurrent file writers (defaults to config.restock_export_config['workers']).
+
+    Returns:
+        A dictionary of gudang_id -> file path. Empty on error.
+    """
+    start = time.perf_counter()
+    try:
+        df = fetch_all_restocking_data(connection)
+        if df is None:
+            return {}
+        files = write_restocking_files(df, download_path, workers)
+    except Exception as e:
+        logging.error(f"An unexpected error occurred: {e}")
+        return {}
+    logging.info(f"Restocking data for {len(files)} Gudangs downloaded in {time.perf_counter() - start:.2f}s")
+    return files
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Download restocking data from the data warehouse.")
+    parser.add_argument("--gudang-id", type=int, help="Download a single Gudang instead of all of them.")
+    parser.add_argument("--download-path", default="reports", help="Directory to save reports.")
+    args = parser.parse_args()
+
     dw_conn = create_dw_connection()
     if dw_conn:
-        #  Simulate running this for a specific Gudang (e.g., Gudang ID 1)
-        gudang_id_to_download = 1
-        download_path = "reports"  #  Directory to save reports
+        download_path = args.download_path  #  Directory to save reports
         os.makedirs(download_path, exist_ok=True)  # Create the directory if it doesn't exist
 
-        downloaded_file = download_restocking_data(dw_conn, gudang_id_to_download, download_path)
+        if args.gudang_id is not None:
+            downloaded_file = download_restocking_data(dw_conn, args.gudang_id, download_path)
 
-        if downloaded_file:
-            print(f"Restocking data downloaded to: {downloaded_file}")
+            if downloaded_file:
+                print(f"Restocking data downloaded to: {downloaded_file}")
+            else:
+                print(f"No restocking data downloaded for Gudang {args.gudang_id}")
         else:
-            print(f"No restocking data downloaded for Gudang {gudang_id_to_download}")
+            downloaded_files = download_all_restocking_data(dw_conn, download_path)
+            for gudang_id, downloaded_file in sorted(downloaded_files.items()):
+                print(f"Restocking data for Gudang {gudang_id} downloaded to: {downloaded_file}")
+            if not downloaded_files:
+                print("No restocking data downloaded.")
 
         dw_conn.close()
     else:
@@ -1,43 +1,223 @@
 import pandas as pd
+import numpy as np
 import logging
+import os
+import mysql.connector
+from config import etl_config as config
+from db.connection_pool import get_connection
+from etl.intermediate import read_frame, find_frame
+from instrumentation import record_file_written
+from warehouse_interaction.demand_forecast import load_forecasts, apply_forecasts
 
 LOG_FILE = "generate_delivery.log"
 logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
-def generate_delivery_plan(restock_data_file, gudang_id):
+INVENTORY_QUERY = """
+    SELECT gudang_id, barang_id, SUM(inventory_stok) AS inventory_stok
+    FROM inventory
+    {gudang_filter}
+    GROUP BY gudang_id, barang_id
+"""
+CAPACITY_QUERY = "SELECT gudang_id, gudang_kapasitas FROM gudang {gudang_filter}"
+
+def fetch_inventory(connection, gudang_id=None):
+    """
+    Reads per-Gudang stock from the source inventory table.
+
+    Returns:
+        A DataFrame of gudang_id, barang_id, inventory_stok. Empty on error.
+    """
+    gudang_filter, params = ("WHERE gudang_id = %s", (gudang_id,)) if gudang_id is not None else ("", ())
+    try:
+        return pd.read_sql(INVENTORY_QUERY.format(gudang_filter=gudang_filter), connection, params=params)
+    except (mysql.connector.Error, pd.errors.DatabaseError) as err:
+        logging.error(f"Error reading inventory: {err}")
+        return pd.DataFrame(columns=['gudang_id', 'barang_id', 'inventory_stok'])
+
+def fetch_gudang_capacity(connection, gudang_id=None):
+    """
+    Reads gudang_kapasitas, the most units a Gudang can dispatch in one plan.
+
+    Returns:
+        A dictionary of gudang_id -> capacity. Empty on error.
+    """
+    gudang_filter, params = ("WHERE gudang_id = %s", (gudang_id,)) if gudang_id is not None else ("", ())
+    try:
+        df = pd.read_sql(CAPACITY_QUERY.format(gudang_filter=gudang_filter), connection, params=params)
+        return {int(k): int(v) for k, v in zip(df['gudang_id'], df['gudang_kapasitas']) if pd.notna(v)}
+    except (mysql.connector.Error, pd.errors.DatabaseError) as err:
+        logging.error(f"Error reading gudang capacity: {err}")
+        return {}
+
+def _group_starts(sorted_groups):
+    """Index of the first element of each element's group in a sorted group array."""
+    return np.searchsorted(sorted_groups, sorted_groups, side='left')
+
+def allocate_fair_share(requested, groups, available):
+    """
+    Splits each group's available units across its requests in proportion to
+    the request (largest-remainder rounding), all in array operations.
+
+    Args:
+        requested: int64 units requested per store x item row.
+        groups:    Group code (0..G-1) of each row, e.g. the item.
+        available: int64 units available per group.
+
+    Returns:
+        int64 units allocated per row; never more than requested, and per
+        group never more than available.
+    """
+    demand = np.bincount(groups, weights=requested, minlength=len(available))
+    ratio = np.minimum(np.divide(available, demand, out=np.ones(len(available)), where=demand > 0), 1.0)
+    share = requested * ratio[groups]
+    allocated = np.floor(share).astype(np.int64)
+
+    # Units lost to rounding down go to the largest fractional shares of scarce groups
+    leftover = available - np.bincount(groups, weights=allocated, minlength=len(available)).astype(np.int64)
+    leftover = np.where(demand > available, leftover, 0)
+    rows = np.flatnonzero(leftover[groups] > 0)
+    if len(rows):
+        # One float sort key: group, then largest fractional part first (fractions are in [0, 1))
+        sort_key = groups[rows] + (1.0 - (share[rows] - allocated[rows])) * 0.5
+        order = rows[np.argsort(sort_key)]
+        sorted_groups = groups[order]
+        rank = np.arange(len(order)) - _group_starts(sorted_groups)
+        allocated[order[rank < leftover[sorted_groups]]] += 1
+    return np.minimum(allocated, requested)
+
+def allocate_priority(requested, groups, available, priority):
+    """
+    Fills requests in descending priority within each group until the group's
+    available units run out.
+
+    Returns:
+        int64 units allocated per row.
+    """
+    span = int(priority.max() - priority.min()) + 1 if len(priority) else 1
+    if (int(groups.max()) + 1 if len(groups) else 1) * span < 2**62:
+        # One int64 sort key (group, then highest priority first) sorts faster than lexsort
+        order = np.argsort(groups.astype(np.int64) * span + (priority.max() - priority), kind='stable')
+    else:
+        order = np.lexsort((-priority, groups))
+    sorted_groups = groups[order]
+    sorted_requests = requested[order]
+    cumulative = np.cumsum(sorted_requests)
+    starts = _group_starts(sorted_groups)
+    # Units requested by higher-priority rows of the same group
+    ahead = (cumulative - sorted_requests) - (cumulative[starts] - sorted_requests[starts])
+    allocated = np.empty_like(requested)
+    allocated[order] = np.clip(available[sorted_groups] - ahead, 0, sorted_requests)
+    return allocated
+
+def plan_deliveries(df_restock, gudang_id, inventory=None, capacity=None, rule=None):
+    """
+    Vectorized delivery planning for one Gudang.
+
+    The store x item requests are held as flat coordinate arrays (a sparse
+    store x item matrix). Each store's request is its target stock minus
+    current_stock when the restock data has it. The target stock is the
+    demand forecast (target_stock, see demand_forecast.apply_forecasts) where
+    there is one, else total_sold scaled to the forecast horizon; without
+    forecasts it is total_sold x target_multiplier. Items whose Gudang
+    stock cannot cover every request are split by `rule`, and the whole plan
+    is then scaled down to the Gudang's capacity with the same rule.
+
+    Args:
+        df_restock: Rows of minimart_id, barang_id, barang_nama, total_sold,
+                    sales_days (and optionally target_stock and current_stock).
+        gudang_id:  The Gudang being planned.
+        inventory:  Optional DataFrame of barang_id, inventory_stok for this
+                    Gudang. Without it, stock is treated as unlimited.
+        capacity:   Optional maximum units in the plan.
+        rule:       'fair_share' or 'priority' (stores with the larger target first).
+
+    Returns:
+        A DataFrame of minimart_id, barang_id, barang_nama, requested_quantity,
+        quantity_to_deliver, kota_id (when the restock data has it) and
+        gudang_id, for rows with something to deliver.
+    """
+    rule = rule or config.delivery_planner_config['allocation_rule']
+    if rule not in ('fair_share', 'priority'):
+        raise ValueError(f"Unknown allocation rule: {rule}")
+
+    total_sold = df_restock['total_sold'].to_numpy(dtype=np.int64, na_value=0)
+    target = total_sold * config.delivery_planner_config['target_multiplier']
+    if 'target_stock' in df_restock.columns:
+        # Forecasts cover horizon_days, so rows without one use total_sold's
+        # daily rate (over sales_days) for the same horizon
+        forecast = df_restock['target_stock'].to_numpy(dtype=np.float64, na_value=np.nan)
+        sales_days = np.maximum(df_restock['sales_days'].to_numpy(dtype=np.float64, na_value=1), 1)
+        fallback = np.ceil(total_sold / sales_days * config.forecast_config['horizon_days'])
+        target = np.where(np.isnan(forecast), fallback, forecast).astype(np.int64)
+    priority = target
+    if 'current_stock' in df_restock.columns:
+        target = target - df_restock['current_stock'].to_numpy(dtype=np.int64, na_value=0)
+    requested = np.maximum(target, 0)
+
+    item_codes, items = pd.factorize(df_restock['barang_id'])
+    allocated = requested
+    if inventory is not None:
+        stock = inventory.groupby('barang_id')['inventory_stok'].sum()
+        available = stock.reindex(items, fill_value=0).to_numpy(dtype=np.int64, na_value=0)
+        if rule == 'fair_share':
+            allocated = allocate_fair_share(requested, item_codes, available)
+        else:
+            allocated = allocate_priority(requested, item_codes, available, priority)
+
+    if capacity is not None and allocated.sum() > capacity:
+        logging.info(f"Gudang {gudang_id}: plan of {allocated.sum()} units capped at capacity {capacity}")
+        single_group = np.zeros(len(allocated), dtype=np.int64)
+        if rule == 'fair_share':
+            allocated = allocate_fair_share(allocated, single_group, np.array([capacity], dtype=np.int64))
+        else:
+            allocated = allocate_priority(allocated, single_group, np.array([capacity], dtype=np.int64), priority)
+
+    delivery_plan = pd.DataFrame({
+        'minimart_id': df_restock['minimart_id'].array,
+        'barang_id': df_restock['barang_id'].array,
+        'barang_nama': df_restock['barang_nama'].array,
+        'requested_quantity': requested,
+        'quantity_to_deliver': allocated,
+    })
+    if 'kota_id' in df_restock.columns:
+        delivery_plan['kota_id'] = df_restock['kota_id'].array  # Lets truck batching group stops by city
+    delivery_plan = delivery_plan[allocated > 0].reset_index(drop=True)
+    delivery_plan['gudang_id'] = gudang_id
+    return delivery_plan
+
+def generate_delivery_plan(restock_data_file, gudang_id, inventory=None, capacity=None, rule=None,
+                           forecasts=None):
     """
     Generates a delivery plan for minimarts based on restock data.
 
     Args:
-        restock_data_file:  Path to the CSV file containing restock data.
+        restock_data_file:  Path to the restock data file (Parquet, Arrow or CSV),
+                            or the restock DataFrame itself when run in-process.
         gudang_id:          The ID of the Gudang generating the plan.
+        inventory:          Optional DataFrame of this Gudang's stock (barang_id, inventory_stok).
+        capacity:           Optional gudang_kapasitas; ignored if respect_capacity is off.
+        rule:               Allocation rule for scarce stock (see plan_deliveries).
+        forecasts:          Optional demand forecasts (see demand_forecast) used as target stock.
 
     Returns:
         A Pandas DataFrame representing the delivery plan.
     """
 
     try:
-        df_restock = pd.read_csv(restock_data_file)
-        logging.info(f"Read restock data from {restock_data_file}")
-
-        #  ---  Delivery Logic  ---
-        #  This is where the core logic for deciding *how much* to deliver goes.
-        #  It's highly dependent on your business rules!
-        #  Here's a simplified example:
-
-        #  1. Calculate a "target stock" (e.g., based on average sales)
-        df_restock['target_stock'] = df_restock['total_sold'] * 2  # Example: 2 times the total sold
-
-        #  2. Determine the quantity to deliver
-        df_restock['quantity_to_deliver'] = df_restock['target_stock'] - df_restock['current_stock']  # Assuming 'current_stock' is in restock_data
-        df_restock.loc[df_restock['quantity_to_deliver'] < 0, 'quantity_to_deliver'] = 0  # Don't deliver negative quantities
+        if isinstance(restock_data_file, pd.DataFrame):
+            df_restock = restock_data_file
+        else:
+            df_restock = read_frame(restock_data_file, schema='restock')
+            logging.info(f"Read restock data from {restock_data_file}")
+        df_restock = apply_forecasts(df_restock, forecasts)
 
-        #  3. Create the delivery plan DataFrame
-        delivery_plan = df_restock[['minimart_id', 'barang_nama', 'quantity_to_deliver']].copy()
-        delivery_plan['gudang_id'] = gudang_id
+        if not config.delivery_planner_config['respect_capacity']:
+            capacity = None
+        delivery_plan = plan_deliveries(df_restock, gudang_id, inventory, capacity, rule)
 
-        logging.info("Generated delivery plan.")
+        logging.info(f"Generated delivery plan for Gudang {gudang_id}: {len(delivery_plan)} rows, "
+                     f"{int(delivery_plan['quantity_to_deliver'].sum())} units")
         return delivery_plan
 
     except FileNotFoundError:
@@ -64,6 +244,7 @@ def save_delivery_plan(delivery_plan, gudang_id, output_path="."):
         filename = f"delivery_plan_gudang_{gudang_id}.csv"
         filepath = os.path.join(output_path, filename)
         delivery_plan.to_csv(filepath, index=False)
+        record_file_written(filepath)
         logging.info(f"Saved delivery plan to {filepath}")
         return filepath
     except Exception as e:
@@ -72,9 +253,18 @@ def save_delivery_plan(delivery_plan, gudang_id, output_path="."):
 
 if __name__ == '__main__':
     gudang_id = 1  #  Example Gudang ID
-    restock_data_file = "reports/restock_data_gudang_1.csv"  #  Path to the downloaded data
+    #  Path to the downloaded data, in whichever format it was written
+    restock_data_file = find_frame("reports/restock_data_gudang_1") or "reports/restock_data_gudang_1.csv"
 
-    delivery_plan = generate_delivery_plan(restock_data_file, gudang_id)
+    oltp_conn = get_connection('oltp')
+    try:
+        inventory = fetch_inventory(oltp_conn, gudang_id)
+        capacity = fetch_gudang_capacity(oltp_conn, gudang_id).get(gudang_id)
+    finally:
+        oltp_conn.close()
+    #  Targets from the last forecast run; rows without one fall back to total_sold
+    delivery_plan = generate_delivery_plan(restock_data_file, gudang_id, inventory, capacity,
+                                           forecasts=load_forecasts())
 
     if not delivery_plan.empty:
         output_path = "deliveries"
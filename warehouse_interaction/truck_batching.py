@@ -0,0 +1,285 @@
+import argparse
+import logging
+import os
+import numpy as np
+import pandas as pd
+from config import etl_config as config
+from instrumentation import record_file_written
+
+LOG_FILE = "generate_delivery.log"
+logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+def add_load_measures(delivery_plan, item_dimensions=None):
+    """
+    Adds weight_kg and volume_m3 per plan row.
+
+    Args:
+        delivery_plan:   Rows with barang_id and quantity_to_deliver.
+        item_dimensions: Optional DataFrame of barang_id, unit_weight_kg,
+                         unit_volume_m3; items missing from it use the
+                         truck_config defaults.
+    """
+    unit_weight = np.full(len(delivery_plan), float(config.truck_config['unit_weight_kg']))
+    unit_volume = np.full(len(delivery_plan), float(config.truck_config['unit_volume_m3']))
+    if item_dimensions is not None and not item_dimensions.empty:
+        dims = item_dimensions.set_index('barang_id')
+        unit_weight = dims['unit_weight_kg'].reindex(delivery_plan['barang_id']).fillna(unit_weight[0]).to_numpy()
+        unit_volume = dims['unit_volume_m3'].reindex(delivery_plan['barang_id']).fillna(unit_volume[0]).to_numpy()
+    quantity = delivery_plan['quantity_to_deliver'].to_numpy(dtype=np.float64)
+    return delivery_plan.assign(weight_kg=quantity * unit_weight, volume_m3=quantity * unit_volume)
+
+def split_stop(unit_size, quantity):
+    """
+    Fills truck-sized pieces with the units of one oversized stop, row by row,
+    so every piece but the last is (nearly) a full truck.
+
+    Args:
+        unit_size: Per row, the larger of a unit's weight and volume as a
+                   share of a truck.
+        quantity:  Per row, the units to deliver.
+
+    Returns:
+        A list of (row position, piece, quantity).
+    """
+    allocation = []
+    piece, room = 0, 1.0
+    for position, (size, remaining) in enumerate(zip(unit_size, quantity)):
+        remaining = int(remaining)
+        while remaining > 0:
+            if size > 1.0 + 1e-9:
+                # A single unit bigger than a truck still has to go on one, on a piece of its own
+                if room < 1.0:
+                    piece += 1
+                allocation.append((position, piece, 1))
+                remaining -= 1
+                piece, room = piece + 1, 1.0
+                continue
+            take = max(0, min(remaining, int((room + 1e-9) // size))) if size > 0 else remaining
+            if take == 0:
+                piece, room = piece + 1, 1.0
+                continue
+            allocation.append((position, piece, take))
+            remaining -= take
+            room -= take * size
+    return allocation
+
+def build_stops(plan):
+    """
+    Collapses plan rows into stops (one per minimart) and splits stops too big
+    for one truck into pieces with split_stop.
+
+    Returns:
+        (stops, allocation): stops has one row per stop piece with kota_id,
+        minimart_id, weight_kg and volume_m3; allocation has the plan row
+        position, its stop piece (a row of stops) and the quantity carried.
+    """
+    max_weight = config.truck_config['max_weight_kg']
+    max_volume = config.truck_config['max_volume_m3']
+    quantity = plan['quantity_to_deliver'].to_numpy(dtype=np.int64)
+    weight = plan['weight_kg'].to_numpy()
+    volume = plan['volume_m3'].to_numpy()
+    stop_id = plan.groupby(['kota_id', 'minimart_id'], sort=False, observed=True).ngroup().to_numpy()
+    eps = 1e-9
+    oversized = ((np.bincount(stop_id, weights=weight) > max_weight + eps)
+                 | (np.bincount(stop_id, weights=volume) > max_volume + eps))
+
+    rows = np.flatnonzero(~oversized[stop_id])
+    allocation = [pd.DataFrame({'row': rows, 'stop': stop_id[rows], 'piece': 0, 'quantity': quantity[rows]})]
+    over_rows = np.flatnonzero(oversized[stop_id])
+    if len(over_rows):
+        unit_size = np.maximum(weight / max_weight, volume / max_volume) / np.maximum(quantity, 1)
+        for stop, positions in pd.Series(stop_id[over_rows]).groupby(stop_id[over_rows]).indices.items():
+            stop_rows = over_rows[positions]
+            split = np.array(split_stop(unit_size[stop_rows], quantity[stop_rows]), dtype=np.int64)
+            allocation.append(pd.DataFrame({'row': stop_rows[split[:, 0]], 'stop': stop, 'piece': split[:, 1],
+                                            'quantity': split[:, 2]}))
+    allocation = pd.concat(allocation, ignore_index=True)
+
+    share = allocation['quantity'].to_numpy() / np.maximum(quantity[allocation['row']], 1)
+    allocation['weight_kg'] = weight[allocation['row']] * share
+    allocation['volume_m3'] = volume[allocation['row']] * share
+    allocation['kota_id'] = plan['kota_id'].to_numpy()[allocation['row']]
+    allocation['minimart_id'] = plan['minimart_id'].to_numpy()[allocation['row']]
+    grouped = allocation.groupby(['stop', 'piece'], sort=False)
+    allocation['slot'] = grouped.ngroup()
+    stops = grouped.agg(kota_id=('kota_id', 'first'), minimart_id=('minimart_id', 'first'),
+                        weight_kg=('weight_kg', 'sum'), volume_m3=('volume_m3', 'sum'),
+                        slot=('slot', 'first')).sort_values('slot').reset_index(drop=True)
+    return stops, allocation[['row', 'slot', 'quantity', 'weight_kg', 'volume_m3']]
+
+def first_fit_decreasing(weights, volumes, max_weight, max_volume, max_stops):
+    """
+    Packs stops into trucks, largest first, each into the first truck with room.
+
+    The room check is a vectorized test against every open truck.
+
+    Returns:
+        The truck index of each stop.
+    """
+    order = np.argsort(-np.maximum(weights / max_weight, volumes / max_volume), kind='stable')
+    truck_of = np.empty(len(weights), dtype=np.int64)
+    load_w = np.zeros(len(weights))
+    load_v = np.zeros(len(weights))
+    n_stops = np.zeros(len(weights), dtype=np.int64)
+    n_trucks = 0
+    eps = 1e-9
+    for i in order:
+        fits = np.flatnonzero((load_w[:n_trucks] + weights[i] <= max_weight + eps)
+                              & (load_v[:n_trucks] + volumes[i] <= max_volume + eps)
+                              & (n_stops[:n_trucks] < max_stops))
+        truck = fits[0] if len(fits) else n_trucks
+        if truck == n_trucks:
+            n_trucks += 1
+        truck_of[i] = truck
+        load_w[truck] += weights[i]
+        load_v[truck] += volumes[i]
+        n_stops[truck] += 1
+    return truck_of
+
+def eliminate_trucks(truck_of, weights, volumes, max_weight, max_volume, max_stops):
+    """
+    Local improvement: tries to empty the least-loaded trucks by moving each
+    of their stops into the fullest remaining truck with room (best fit). A
+    truck is only dropped if all of its stops can be moved.
+
+    Returns:
+        The improved truck index of each stop, renumbered from 0.
+    """
+    truck_of = truck_of.copy()
+    eps = 1e-9
+    improved = True
+    while improved:
+        improved = False
+        trucks = np.unique(truck_of)
+        load_w = np.bincount(truck_of, weights=weights, minlength=trucks.max() + 1)
+        load_v = np.bincount(truck_of, weights=volumes, minlength=trucks.max() + 1)
+        n_stops = np.bincount(truck_of, minlength=trucks.max() + 1)
+        fill = np.maximum(load_w / max_weight, load_v / max_volume)
+        for candidate in trucks[np.argsort(fill[trucks])]:
+            members = np.flatnonzero(truck_of == candidate)
+            trial_w, trial_v, trial_n = load_w.copy(), load_v.copy(), n_stops.copy()
+            others = np.setdiff1d(trucks, [candidate])
+            moves = []
+            for i in members[np.argsort(-weights[members])]:
+                fits = others[(trial_w[others] + weights[i] <= max_weight + eps)
+                              & (trial_v[others] + volumes[i] <= max_volume + eps)
+                              & (trial_n[others] < max_stops)]
+                if not len(fits):
+                    break
+                target = fits[np.argmax(trial_w[fits])]  # Best fit: fullest truck that still has room
+                trial_w[target] += weights[i]
+                trial_v[target] += volumes[i]
+                trial_n[target] += 1
+                moves.append((i, target))
+            else:
+                for i, target in moves:
+                    truck_of[i] = target
+                improved = True
+                break
+    return np.unique(truck_of, return_inverse=True)[1]
+
+def batch_deliveries(delivery_plan, gudang_id, item_dimensions=None):
+    """
+    Packs one Gudang's delivery plan into truck loads.
+
+    Stops are grouped by kota_id so a truck only serves one city, packed with
+    first-fit-decreasing under the weight, volume and stop-count limits of
+    config.truck_config, and then improved by emptying the least-loaded
+    trucks where possible. A stop bigger than a truck is split into full-truck
+    pieces plus a remainder, each packed like any other stop.
+
+    Returns:
+        The manifest: one row per truck x stop x barang with truck_id,
+        stop_sequence, kota_id, minimart_id, barang_id, barang_nama, quantity,
+        weight_kg and volume_m3.
+    """
+    if delivery_plan.empty:
+        return pd.DataFrame()
+    max_weight = config.truck_config['max_weight_kg']
+    max_volume = config.truck_config['max_volume_m3']
+    max_stops = config.truck_config['max_stops']
+
+    plan = add_load_measures(delivery_plan, item_dimensions).reset_index(drop=True)
+    if 'kota_id' not in plan.columns:
+        plan = plan.assign(kota_id=0)
+    plan['kota_id'] = plan['kota_id'].fillna(0).astype(np.int64)
+    stops, allocation = build_stops(plan)
+
+    truck_of_stop = np.empty(len(stops), dtype=np.int64)
+    next_truck = 0
+    for kota_id, positions in stops.groupby('kota_id', sort=True).indices.items():
+        weights = stops['weight_kg'].to_numpy()[positions]
+        volumes = stops['volume_m3'].to_numpy()[positions]
+        truck_of = first_fit_decreasing(weights, volumes, max_weight, max_volume, max_stops)
+        truck_of = eliminate_trucks(truck_of, weights, volumes, max_weight, max_volume, max_stops)
+        truck_of_stop[positions] = truck_of + next_truck
+        next_truck += truck_of.max() + 1
+
+    # Expand stop pieces back to plan rows
+    manifest = plan.iloc[allocation['row']].drop(columns=['weight_kg', 'volume_m3'])
+    manifest = manifest.assign(quantity=allocation['quantity'].to_numpy(),
+                               weight_kg=allocation['weight_kg'].to_numpy(),
+                               volume_m3=allocation['volume_m3'].to_numpy(),
+                               truck=truck_of_stop[allocation['slot'].to_numpy()])
+    manifest = manifest[manifest['quantity'] > 0]
+
+    manifest = manifest.sort_values(['truck', 'minimart_id', 'barang_id'])
+    manifest['truck_id'] = [f"G{gudang_id}-T{truck + 1:03d}" for truck in manifest['truck']]
+    manifest['stop_sequence'] = manifest.groupby('truck')['minimart_id'].rank(method='dense').astype(np.int64)
+    manifest['gudang_id'] = gudang_id
+    columns = ['truck_id', 'stop_sequence', 'gudang_id', 'kota_id', 'minimart_id', 'barang_id', 'barang_nama',
+               'quantity', 'weight_kg', 'volume_m3']
+    return manifest[columns].reset_index(drop=True)
+
+def summarize_trucks(manifest):
+    """Per-truck totals and utilisation of a manifest."""
+    summary = manifest.groupby('truck_id').agg(kota_id=('kota_id', 'first'), stops=('minimart_id', 'nunique'),
+                                               quantity=('quantity', 'sum'), weight_kg=('weight_kg', 'sum'),
+                                               volume_m3=('volume_m3', 'sum')).reset_index()
+    summary['weight_utilisation'] = summary['weight_kg'] / config.truck_config['max_weight_kg']
+    summary['volume_utilisation'] = summary['volume_m3'] / config.truck_config['max_volume_m3']
+    return summary
+
+def truck_lower_bound(manifest):
+    """Trucks needed if loads could be split freely within each kota (a bound on plan quality)."""
+    per_kota = manifest.groupby('kota_id')[['weight_kg', 'volume_m3']].sum()
+    needed = np.maximum(per_kota['weight_kg'] / config.truck_config['max_weight_kg'],
+                        per_kota['volume_m3'] / config.truck_config['max_volume_m3'])
+    return int(np.ceil(needed - 1e-9).sum())
+
+def save_truck_manifests(manifest, gudang_id, output_path="."):
+    """
+    Writes one manifest CSV per truck plus a summary CSV for the Gudang.
+
+    Returns:
+        The directory written, or None on error.
+    """
+    try:
+        directory = os.path.join(output_path, f"truck_manifests_gudang_{gudang_id}")
+        os.makedirs(directory, exist_ok=True)
+        for truck_id, truck_rows in manifest.groupby('truck_id'):
+            filepath = os.path.join(directory, f"{truck_id}.csv")
+            truck_rows.to_csv(filepath, index=False)
+            record_file_written(filepath)
+        summary_path = os.path.join(directory, "summary.csv")
+        summarize_trucks(manifest).to_csv(summary_path, index=False)
+        record_file_written(summary_path)
+        logging.info(f"Saved {manifest['truck_id'].nunique()} truck manifests to {directory}")
+        return directory
+    except OSError as e:
+        logging.error(f"Error saving truck manifests: {e}")
+        return None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Batch a saved delivery plan into truck manifests.")
+    parser.add_argument("delivery_plan", help="Delivery plan CSV written by generate_delivery.py.")
+    parser.add_argument("--gudang-id", type=int, required=True)
+    parser.add_argument("--output-path", default="deliveries")
+    args = parser.parse_args()
+
+    manifest = batch_deliveries(pd.read_csv(args.delivery_plan), args.gudang_id)
+    if manifest.empty:
+        print("Nothing to deliver.")
+    else:
+        print(f"Truck manifests saved to: {save_truck_manifests(manifest, args.gudang_id, args.output_path)}")